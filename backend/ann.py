@@ -0,0 +1,197 @@
+"""Inverted-file (IVF) approximate nearest-neighbour index for the local vector index"""
+import os
+import threading
+import time
+from array import array
+from typing import Optional
+
+import numpy as np
+
+from local_index import LocalVectorIndex, normalize_rows, top_k_indices
+
+ANN_INDEX = os.getenv("LOCAL_INDEX_ANN", "none")  # "ivf" to search large local indexes approximately
+ANN_MIN_ROWS = int(os.getenv("ANN_MIN_ROWS", "50000"))  # exact search below this many chunks
+ANN_NLIST = int(os.getenv("ANN_NLIST", "0"))  # k-means lists (0 = 4 * sqrt(chunks))
+ANN_NPROBE = int(os.getenv("ANN_NPROBE", "16"))  # lists scanned per query: higher = better recall, slower
+ANN_REBUILD_GROWTH = float(os.getenv("ANN_REBUILD_GROWTH", "0.5"))  # retrain once the index grows by this fraction
+TRAIN_SAMPLE = int(os.getenv("ANN_TRAIN_SAMPLE", "100000"))  # rows k-means is trained on
+KMEANS_ITERATIONS = 10
+ASSIGN_ROWS = 8192  # rows assigned to centroids per matrix product
+
+
+def nearest_centroids(vectors: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    """Index of the most similar centroid for each row"""
+    assignments = np.empty(len(vectors), dtype=np.int32)
+    for start in range(0, len(vectors), ASSIGN_ROWS):
+        assignments[start:start + ASSIGN_ROWS] = np.argmax(vectors[start:start + ASSIGN_ROWS] @ centroids.T, axis=1)
+    return assignments
+
+
+def kmeans(vectors: np.ndarray, k: int, iterations: int = KMEANS_ITERATIONS, seed: int = 0) -> np.ndarray:
+    """Spherical k-means over unit vectors; returns k unit-length centroids"""
+    rng = np.random.default_rng(seed)
+    centroids = vectors[rng.choice(len(vectors), k, replace=False)]
+    for _ in range(iterations):
+        assignments = nearest_centroids(vectors, centroids)
+        sizes = np.bincount(assignments, minlength=k)
+        starts = np.concatenate(([0], np.cumsum(sizes)[:-1]))
+        nonempty = sizes > 0
+        sums = np.empty_like(centroids)
+        sums[nonempty] = np.add.reduceat(vectors[np.argsort(assignments, kind="stable")], starts[nonempty])
+        sums[~nonempty] = vectors[rng.choice(len(vectors), int((~nonempty).sum()))]  # reseed empty lists
+        centroids = normalize_rows(sums)
+    return centroids
+
+
+class IVFIndex:
+    """Inverted-file ANN index over the rows of a LocalVectorIndex.
+
+    Rows are clustered by spherical k-means into `nlist` lists, and a
+    query only scores the rows of the `nprobe` lists whose centroids are
+    closest to it, so its cost is roughly nprobe / nlist of an exact scan.
+    New rows are appended to their nearest list as they are stored. Once
+    the index has grown by ANN_REBUILD_GROWTH since training, centroids
+    are retrained in a background thread while queries keep using the
+    current lists; the new ones are swapped in when ready. Until the first
+    training finishes (or below `min_rows` chunks) the local index falls
+    back to its exact scan. An on-disk index saves centroids and row
+    assignments to `ivf.npz`, so restarts do not retrain.
+    """
+
+    def __init__(self, index: LocalVectorIndex, nprobe: int = ANN_NPROBE, nlist: int = ANN_NLIST,
+                 min_rows: int = ANN_MIN_ROWS):
+        self.index = index
+        self.nprobe = nprobe
+        self.nlist = nlist
+        self.min_rows = min_rows
+        self.centroids: Optional[np.ndarray] = None
+        self.trained_rows = 0
+        self.rebuilds = 0
+        self.rebuild_seconds = None
+        self.rebuilding = False
+        self._lists = []  # row numbers per centroid, as array("q")
+        self._assignments = array("i")  # centroid of each row assigned so far
+        self._lock = threading.Lock()
+        self._load()
+        self.update()
+
+    @property
+    def ready(self) -> bool:
+        return self.centroids is not None
+
+    @property
+    def _file(self) -> Optional[str]:
+        return os.path.join(self.index.path, "ivf.npz") if self.index.path else None
+
+    def _load(self):
+        if not self._file or not os.path.exists(self._file):
+            return
+        try:
+            with np.load(self._file) as data:
+                centroids, assignments, trained_rows = data["centroids"], data["assignments"], int(data["trained_rows"])
+        except (OSError, ValueError, KeyError) as e:
+            print(f"⚠️  Ignoring unreadable IVF index: {e}")
+            return
+        if centroids.shape[1] == self.index.dim and len(assignments) <= self.index.count:
+            self._install(centroids, assignments, trained_rows)
+
+    def _save(self, centroids: np.ndarray, assignments: np.ndarray, trained_rows: int):
+        tmp = f"{self._file}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            np.savez(f, centroids=centroids, assignments=assignments, trained_rows=trained_rows)
+        os.replace(tmp, self._file)
+
+    @staticmethod
+    def _append(lists, assignments_out: array, start: int, assignments: np.ndarray):
+        """Add rows start.. to the lists of their assigned centroids"""
+        rows = np.arange(start, start + len(assignments), dtype=np.int64)[np.argsort(assignments, kind="stable")]
+        sizes = np.bincount(assignments, minlength=len(lists))
+        ends = np.cumsum(sizes)
+        for centroid in np.flatnonzero(sizes):
+            lists[centroid].frombytes(rows[ends[centroid] - sizes[centroid]:ends[centroid]].tobytes())
+        assignments_out.frombytes(assignments.astype(np.int32).tobytes())
+
+    def _install(self, centroids: np.ndarray, assignments: np.ndarray, trained_rows: int):
+        lists = [array("q") for _ in range(len(centroids))]
+        assigned = array("i")
+        self._append(lists, assigned, 0, assignments)
+        with self._lock:
+            self.centroids, self._lists, self._assignments = centroids, lists, assigned
+            self.trained_rows = trained_rows
+
+    def update(self):
+        """Assign rows stored since the last call to their nearest lists,
+        and start a background rebuild once the index outgrows its training"""
+        count = self.index.count
+        with self._lock:
+            centroids, start = self.centroids, len(self._assignments)
+        if centroids is not None and count > start:
+            assignments = nearest_centroids(self.index.row_vectors(slice(start, count)), centroids)
+            with self._lock:
+                if self.centroids is centroids and len(self._assignments) == start:
+                    self._append(self._lists, self._assignments, start, assignments)
+        with self._lock:
+            due = len(self.index) >= self.min_rows and (
+                self.centroids is None or count >= self.trained_rows * (1 + ANN_REBUILD_GROWTH))
+            if not due or self.rebuilding:
+                return
+            self.rebuilding = True
+        threading.Thread(target=self._rebuild_in_background, name="ivf-rebuild", daemon=True).start()
+
+    def _rebuild_in_background(self):
+        try:
+            self.rebuild()
+        except Exception as e:
+            print(f"⚠️  IVF rebuild failed: {e}")
+        finally:
+            self.rebuilding = False
+
+    def rebuild(self):
+        """Retrain the centroids on a sample of rows and reassign every row.
+        Queries keep using the current lists until the new ones are installed."""
+        started = time.perf_counter()
+        count = self.index.count
+        if count == 0:
+            return
+        rng = np.random.default_rng(count)
+        sample = self.index.row_vectors(np.sort(rng.choice(count, min(count, TRAIN_SAMPLE), replace=False)))
+        nlist = min(self.nlist or int(4 * np.sqrt(count)), len(sample))
+        centroids = kmeans(sample, max(1, nlist))
+        assignments = np.empty(count, dtype=np.int32)
+        for start in range(0, count, ASSIGN_ROWS):
+            end = min(start + ASSIGN_ROWS, count)
+            assignments[start:end] = nearest_centroids(self.index.row_vectors(slice(start, end)), centroids)
+        self._install(centroids, assignments, count)
+        if self._file:
+            self._save(centroids, assignments, count)
+        self.rebuilds += 1
+        self.rebuild_seconds = time.perf_counter() - started
+        print(f"✓ IVF index built: {count} chunks in {len(centroids)} lists ({self.rebuild_seconds:.1f}s)")
+        self.update()  # rows stored while rebuilding
+
+    def candidates(self, query: np.ndarray, count: int, nprobe: Optional[int] = None) -> Optional[np.ndarray]:
+        """Sorted rows to score for a normalized query: the nprobe nearest
+        lists plus any rows not yet assigned. None until trained."""
+        with self._lock:
+            if self.centroids is None:
+                return None
+            probes = top_k_indices(self.centroids @ query, nprobe or self.nprobe)
+            parts = [np.frombuffer(self._lists[c], dtype=np.int64) for c in probes if len(self._lists[c])]
+            parts.append(np.arange(len(self._assignments), count, dtype=np.int64))
+            rows = np.concatenate(parts)
+            del parts  # release the list buffers before appends resume
+        rows.sort()
+        return rows
+
+    def stats(self) -> dict:
+        return {
+            "type": "ivf",
+            "ready": self.ready,
+            "nlist": len(self.centroids) if self.centroids is not None else 0,
+            "nprobe": self.nprobe,
+            "trained_rows": self.trained_rows,
+            "assigned_rows": len(self._assignments),
+            "rebuilding": self.rebuilding,
+            "rebuilds": self.rebuilds,
+            "rebuild_seconds": round(self.rebuild_seconds, 3) if self.rebuild_seconds is not None else None,
+        }
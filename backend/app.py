@@ -1,11 +1,36 @@
 from fastapi import FastAPI, UploadFile, File, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
+from fastapi.responses import StreamingResponse, JSONResponse, Response
+from contextlib import asynccontextmanager, nullcontext
+from pydantic import BaseModel, Field
 from typing import List, Optional
 import uvicorn
+import asyncio
 import os
 from datetime import datetime
 import json
+import time
+import threading
+
+from ingest import batched, IngestStats, EMBED_BATCH_SIZE, UPSERT_BATCH_SIZE
+from jobs import JobQueue
+from manifest import chunk_hash, chunk_id, StoredIds
+from bm25 import BM25Index
+from retrieval import hybrid_search, metadata_filter
+from cache import embedding_cache, retrieval_cache, answer_cache, text_key, context_fingerprint, cache_stats
+from concurrency import llm_pool, embed_pool, vector_pool, pool_stats
+from concurrency import llm_flight, llm_stream_flight, flight_key, flight_stats
+from streaming import sse_event
+from resilience import BackendGuard
+from batching import EmbeddingBatcher
+from prompt import assemble_prompt, build_context, message_room, PromptTooLarge
+from sessions import SessionStore
+from startup import Startup
+from embedder import load_embedder, missing_dependency as missing_embedder_dependency, EMBEDDER, MODEL_NAME
+from metrics import MetricsMiddleware, render as render_metrics, CONTENT_TYPE as METRICS_CONTENT_TYPE
+from metrics import backend_errors, fallbacks, observe_llm_stream
+from metrics import embed_seconds, vector_search_seconds, keyword_search_seconds, retrieve_seconds
+from metrics import prompt_build_seconds, llm_total_seconds
 
 # Ollama integration for LLaMA
 try:
@@ -18,21 +43,38 @@ except ImportError:
 # Pinecone integration
 try:
     from pinecone import Pinecone, ServerlessSpec
-    import hashlib
     PINECONE_AVAILABLE = True
 except ImportError:
     PINECONE_AVAILABLE = False
     print("⚠️  Pinecone not installed. Install with: pip install pinecone-client")
 
-# Sentence transformers for embeddings
+# Sentence embeddings: SentenceTransformer, or its ONNX export with EMBEDDER=onnx
+# (loaded in the background at startup, since importing torch alone takes seconds)
+EMBEDDINGS_AVAILABLE = missing_embedder_dependency() is None
+if not EMBEDDINGS_AVAILABLE:
+    print(f"⚠️  {EMBEDDER} embedder not installed. Install with: pip install {missing_embedder_dependency()}")
+
+# Local NumPy vector index (used when Pinecone is not configured)
 try:
-    from sentence_transformers import SentenceTransformer
-    EMBEDDINGS_AVAILABLE = True
+    from local_index import LocalVectorIndex
+    from ann import IVFIndex, ANN_INDEX
+    LOCAL_INDEX_AVAILABLE = True
 except ImportError:
-    EMBEDDINGS_AVAILABLE = False
-    print("⚠️  Sentence transformers not installed. Install with: pip install sentence-transformers")
+    LOCAL_INDEX_AVAILABLE = False
+    print("⚠️  NumPy not installed. Install with: pip install numpy")
+
+startup = Startup()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Bind immediately and load models and clients in the background"""
+    startup.start()
+    await job_queue.start()
+    yield
+    await job_queue.stop()
+    await startup.stop()
 
-app = FastAPI(title="Jarvis AI Assistant API")
+app = FastAPI(title="Jarvis AI Assistant API", lifespan=lifespan)
 
 # CORS middleware
 app.add_middleware(
@@ -42,41 +84,105 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(MetricsMiddleware)
 
 # Initialize components
 embedding_model = None
 pinecone_index = None
-knowledge_base = []  # Fallback in-memory storage
+local_index = None  # Local vector index when Pinecone is not configured
+knowledge_base = []  # Fallback in-memory storage (no embedding model)
+keyword_index = BM25Index()  # BM25 over every stored chunk (document numbers are local index rows when it is open)
+keyword_chunks = []  # Chunk texts aligned with keyword_index document numbers (Pinecone and in-memory storage)
+keyword_lookup = {}  # Chunk hash -> keyword_index document numbers, for removal
+knowledge_lock = threading.Lock()
+knowledge_generation = 0  # Bumped whenever chunks are stored, to invalidate cached retrievals
+LOCAL_INDEX_PATH = os.getenv("LOCAL_INDEX_PATH", "./local_index")
+OLLAMA_KEEP_ALIVE = os.getenv("OLLAMA_KEEP_ALIVE", "30m")  # keep llama2 loaded between session turns
+OLLAMA_NUM_CTX = int(os.getenv("OLLAMA_NUM_CTX", "4096"))  # llama2 context window
+OLLAMA_OPTIONS = {'num_ctx': OLLAMA_NUM_CTX}  # sent with every call (Ollama's own default window is often 2048)
+ANSWER_TOKENS = int(os.getenv("ANSWER_TOKENS", "512"))  # room left for the answer when continuing a session
+OLLAMA_TIMEOUT = float(os.getenv("OLLAMA_TIMEOUT", "120"))  # seconds to the answer once running (streams: to each token)
+LLM_HEDGE = os.getenv("LLM_HEDGE", "false").lower() == "true"  # send a second request after the p95 latency
+OLLAMA_WARMUP_TIMEOUT = float(os.getenv("OLLAMA_WARMUP_TIMEOUT", "120"))  # seconds for the startup ping (loads llama2)
 
-if EMBEDDINGS_AVAILABLE:
-    try:
-        embedding_model = SentenceTransformer('all-MiniLM-L6-v2')
-        print("✓ Embedding model loaded successfully")
-    except Exception as e:
-        print(f"⚠️  Failed to load embedding model: {e}")
+def load_embedding_model():
+    """Load the embedding model and run a warmup encode"""
+    global embedding_model
+    if not EMBEDDINGS_AVAILABLE:
+        return False
+    embedding_model = load_embedder()
+    print(f"✓ Embedding model loaded successfully ({EMBEDDER})")
 
-if PINECONE_AVAILABLE:
-    try:
-        # Initialize Pinecone (you'll need to set your API key)
-        PINECONE_API_KEY = os.getenv("PINECONE_API_KEY", "")
-        if PINECONE_API_KEY:
-            pc = Pinecone(api_key=PINECONE_API_KEY)
-            
-            # Create or connect to index
-            index_name = "jarvis-knowledge"
-            if index_name not in pc.list_indexes().names():
-                pc.create_index(
-                    name=index_name,
-                    dimension=384,  # all-MiniLM-L6-v2 dimension
-                    metric='cosine',
-                    spec=ServerlessSpec(cloud='aws', region='us-east-1')
-                )
-            pinecone_index = pc.Index(index_name)
-            print("✓ Pinecone connected successfully")
-        else:
-            print("⚠️  PINECONE_API_KEY not set. Using in-memory storage.")
-    except Exception as e:
-        print(f"⚠️  Pinecone initialization failed: {e}")
+def connect_pinecone():
+    """Connect to (or create) the Pinecone index"""
+    global pinecone_index
+    if not PINECONE_AVAILABLE:
+        return False
+    # Initialize Pinecone (you'll need to set your API key)
+    PINECONE_API_KEY = os.getenv("PINECONE_API_KEY", "")
+    if not PINECONE_API_KEY:
+        print("⚠️  PINECONE_API_KEY not set. Using in-memory storage.")
+        return False
+    pc = Pinecone(api_key=PINECONE_API_KEY)
+    
+    # Create or connect to index
+    index_name = "jarvis-knowledge"
+    if index_name not in pc.list_indexes().names():
+        pc.create_index(
+            name=index_name,
+            dimension=384,  # all-MiniLM-L6-v2 dimension
+            metric='cosine',
+            spec=ServerlessSpec(cloud='aws', region='us-east-1')
+        )
+    pinecone_index = pc.Index(index_name)
+    print("✓ Pinecone connected successfully")
+
+def load_local_index():
+    """Open the local vector index when Pinecone is not configured"""
+    global local_index
+    if not (LOCAL_INDEX_AVAILABLE and embedding_model) or pinecone_index is not None:
+        return False
+    index = LocalVectorIndex(
+        dim=embedding_model.get_sentence_embedding_dimension(),
+        path=LOCAL_INDEX_PATH or None
+    )
+    if ANN_INDEX == "ivf":
+        index.ann = IVFIndex(index)  # trains in the background once the index is large enough
+    local_index = index
+    # Rebuild the keyword index from chunks persisted in the local index
+    sync_local_keywords()
+    print(f"✓ Local vector index loaded ({len(local_index)} chunks)")
+
+def warmup_llm():
+    """Ping Ollama so llama2 is loaded into memory before the first chat.
+    A ping that fails or hangs marks the llm component failed; requests
+    still try Ollama, each guarded by OLLAMA_TIMEOUT"""
+    if not OLLAMA_AVAILABLE:
+        return False
+    result = {}
+
+    def ping():
+        try:
+            # Loads the model with our context window
+            result["reply"] = ollama.chat(model='llama2', messages=[], options=OLLAMA_OPTIONS)
+        except Exception as e:
+            result["error"] = e
+
+    thread = threading.Thread(target=ping, daemon=True)
+    thread.start()
+    thread.join(OLLAMA_WARMUP_TIMEOUT)
+    if "error" in result:
+        raise result["error"]
+    if "reply" not in result:
+        raise TimeoutError(f"Ollama did not answer the warmup ping within {OLLAMA_WARMUP_TIMEOUT:g}s")
+    print("✓ Ollama model warmed up")
+
+startup.register("embeddings", load_embedding_model)
+startup.register("pinecone", connect_pinecone)
+startup.register("local_index", load_local_index, after=["embeddings", "pinecone"])
+startup.register("llm", warmup_llm)
+
+MAX_SEARCH_QUERIES = int(os.getenv("MAX_SEARCH_QUERIES", "1000"))  # queries per /search request
 
 # Pydantic models
 class Message(BaseModel):
@@ -86,81 +192,463 @@ class Message(BaseModel):
 class ChatRequest(BaseModel):
     message: str
     history: List[Message] = []
+    session_id: Optional[str] = None  # continue a server-side session (history is then ignored)
+    top_k: int = Field(3, ge=1, le=50)
+    vector_weight: float = Field(1.0, ge=0)
+    keyword_weight: float = Field(1.0, ge=0)
 
 class ChatResponse(BaseModel):
     response: str
     sources: Optional[List[str]] = None
+    cached: bool = False
+    prompt_tokens: Optional[int] = None
+    session_id: Optional[str] = None
+
+class SessionRequest(BaseModel):
+    history: List[Message] = []
+
+class SearchRequest(BaseModel):
+    queries: List[str] = Field(..., min_length=1, max_length=MAX_SEARCH_QUERIES)
+    top_k: int = Field(5, ge=1, le=100)
+    filename: Optional[str] = None
+    uploaded_after: Optional[datetime] = None
+    uploaded_before: Optional[datetime] = None
 
 # Helper functions
 def get_embedding(text: str):
-    """Generate embedding for text"""
+    """Generate a float32 embedding array for text (cached by normalized text)"""
     if embedding_model:
-        return embedding_model.encode(text).tolist()
+        key = text_key(text)
+        embedding = embedding_cache.get(key)
+        if embedding is None:
+            embedding = embedding_model.encode(text)
+            embedding_cache.put(key, embedding)
+        return embedding
     return None
 
-def store_in_vector_db(text: str, metadata: dict):
-    """Store text in vector database"""
+def get_embeddings(texts: List[str]):
+    """Generate a float32 embedding matrix for a batch of texts in one encode call
+    (kept as an array: a list of Python floats costs ~8x the memory)"""
+    if embedding_model:
+        return embedding_model.encode(texts, batch_size=EMBED_BATCH_SIZE)
+    return None
+
+# Query embeddings from concurrent requests share batched encode calls
+embedding_batcher = EmbeddingBatcher("query", get_embeddings, embed_pool)
+
+async def embed_queries(texts: List[str]):
+    """Cached embeddings for many queries; cache misses are encoded in one batch"""
+    with embed_seconds.time():
+        return await _embed_queries(texts)
+
+async def _embed_queries(texts: List[str]):
+    keys = [text_key(text) for text in texts]
+    embeddings = [embedding_cache.get(key) for key in keys]
+    missing = [i for i, embedding in enumerate(embeddings) if embedding is None]
+    if missing:
+        encoded = await embed_pool.run(get_embeddings, [texts[i] for i in missing])
+        for i, embedding in zip(missing, encoded):
+            embeddings[i] = embedding.copy()  # a row view would keep the whole batch alive in the cache
+            embedding_cache.put(keys[i], embeddings[i])
+    return embeddings
+
+async def embed_query(text: str):
+    """Cached query embedding, micro-batched with concurrent requests"""
+    if not embedding_model:
+        return None
+    key = text_key(text)
+    embedding = embedding_cache.get(key)
+    if embedding is None:
+        with embed_seconds.time():
+            embedding = await embedding_batcher.embed(text)
+        if embedding is not None:
+            embedding = embedding.copy()  # row of a batch matrix
+            embedding_cache.put(key, embedding)
+    return embedding
+
+def keyword_text(doc: int) -> str:
+    """Text of a keyword index document"""
+    return local_index.texts[doc] if local_index is not None else keyword_chunks[doc]
+
+def sync_local_keywords():
+    """Index local index rows the keyword index has not seen yet.
+
+    Document numbers are the rows themselves, so texts are read back from
+    the shared index files instead of being copied into every worker. The
+    BM25 postings are still built and held per process.
+    """
+    with knowledge_lock:
+        for row in range(keyword_index.next_doc, local_index.count):
+            if row in local_index.deleted:
+                keyword_index.remove(keyword_index.add(""))  # keeps numbering aligned with rows
+            else:
+                keyword_index.add(local_index.texts[row])
+
+def unindex_local_keywords(rows):
+    """Remove deleted local index rows from the keyword index"""
+    with knowledge_lock:
+        for row in rows:
+            keyword_index.remove(row)
+
+def index_keywords(texts: List[str]):
+    """Add chunk texts to the BM25 keyword index (without a local index)"""
+    with knowledge_lock:
+        for text in texts:
+            keyword_chunks.append(text)
+            keyword_lookup.setdefault(chunk_hash(text), []).append(keyword_index.add(text))
+
+def unindex_keywords(hashes):
+    """Remove one keyword index document per chunk hash"""
+    with knowledge_lock:
+        for digest in hashes:
+            docs = keyword_lookup.get(digest)
+            if docs:
+                keyword_index.remove(docs.pop())
+                if not docs:
+                    del keyword_lookup[digest]
+
+def store_batch_in_vector_db(texts: List[str], metadatas: List[dict], stats: Optional[IngestStats] = None, embeddings=None):
+    """Store a batch of texts in vector database using bulk upserts"""
     if pinecone_index and embedding_model:
         try:
-            embedding = get_embedding(text)
-            doc_id = hashlib.md5(text.encode()).hexdigest()
-            pinecone_index.upsert(vectors=[{
-                'id': doc_id,
-                'values': embedding,
-                'metadata': {**metadata, 'text': text}
-            }])
-            return doc_id
+            if embeddings is None:
+                started = time.perf_counter()
+                embeddings = get_embeddings(texts)
+                if stats:
+                    stats.embed_seconds += time.perf_counter() - started
+
+            started = time.perf_counter()
+            doc_ids = [chunk_id(metadata.get('filename', ''), text) for text, metadata in zip(texts, metadatas)]
+            vectors = [
+                {'id': doc_id, 'values': embedding.tolist(), 'metadata': {**metadata, 'text': text}}
+                for doc_id, embedding, text, metadata in zip(doc_ids, embeddings, texts, metadatas)
+            ]
+            for batch in batched(vectors, UPSERT_BATCH_SIZE):
+                pinecone_index.upsert(vectors=batch)
+            if stats:
+                stats.store_seconds += time.perf_counter() - started
+            index_keywords(texts)
+            return doc_ids
         except Exception as e:
             print(f"Vector DB storage error: {e}")
+            backend_errors.labels("pinecone").inc()
+    
+    # Local vector index when Pinecone is not configured
+    if local_index is not None and embedding_model:
+        try:
+            if embeddings is None:
+                started = time.perf_counter()
+                embeddings = get_embeddings(texts)
+                if stats:
+                    stats.embed_seconds += time.perf_counter() - started
+            started = time.perf_counter()
+            doc_ids = local_index.add(embeddings, texts, metadatas)
+            if stats:
+                stats.store_seconds += time.perf_counter() - started
+            sync_local_keywords()
+            return StoredIds(doc_ids, durable=bool(local_index.path))
+        except Exception as e:
+            print(f"Local index storage error: {e}")
+            backend_errors.labels("local_index").inc()
+            # Keyword documents are local index rows, so the memory
+            # fallback could not be searched; report the chunks as failed
+            return StoredIds([], durable=False)
     
-    # Fallback to in-memory
-    knowledge_base.append({'text': text, 'metadata': metadata})
-    return len(knowledge_base) - 1
+    # Fallback to in-memory storage (searched through the keyword index)
+    fallbacks.labels("vector_db", "memory").inc(len(texts))
+    with knowledge_lock:
+        start = len(knowledge_base)
+        knowledge_base.extend({'text': text, 'metadata': metadata} for text, metadata in zip(texts, metadatas))
+        doc_ids = StoredIds(range(start, len(knowledge_base)), durable=False)
+    index_keywords(texts)
+    return doc_ids
+
+def delete_from_vector_db(entries: dict):
+    """Delete stored chunks given {chunk hash: document id}"""
+    doc_ids = list(entries.values())
+    if local_index is not None:
+        rows = [doc_id for doc_id in doc_ids if isinstance(doc_id, int)]
+        local_index.delete(rows)
+        unindex_local_keywords(rows)
+        return
+    if pinecone_index:
+        for batch in batched([doc_id for doc_id in doc_ids if isinstance(doc_id, str)], UPSERT_BATCH_SIZE):
+            pinecone_index.delete(ids=batch)
+    else:
+        with knowledge_lock:
+            for doc_id in doc_ids:
+                if isinstance(doc_id, int) and doc_id < len(knowledge_base):
+                    knowledge_base[doc_id] = None
+    unindex_keywords(entries.keys())
+
+def apply_local_index_changes():
+    """Index chunks other workers added to the shared local index, and
+    unindex the ones they deleted"""
+    added, deleted = local_index.refresh()
+    if not (added or deleted):
+        return
+    sync_local_keywords()
+    unindex_local_keywords(deleted)
+    bump_knowledge_generation()
 
-def search_knowledge_base(query: str, top_k: int = 3):
-    """Search for relevant context in knowledge base"""
+async def sync_local_index():
+    """Cheap per-request check for writes by other workers"""
+    if local_index is not None and local_index.changed():
+        await vector_pool.run(apply_local_index_changes)
+
+def search_vector_db(query: str, top_k: int = 3, query_embedding=None):
+    """Semantic search in Pinecone or the local vector index"""
     if pinecone_index and embedding_model:
         try:
-            query_embedding = get_embedding(query)
+            if query_embedding is None:
+                query_embedding = get_embedding(query)
             results = pinecone_index.query(
-                vector=query_embedding,
+                vector=query_embedding.tolist(),
                 top_k=top_k,
                 include_metadata=True
             )
             return [match['metadata']['text'] for match in results['matches']]
         except Exception as e:
             print(f"Vector search error: {e}")
+            backend_errors.labels("pinecone").inc()
     
-    # Fallback: simple keyword search
-    relevant = []
-    query_lower = query.lower()
-    for item in knowledge_base:
-        if any(word in item['text'].lower() for word in query_lower.split()):
-            relevant.append(item['text'])
-            if len(relevant) >= top_k:
-                break
-    return relevant
-
-def get_llm_response(prompt: str, context: str = ""):
-    """Get response from LLaMA via Ollama"""
-    if OLLAMA_AVAILABLE:
+    # Local vector index: cosine search (over quantized rows if configured)
+    if local_index is not None and embedding_model:
         try:
-            full_prompt = f"{context}\n\nUser: {prompt}\nAssistant:" if context else prompt
-            
-            response = ollama.chat(
-                model='llama2',  # or 'llama3' if you have it
-                messages=[{
-                    'role': 'user',
-                    'content': full_prompt
-                }]
-            )
-            return response['message']['content']
+            if query_embedding is None:
+                query_embedding = get_embedding(query)
+            return [local_index.texts[row] for row, _ in local_index.search(query_embedding, top_k)]
         except Exception as e:
-            print(f"Ollama error: {e}")
-            return f"⚠️ LLaMA model error: {str(e)}. Make sure Ollama is running with 'ollama serve' and you have pulled llama2 with 'ollama pull llama2'"
-    
-    # Fallback response
-    return "I'm a demo assistant. To enable full AI capabilities, please install Ollama and run 'ollama pull llama2'."
+            print(f"Local index search error: {e}")
+            backend_errors.labels("local_index").inc()
+    return []
+
+def query_pinecone(query_embedding, top_k: int, flt: Optional[dict] = None):
+    """One Pinecone query; returns matches with scores and chunk metadata"""
+    results = pinecone_index.query(vector=query_embedding.tolist(), top_k=top_k, include_metadata=True, filter=flt)
+    matches = []
+    for match in results['matches']:
+        metadata = dict(match['metadata'])
+        matches.append({'id': match['id'], 'score': match['score'], 'text': metadata.pop('text', ''), 'metadata': metadata})
+    return matches
+
+async def search_vector_db_batch(query_embeddings, top_k: int, flt: Optional[dict] = None):
+    """Vector search for many queries: parallel Pinecone queries, or one
+    matrix product over the local index"""
+    if pinecone_index:
+        return await asyncio.gather(*(
+            vector_pool.run(query_pinecone, embedding, top_k, flt) for embedding in query_embeddings
+        ))
+    results = await vector_pool.run(local_index.search_batch, query_embeddings, top_k, flt)
+    return [
+        [{'id': row, 'score': score, 'text': local_index.texts[row], 'metadata': local_index.metadatas[row]}
+         for row, score in rows]
+        for rows in results
+    ]
+
+def search_keywords(query: str, top_k: int = 3):
+    """BM25 keyword search over every stored chunk"""
+    return [keyword_text(doc) for doc, _ in keyword_index.search(query, top_k)]
+
+LLM_DEMO_RESPONSE = "I'm a demo assistant. To enable full AI capabilities, please install Ollama and run 'ollama pull llama2'."
+
+def llm_error_response(e: Exception):
+    print(f"Ollama error: {e}")
+    backend_errors.labels("ollama").inc()
+    return f"⚠️ LLaMA model error: {str(e)}. Make sure Ollama is running with 'ollama serve' and you have pulled llama2 with 'ollama pull llama2'"
+
+def ollama_chat(prompt: str, context: str = ""):
+    """One blocking LLaMA completion via Ollama"""
+    response = ollama.chat(
+        model='llama2',  # or 'llama3' if you have it
+        messages=[{
+            'role': 'user',
+            'content': assemble_prompt(prompt, context)
+        }],
+        options=OLLAMA_OPTIONS
+    )
+    return response['message']['content']
+
+def ollama_chat_stream(prompt: str, context: str = ""):
+    """Yield LLaMA response tokens via Ollama as they are generated"""
+    for part in ollama.chat(
+        model='llama2',
+        messages=[{
+            'role': 'user',
+            'content': assemble_prompt(prompt, context)
+        }],
+        options=OLLAMA_OPTIONS,
+        stream=True
+    ):
+        token = part['message']['content']
+        if token:
+            yield token
+
+def ollama_generate(prompt: str, context: str = "", llm_context: Optional[list] = None):
+    """Continue a session via Ollama; returns (response, context to continue from)"""
+    response = ollama.generate(
+        model='llama2',
+        prompt=assemble_prompt(prompt, context),
+        context=llm_context,
+        keep_alive=OLLAMA_KEEP_ALIVE,
+        options=OLLAMA_OPTIONS
+    )
+    return response['response'], response.get('context')
+
+def ollama_generate_stream(prompt: str, context: str = "", llm_context: Optional[list] = None, result: Optional[dict] = None):
+    """Yield session response tokens; the context to continue from is
+    stored in result['context'] once generation finishes"""
+    for part in ollama.generate(
+        model='llama2',
+        prompt=assemble_prompt(prompt, context),
+        context=llm_context,
+        keep_alive=OLLAMA_KEEP_ALIVE,
+        options=OLLAMA_OPTIONS,
+        stream=True
+    ):
+        token = part['response']
+        if token:
+            yield token
+        if part.get('done') and result is not None:
+            result['context'] = part.get('context')
+
+# Deadline, optional hedging and circuit breaking for every Ollama call
+llm_guard = BackendGuard("ollama", llm_pool, OLLAMA_TIMEOUT, hedge=LLM_HEDGE)
+
+async def get_llm_response(prompt: str, context: str = ""):
+    """Get response from LLaMA via Ollama"""
+    if not OLLAMA_AVAILABLE:
+        fallbacks.labels("ollama", "demo").inc()
+        return LLM_DEMO_RESPONSE
+    try:
+        with llm_total_seconds.time():
+            return await llm_guard.run(ollama_chat, prompt, context)
+    except Exception as e:
+        return llm_error_response(e)
+
+async def stream_llm_response(prompt: str, context: str = ""):
+    """Yield response tokens from LLaMA via Ollama as they are generated"""
+    if not OLLAMA_AVAILABLE:
+        fallbacks.labels("ollama", "demo").inc()
+        yield LLM_DEMO_RESPONSE
+        return
+    try:
+        async for token in observe_llm_stream(llm_guard.stream(ollama_chat_stream, prompt, context)):
+            yield token
+    except Exception as e:
+        yield llm_error_response(e)
+
+async def get_llm_session_response(prompt: str, context: str = "", llm_context: Optional[list] = None):
+    """Continue a session with LLaMA; returns (response, context to continue from)"""
+    if not OLLAMA_AVAILABLE:
+        fallbacks.labels("ollama", "demo").inc()
+        return LLM_DEMO_RESPONSE, None
+    try:
+        with llm_total_seconds.time():
+            return await llm_guard.run(ollama_generate, prompt, context, llm_context)
+    except Exception as e:
+        return llm_error_response(e), None
+
+async def stream_llm_session_response(prompt: str, context: str = "", llm_context: Optional[list] = None, result: Optional[dict] = None):
+    """Yield response tokens for a session turn (see ollama_generate_stream)"""
+    if not OLLAMA_AVAILABLE:
+        fallbacks.labels("ollama", "demo").inc()
+        yield LLM_DEMO_RESPONSE
+        return
+    try:
+        async for token in observe_llm_stream(llm_guard.stream(ollama_generate_stream, prompt, context, llm_context, result)):
+            yield token
+    except Exception as e:
+        yield llm_error_response(e)
+
+async def retrieve_context(query: str, top_k: int = 3, vector_weight: float = 1.0, keyword_weight: float = 1.0):
+    """Hybrid retrieval: vector and BM25 legs run concurrently, fused by rank"""
+    async def vector_leg(n: int):
+        if not embedding_model or (pinecone_index is None and local_index is None):
+            return []
+        query_embedding = await embed_query(query)
+        with vector_search_seconds.time():
+            return await vector_pool.run(search_vector_db, query, n, query_embedding)
+
+    async def keyword_leg(n: int):
+        with keyword_search_seconds.time():
+            return await vector_pool.run(search_keywords, query, n)
+
+    await sync_local_index()
+    cache_key = (text_key(query), top_k, vector_weight, keyword_weight, knowledge_generation)
+    cached = retrieval_cache.get(cache_key)
+    if cached is not None:
+        return cached
+    with retrieve_seconds.time():
+        docs, complete = await hybrid_search(vector_leg, keyword_leg, top_k, vector_weight, keyword_weight)
+    if complete:
+        retrieval_cache.put(cache_key, docs)
+    return docs
+
+def build_full_context(context_docs: List[str], history: List[Message], message: str):
+    """Combine retrieved context and recent conversation history within the
+    prompt token budget; returns (context, prompt tokens)"""
+    return build_context(context_docs, [(msg.role, msg.content) for msg in history], message)
+
+def build_turn_context(context_docs: List[str], request: ChatRequest, session=None):
+    """Prompt context for one turn; returns (context, prompt tokens, Ollama context).
+
+    While Ollama still holds a session's conversation (and it has room for
+    another turn), only the new turn is sent along with that context, so
+    earlier turns are not processed again. Otherwise the history is replayed
+    as text and a fresh Ollama context starts from there.
+    """
+    if session is None:
+        return (*build_full_context(context_docs, request.history, request.message), None)
+    if session.llm_context:
+        full_context, prompt_tokens = build_context(context_docs, [], request.message)
+        if len(session.llm_context) + prompt_tokens + ANSWER_TOKENS <= OLLAMA_NUM_CTX:
+            return full_context, prompt_tokens, session.llm_context
+    return (*build_context(context_docs, session.history, request.message), None)
+
+def check_message_size(message: str):
+    """Reject a message that alone exceeds the prompt budget, before any retrieval"""
+    try:
+        message_room(message)
+    except PromptTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+
+def open_session(session_id: Optional[str]):
+    """The request's session, or None for stateless requests"""
+    if session_id is None:
+        return None
+    session = sessions.get(session_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Session not found or expired")
+    return session
+
+async def answer_cache_key(request: ChatRequest, context_docs: List[str], session=None):
+    """Answer cache lookup key, or None when the cache must be bypassed"""
+    if answer_cache is None or request.history or (session is not None and session.history):
+        return None
+    query_embedding = await embed_query(request.message)
+    if query_embedding is None:
+        return None
+    return (query_embedding, context_fingerprint(context_docs), knowledge_generation)
+
+def is_cacheable_answer(response: str):
+    """Only real model answers are cached, never errors or demo fallbacks"""
+    return OLLAMA_AVAILABLE and bool(response) and not response.startswith("⚠️")
+
+def format_sources(context_docs: List[str]):
+    """Short source previews for the response"""
+    return [doc[:100] + "..." for doc in context_docs] if context_docs else None
+
+sessions = SessionStore()
+
+def bump_knowledge_generation():
+    """Invalidate cached retrievals after new chunks are stored"""
+    global knowledge_generation
+    knowledge_generation += 1
+
+job_queue = JobQueue(store_batch_in_vector_db, delete_chunks=delete_from_vector_db,
+                     on_progress=bump_knowledge_generation,
+                     ready=lambda: startup.wait(["embeddings", "pinecone", "local_index"]))
 
 # API Routes
 @app.get("/health")
@@ -168,79 +656,264 @@ async def health_check():
     """Health check endpoint"""
     return {
         "status": "healthy",
+        "ready": startup.ready,
         "ollama": OLLAMA_AVAILABLE,
         "pinecone": PINECONE_AVAILABLE and pinecone_index is not None,
         "embeddings": EMBEDDINGS_AVAILABLE,
+        "pools": pool_stats(),
+        "inflight": flight_stats(),
+        "embedding_batches": embedding_batcher.stats(),
+        "llm": llm_guard.stats(),
+        "sessions": sessions.stats(),
         "timestamp": datetime.now().isoformat()
     }
 
+@app.get("/metrics")
+async def metrics():
+    """Prometheus metrics: stage latencies, backend errors and fallbacks, ingestion, in-flight requests"""
+    return Response(render_metrics(), media_type=METRICS_CONTENT_TYPE)
+
+@app.get("/ready")
+async def readiness_check():
+    """Readiness endpoint: 503 until every component has finished loading"""
+    report = startup.report()
+    return JSONResponse(report, status_code=200 if report["ready"] else 503)
+
 @app.post("/chat", response_model=ChatResponse)
 async def chat(request: ChatRequest):
     """Main chat endpoint with RAG"""
+    check_message_size(request.message)
+    session = open_session(request.session_id)
+    async with session.lock if session else nullcontext():
+        try:
+            # Search knowledge base for relevant context
+            context_docs = await retrieve_context(
+                request.message, request.top_k, request.vector_weight, request.keyword_weight
+            )
+            with prompt_build_seconds.time():
+                full_context, prompt_tokens, llm_context = build_turn_context(context_docs, request, session)
+            
+            # Serve near-duplicate questions from the answer cache
+            cache_key = await answer_cache_key(request, context_docs, session)
+            if cache_key:
+                cached_answer = answer_cache.get(*cache_key)
+                if cached_answer is not None:
+                    if session is not None:
+                        session.record(request.message, cached_answer)
+                    return ChatResponse(response=cached_answer, sources=format_sources(context_docs), cached=True,
+                                        prompt_tokens=prompt_tokens, session_id=request.session_id)
+            
+            # Get LLM response
+            if session is None:
+                # Identical prompts already in flight share one model call
+                response = await llm_flight.do(
+                    flight_key(full_context, request.message),
+                    lambda: get_llm_response(request.message, full_context)
+                )
+            else:
+                response, llm_context = await get_llm_session_response(request.message, full_context, llm_context)
+            if cache_key and is_cacheable_answer(response):
+                answer_cache.put(*cache_key, response)
+            if session is not None and is_cacheable_answer(response):
+                session.record(request.message, response, llm_context)
+            
+            return ChatResponse(
+                response=response,
+                sources=format_sources(context_docs),
+                prompt_tokens=prompt_tokens,
+                session_id=request.session_id
+            )
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/chat/stream")
+async def chat_stream(request: ChatRequest):
+    """Streaming chat endpoint (Server-Sent Events).
+
+    Emits a `sources` event first, then one `token` event per generated
+    piece of text, and finally a `done` event with the full response and
+    timing stats.
+    """
+    started = time.perf_counter()
+    check_message_size(request.message)
+    session = open_session(request.session_id)
     try:
-        # Search knowledge base for relevant context
-        context_docs = search_knowledge_base(request.message)
-        context = "\n\n".join([f"Context: {doc}" for doc in context_docs]) if context_docs else ""
-        
-        # Build conversation history
-        history_text = "\n".join([
-            f"{msg.role.capitalize()}: {msg.content}" 
-            for msg in request.history[-5:]  # Last 5 messages
-        ])
-        
-        # Combine context and history
-        full_context = f"{context}\n\nConversation History:\n{history_text}" if history_text else context
-        
-        # Get LLM response
-        response = get_llm_response(request.message, full_context)
-        
-        return ChatResponse(
-            response=response,
-            sources=[doc[:100] + "..." for doc in context_docs] if context_docs else None
+        context_docs = await retrieve_context(
+            request.message, request.top_k, request.vector_weight, request.keyword_weight
         )
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+    retrieval_seconds = time.perf_counter() - started
+
+    async def events():
+        yield sse_event("sources", {"sources": format_sources(context_docs)})
+        parts = []
+        first_token_at = None
+        prompt_tokens = None
+        cached = False
+        # Turns of one session run one at a time, each continuing the last
+        async with session.lock if session else nullcontext():
+            try:
+                with prompt_build_seconds.time():
+                    full_context, prompt_tokens, llm_context = build_turn_context(context_docs, request, session)
+                cache_key = await answer_cache_key(request, context_docs, session)
+                cached_answer = answer_cache.get(*cache_key) if cache_key else None
+                cached = cached_answer is not None
+                result = {}
+                if cached:
+                    first_token_at = time.perf_counter()
+                    parts.append(cached_answer)
+                    yield sse_event("token", {"token": cached_answer})
+                else:
+                    if session is None:
+                        tokens = llm_stream_flight.subscribe(
+                            flight_key(full_context, request.message),
+                            lambda: stream_llm_response(request.message, full_context)
+                        )
+                    else:
+                        tokens = stream_llm_session_response(request.message, full_context, llm_context, result)
+                    async for token in tokens:
+                        if first_token_at is None:
+                            first_token_at = time.perf_counter()
+                        parts.append(token)
+                        yield sse_event("token", {"token": token})
+                response = "".join(parts)
+                if cache_key and not cached and is_cacheable_answer(response):
+                    answer_cache.put(*cache_key, response)
+                if session is not None and is_cacheable_answer(response):
+                    session.record(request.message, response, None if cached else result.get('context'))
+            except Exception as e:
+                yield sse_event("error", {"detail": str(e)})
+        yield sse_event("done", {
+            "response": "".join(parts),
+            "cached": cached,
+            "tokens": len(parts),
+            "prompt_tokens": prompt_tokens,
+            "session_id": request.session_id,
+            "retrieval_seconds": round(retrieval_seconds, 4),
+            "time_to_first_token": round(first_token_at - started, 4) if first_token_at else None,
+            "total_seconds": round(time.perf_counter() - started, 4)
+        })
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.post("/search")
+async def search(request: SearchRequest):
+    """Retrieval only: ranked chunks with scores and metadata for many queries.
+
+    All queries are embedded in one batch and sent as one multi-query
+    search; optional filters restrict results by filename and upload time.
+    """
+    started = time.perf_counter()
+    flt = metadata_filter(
+        request.filename,
+        request.uploaded_after.timestamp() if request.uploaded_after else None,
+        request.uploaded_before.timestamp() if request.uploaded_before else None
+    )
+    try:
+        await sync_local_index()
+        if embedding_model and (pinecone_index or local_index is not None):
+            embeddings = await embed_queries(request.queries)
+            with vector_search_seconds.time():
+                results = await search_vector_db_batch(embeddings, request.top_k, flt)
+            backend = "pinecone" if pinecone_index else "local_index"
+        else:
+            if flt:
+                raise HTTPException(status_code=503, detail="Metadata filters need a vector store")
+            results = [
+                [{'id': doc, 'score': score, 'text': keyword_text(doc), 'metadata': None}
+                 for doc, score in await vector_pool.run(keyword_index.search, query, request.top_k)]
+                for query in request.queries
+            ]
+            backend = "keyword"
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Search failed: {str(e)}")
+    return {
+        "backend": backend,
+        "results": [{"query": query, "matches": matches} for query, matches in zip(request.queries, results)],
+        "seconds": round(time.perf_counter() - started, 4)
+    }
+
+@app.post("/sessions")
+async def create_session(request: SessionRequest = SessionRequest()):
+    """Start a server-side conversation; pass its session_id to /chat"""
+    session = sessions.create([(msg.role, msg.content) for msg in request.history])
+    return {"session_id": session.id, "ttl_seconds": sessions.ttl}
+
+@app.get("/sessions/{session_id}")
+async def get_session(session_id: str):
+    """Stored history of a session"""
+    session = open_session(session_id)
+    return {
+        "session_id": session.id,
+        "turns": session.turns,
+        "history": [{"role": role, "content": content} for role, content in session.history]
+    }
+
+@app.delete("/sessions/{session_id}")
+async def delete_session(session_id: str):
+    if not sessions.delete(session_id):
+        raise HTTPException(status_code=404, detail="Session not found or expired")
+    return {"deleted": session_id}
 
 @app.post("/upload")
-async def upload_file(file: UploadFile = File(...)):
-    """Upload and process documents for knowledge base"""
+async def upload_file(file: UploadFile = File(...), wait: bool = False):
+    """Upload a document; it is spooled to disk and ingested in the background.
+
+    Returns a job id right away (poll GET /jobs/{id}), or with `?wait=true`
+    waits for ingestion to finish and returns the final counts.
+    """
     try:
-        # Read file content
-        content = await file.read()
-        text = content.decode('utf-8', errors='ignore')
-        
-        # Split into chunks (simple chunking)
-        chunks = [text[i:i+500] for i in range(0, len(text), 500)]
-        
-        # Store each chunk
-        doc_ids = []
-        for i, chunk in enumerate(chunks):
-            if chunk.strip():
-                doc_id = store_in_vector_db(
-                    chunk,
-                    {
-                        'filename': file.filename,
-                        'chunk': i,
-                        'timestamp': datetime.now().isoformat()
-                    }
-                )
-                doc_ids.append(doc_id)
-        
-        return {
-            "message": f"Successfully processed {file.filename}",
-            "chunks": len(doc_ids),
-            "id": doc_ids[0] if doc_ids else None
-        }
+        job = await job_queue.submit(file)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Upload failed: {str(e)}")
+    
+    if not wait:
+        return {
+            "message": f"Queued {file.filename} for processing",
+            "id": job.id,
+            "job_id": job.id,
+            "status": job.status
+        }
+    
+    job = await job_queue.wait(job.id)
+    if job.status == "failed":
+        raise HTTPException(status_code=500, detail=f"Upload failed: {job.error}")
+    return {
+        "message": f"Successfully processed {file.filename}",
+        "chunks": job.chunks_done,
+        "id": job.first_id,
+        "job_id": job.id,
+        "throughput": job.throughput
+    }
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    """Ingestion job progress: chunks done, throughput and errors"""
+    job = job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job_queue.report(job)
 
 @app.get("/knowledge")
 async def get_knowledge():
     """Get knowledge base statistics"""
+    await sync_local_index()
     return {
-        "total_documents": len(knowledge_base),
+        "total_documents": len(knowledge_base) - knowledge_base.count(None) + (len(local_index) if local_index is not None else 0),
         "vector_db_active": pinecone_index is not None,
-        "embedding_model": "all-MiniLM-L6-v2" if embedding_model else None
+        "local_index_active": local_index is not None,
+        "local_index": local_index.stats() if local_index is not None else None,
+        "embedding_model": MODEL_NAME if embedding_model else None,
+        "embedder": EMBEDDER if embedding_model else None,
+        "generation": knowledge_generation,
+        "cache": cache_stats()
     }
 
 if __name__ == "__main__":
@@ -1,12 +1,36 @@
 from fastapi import FastAPI, UploadFile, File, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
+from fastapi.responses import StreamingResponse, JSONResponse, Response
+from contextlib import asynccontextmanager, nullcontext
+from pydantic import BaseModel, Field
 from typing import List, Optional
 import uvicorn
 import os
 from datetime import datetime
+import time
+import threading
 from dotenv import load_dotenv
 
+from ingest import IngestStats, EMBED_BATCH_SIZE, UPSERT_BATCH_SIZE
+from jobs import JobQueue
+from manifest import chunk_hash, chunk_id
+from bm25 import BM25Index
+from retrieval import hybrid_search, metadata_filter
+from cache import embedding_cache, retrieval_cache, answer_cache, text_key, context_fingerprint, cache_stats
+from concurrency import llm_pool, embed_pool, vector_pool, pool_stats
+from concurrency import llm_flight, llm_stream_flight, flight_key, flight_stats
+from streaming import sse_event
+from resilience import BackendGuard
+from batching import EmbeddingBatcher
+from prompt import assemble_prompt, build_context, message_room, PromptTooLarge
+from sessions import SessionStore
+from startup import Startup
+from embedder import load_embedder, missing_dependency as missing_embedder_dependency, EMBEDDER, MODEL_NAME
+from metrics import MetricsMiddleware, render as render_metrics, CONTENT_TYPE as METRICS_CONTENT_TYPE
+from metrics import backend_errors, fallbacks, observe_llm_stream
+from metrics import embed_seconds, vector_search_seconds, keyword_search_seconds, retrieve_seconds
+from metrics import prompt_build_seconds, llm_total_seconds
+
 # Load environment variables
 load_dotenv()
 
@@ -32,15 +56,24 @@ except ImportError:
         GEMINI_AVAILABLE = False
         print("⚠️  Gemini not installed. Install with: pip install google-genai")
 
-# Sentence transformers for embeddings
-try:
-    from sentence_transformers import SentenceTransformer
-    EMBEDDINGS_AVAILABLE = True
-except ImportError:
-    EMBEDDINGS_AVAILABLE = False
-    print("⚠️  Sentence transformers not installed")
+# Sentence embeddings: SentenceTransformer, or its ONNX export with EMBEDDER=onnx
+# (loaded in the background at startup, since importing torch alone takes seconds)
+EMBEDDINGS_AVAILABLE = missing_embedder_dependency() is None
+if not EMBEDDINGS_AVAILABLE:
+    print(f"⚠️  {EMBEDDER} embedder not installed. Install with: pip install {missing_embedder_dependency()}")
+
+startup = Startup()
 
-app = FastAPI(title="Jarvis AI Assistant API")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Bind immediately and load models and clients in the background"""
+    startup.start()
+    await job_queue.start()
+    yield
+    await job_queue.stop()
+    await startup.stop()
+
+app = FastAPI(title="Jarvis AI Assistant API", lifespan=lifespan)
 
 # CORS middleware
 app.add_middleware(
@@ -50,42 +83,85 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(MetricsMiddleware)
 
 # Initialize components
 embedding_model = None
 chroma_client = None
 collection = None
 gemini_model = None
+keyword_index = BM25Index()  # BM25 over every chunk in ChromaDB
+keyword_chunks = []  # Chunk texts aligned with keyword_index document numbers
+keyword_lookup = {}  # Chunk hash -> keyword_index document numbers, for removal
+keyword_lock = threading.Lock()
+knowledge_generation = 0  # Bumped whenever chunks are stored, to invalidate cached retrievals
 
-# Initialize Gemini
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY", "")
-if GEMINI_API_KEY and GEMINI_AVAILABLE:
-    try:
-        genai.configure(api_key=GEMINI_API_KEY)
-        gemini_model = genai.GenerativeModel('gemini-2.0-flash-exp')
+GEMINI_TIMEOUT = float(os.getenv("GEMINI_TIMEOUT", "30"))  # seconds to the answer once running (streams: to each chunk)
+GEMINI_PING_TIMEOUT = float(os.getenv("GEMINI_PING_TIMEOUT", "10"))  # seconds for the startup ping
+LLM_HEDGE = os.getenv("LLM_HEDGE", "false").lower() == "true"  # send a second request after the p95 latency
+
+def configure_gemini():
+    """Configure Gemini and ping it with a token count (a failed ping is only logged)"""
+    global gemini_model
+    if not (GEMINI_API_KEY and GEMINI_AVAILABLE):
+        return False
+    genai.configure(api_key=GEMINI_API_KEY)
+    gemini_model = genai.GenerativeModel('gemini-2.0-flash-exp')
+    # The ping only checks the key and network: if it fails or hangs the
+    # model stays configured and each request is guarded by GEMINI_TIMEOUT
+    result = {}
+
+    def ping():
+        try:
+            result["tokens"] = gemini_model.count_tokens("ping")
+        except Exception as e:
+            result["error"] = e
+
+    thread = threading.Thread(target=ping, daemon=True)
+    thread.start()
+    thread.join(GEMINI_PING_TIMEOUT)
+    if "tokens" in result:
         print("✓ Gemini AI (2.0 Flash) configured successfully")
-    except Exception as e:
-        print(f"⚠️  Gemini configuration failed: {e}")
+    else:
+        print(f"⚠️  Gemini AI configured, but the ping failed: {result.get('error', f'no reply in {GEMINI_PING_TIMEOUT:g}s')}")
 
-# Initialize ChromaDB
-if CHROMA_AVAILABLE:
-    try:
-        chroma_client = chromadb.PersistentClient(path="./chroma_db")
-        collection = chroma_client.get_or_create_collection(
-            name="jarvis_knowledge",
-            metadata={"description": "JARVIS knowledge base"}
-        )
-        print("✓ ChromaDB initialized successfully")
-    except Exception as e:
-        print(f"⚠️  ChromaDB initialization failed: {e}")
+def open_chroma():
+    """Open ChromaDB and rebuild the keyword index from its documents"""
+    global chroma_client, collection
+    if not CHROMA_AVAILABLE:
+        return False
+    chroma_client = chromadb.PersistentClient(path="./chroma_db")
+    chroma_collection = chroma_client.get_or_create_collection(
+        name="jarvis_knowledge",
+        metadata={"description": "JARVIS knowledge base"}
+    )
+    
+    # Rebuild the keyword index from documents already persisted in ChromaDB
+    offset = 0
+    while True:
+        page = chroma_collection.get(include=["documents"], limit=1000, offset=offset)
+        documents = page["documents"] or []
+        index_keywords(documents)
+        if len(documents) < 1000:
+            break
+        offset += len(documents)
+    collection = chroma_collection
+    print(f"✓ ChromaDB initialized successfully ({len(keyword_chunks)} chunks)")
 
-# Initialize embedding model
-if EMBEDDINGS_AVAILABLE:
-    try:
-        embedding_model = SentenceTransformer('all-MiniLM-L6-v2')
-        print("✓ Embedding model loaded successfully")
-    except Exception as e:
-        print(f"⚠️  Failed to load embedding model: {e}")
+def load_embedding_model():
+    """Load the embedding model and run a warmup encode"""
+    global embedding_model
+    if not EMBEDDINGS_AVAILABLE:
+        return False
+    embedding_model = load_embedder()
+    print(f"✓ Embedding model loaded successfully ({EMBEDDER})")
+
+startup.register("gemini", configure_gemini)
+startup.register("chromadb", open_chroma)
+startup.register("embeddings", load_embedding_model)
+
+MAX_SEARCH_QUERIES = int(os.getenv("MAX_SEARCH_QUERIES", "1000"))  # queries per /search request
 
 # Pydantic models
 class Message(BaseModel):
@@ -95,40 +171,138 @@ class Message(BaseModel):
 class ChatRequest(BaseModel):
     message: str
     history: List[Message] = []
+    session_id: Optional[str] = None  # continue a server-side session (history is then ignored)
+    top_k: int = Field(3, ge=1, le=50)
+    vector_weight: float = Field(1.0, ge=0)
+    keyword_weight: float = Field(1.0, ge=0)
 
 class ChatResponse(BaseModel):
     response: str
     sources: Optional[List[str]] = None
+    cached: bool = False
+    prompt_tokens: Optional[int] = None
+    session_id: Optional[str] = None
+
+class SessionRequest(BaseModel):
+    history: List[Message] = []
+
+class SearchRequest(BaseModel):
+    queries: List[str] = Field(..., min_length=1, max_length=MAX_SEARCH_QUERIES)
+    top_k: int = Field(5, ge=1, le=100)
+    filename: Optional[str] = None
+    uploaded_after: Optional[datetime] = None
+    uploaded_before: Optional[datetime] = None
 
 # Helper functions
 def get_embedding(text: str):
-    """Generate embedding for text"""
+    """Generate embedding for text (cached by normalized text)"""
+    if embedding_model:
+        key = text_key(text)
+        embedding = embedding_cache.get(key)
+        if embedding is None:
+            embedding = embedding_model.encode(text).tolist()
+            embedding_cache.put(key, embedding)
+        return embedding
+    return None
+
+def get_embeddings(texts: List[str]):
+    """Generate embeddings for a batch of texts in one encode call"""
     if embedding_model:
-        return embedding_model.encode(text).tolist()
+        return embedding_model.encode(texts, batch_size=EMBED_BATCH_SIZE).tolist()
     return None
 
-def store_in_chroma(text: str, metadata: dict):
-    """Store text in ChromaDB"""
+# Query embeddings from concurrent requests share batched encode calls
+embedding_batcher = EmbeddingBatcher("query", get_embeddings, embed_pool)
+
+async def embed_queries(texts: List[str]):
+    """Cached embeddings for many queries; cache misses are encoded in one batch"""
+    with embed_seconds.time():
+        return await _embed_queries(texts)
+
+async def _embed_queries(texts: List[str]):
+    keys = [text_key(text) for text in texts]
+    embeddings = [embedding_cache.get(key) for key in keys]
+    missing = [i for i, embedding in enumerate(embeddings) if embedding is None]
+    if missing:
+        encoded = await embed_pool.run(get_embeddings, [texts[i] for i in missing])
+        for i, embedding in zip(missing, encoded):
+            embeddings[i] = embedding
+            embedding_cache.put(keys[i], embedding)
+    return embeddings
+
+async def embed_query(text: str):
+    """Cached query embedding, micro-batched with concurrent requests"""
+    if not embedding_model:
+        return None
+    key = text_key(text)
+    embedding = embedding_cache.get(key)
+    if embedding is None:
+        with embed_seconds.time():
+            embedding = await embedding_batcher.embed(text)
+        if embedding is not None:
+            embedding_cache.put(key, embedding)
+    return embedding
+
+def index_keywords(texts: List[str]):
+    """Add chunk texts to the BM25 keyword index"""
+    with keyword_lock:
+        for text in texts:
+            keyword_chunks.append(text)
+            keyword_lookup.setdefault(chunk_hash(text), []).append(keyword_index.add(text))
+
+def unindex_keywords(hashes):
+    """Remove one keyword index document per chunk hash"""
+    with keyword_lock:
+        for digest in hashes:
+            docs = keyword_lookup.get(digest)
+            if docs:
+                keyword_index.remove(docs.pop())
+                if not docs:
+                    del keyword_lookup[digest]
+
+def store_batch_in_chroma(texts: List[str], metadatas: List[dict], stats: Optional[IngestStats] = None, embeddings=None):
+    """Store a batch of texts in ChromaDB using bulk upserts"""
     if collection and embedding_model:
         try:
-            embedding = get_embedding(text)
-            doc_id = f"doc_{datetime.now().timestamp()}"
-            collection.add(
-                embeddings=[embedding],
-                documents=[text],
-                metadatas=[metadata],
-                ids=[doc_id]
-            )
-            return doc_id
+            if embeddings is None:
+                started = time.perf_counter()
+                embeddings = get_embeddings(texts)
+                if stats:
+                    stats.embed_seconds += time.perf_counter() - started
+
+            started = time.perf_counter()
+            doc_ids = [chunk_id(metadata.get('filename', ''), text) for text, metadata in zip(texts, metadatas)]
+            for start in range(0, len(texts), UPSERT_BATCH_SIZE):
+                end = start + UPSERT_BATCH_SIZE
+                collection.upsert(
+                    embeddings=embeddings[start:end],
+                    documents=texts[start:end],
+                    metadatas=metadatas[start:end],
+                    ids=doc_ids[start:end]
+                )
+            if stats:
+                stats.store_seconds += time.perf_counter() - started
+            index_keywords(texts)
+            return doc_ids
         except Exception as e:
             print(f"ChromaDB storage error: {e}")
-    return None
+            backend_errors.labels("chroma").inc()
+    return []
 
-def search_knowledge_base(query: str, top_k: int = 3):
-    """Search for relevant context in ChromaDB"""
+def delete_from_chroma(entries: dict):
+    """Delete stored chunks given {chunk hash: document id}"""
+    if collection:
+        doc_ids = list(entries.values())
+        for start in range(0, len(doc_ids), UPSERT_BATCH_SIZE):
+            collection.delete(ids=doc_ids[start:start + UPSERT_BATCH_SIZE])
+    unindex_keywords(entries.keys())
+
+def search_chroma(query: str, top_k: int = 3, query_embedding=None):
+    """Semantic search in ChromaDB"""
     if collection and embedding_model:
         try:
-            query_embedding = get_embedding(query)
+            if query_embedding is None:
+                query_embedding = get_embedding(query)
             results = collection.query(
                 query_embeddings=[query_embedding],
                 n_results=top_k
@@ -138,21 +312,152 @@ def search_knowledge_base(query: str, top_k: int = 3):
             return []
         except Exception as e:
             print(f"ChromaDB search error: {e}")
+            backend_errors.labels("chroma").inc()
     return []
 
-def get_gemini_response(prompt: str, context: str = ""):
+async def search_chroma_batch(query_embeddings, top_k: int, flt: Optional[dict] = None):
+    """One multi-query ChromaDB call; returns matches with scores and metadata"""
+    results = await vector_pool.run(
+        collection.query,
+        query_embeddings=query_embeddings,
+        n_results=top_k,
+        where=flt,
+        include=["documents", "metadatas", "distances"]
+    )
+    # The collection uses squared L2 distance; on the model's unit-length
+    # embeddings 1 - d/2 is the cosine similarity
+    return [
+        [{'id': doc_id, 'score': 1 - distance / 2, 'text': text, 'metadata': metadata}
+         for doc_id, text, metadata, distance in zip(ids, texts, metadatas, distances)]
+        for ids, texts, metadatas, distances in zip(
+            results['ids'], results['documents'], results['metadatas'], results['distances']
+        )
+    ]
+
+def search_keywords(query: str, top_k: int = 3):
+    """BM25 keyword search over every stored chunk"""
+    return [keyword_chunks[doc] for doc, _ in keyword_index.search(query, top_k)]
+
+GEMINI_DEMO_RESPONSE = "I'm running in demo mode. To enable full AI capabilities, please add your Gemini API key to the .env file."
+
+def gemini_error_response(e: Exception):
+    print(f"Gemini error: {e}")
+    backend_errors.labels("gemini").inc()
+    return f"⚠️ Gemini API error: {str(e)}. Please check your API key."
+
+def gemini_generate(prompt: str, context: str = ""):
+    """One blocking Gemini completion"""
+    return gemini_model.generate_content(assemble_prompt(prompt, context)).text
+
+def gemini_generate_stream(prompt: str, context: str = ""):
+    """Yield Gemini response text as it is generated"""
+    for chunk in gemini_model.generate_content(assemble_prompt(prompt, context), stream=True):
+        if chunk.text:
+            yield chunk.text
+
+# Deadline, optional hedging and circuit breaking for every Gemini call
+llm_guard = BackendGuard("gemini", llm_pool, GEMINI_TIMEOUT, hedge=LLM_HEDGE)
+
+async def get_gemini_response(prompt: str, context: str = ""):
     """Get response from Gemini AI"""
-    if gemini_model:
-        try:
-            full_prompt = f"{context}\n\nUser: {prompt}\nAssistant:" if context else prompt
-            response = gemini_model.generate_content(full_prompt)
-            return response.text
-        except Exception as e:
-            print(f"Gemini error: {e}")
-            return f"⚠️ Gemini API error: {str(e)}. Please check your API key."
-    
-    # Fallback response
-    return "I'm running in demo mode. To enable full AI capabilities, please add your Gemini API key to the .env file."
+    if not gemini_model:
+        fallbacks.labels("gemini", "demo").inc()
+        return GEMINI_DEMO_RESPONSE
+    try:
+        with llm_total_seconds.time():
+            return await llm_guard.run(gemini_generate, prompt, context)
+    except Exception as e:
+        return gemini_error_response(e)
+
+async def stream_gemini_response(prompt: str, context: str = ""):
+    """Yield response text from Gemini AI as it is generated"""
+    if not gemini_model:
+        fallbacks.labels("gemini", "demo").inc()
+        yield GEMINI_DEMO_RESPONSE
+        return
+    try:
+        async for chunk in observe_llm_stream(llm_guard.stream(gemini_generate_stream, prompt, context)):
+            yield chunk
+    except Exception as e:
+        yield gemini_error_response(e)
+
+async def retrieve_context(query: str, top_k: int = 3, vector_weight: float = 1.0, keyword_weight: float = 1.0):
+    """Hybrid retrieval: Chroma and BM25 legs run concurrently, fused by rank"""
+    async def vector_leg(n: int):
+        if not (collection and embedding_model):
+            return []
+        query_embedding = await embed_query(query)
+        with vector_search_seconds.time():
+            return await vector_pool.run(search_chroma, query, n, query_embedding)
+
+    async def keyword_leg(n: int):
+        with keyword_search_seconds.time():
+            return await vector_pool.run(search_keywords, query, n)
+
+    cache_key = (text_key(query), top_k, vector_weight, keyword_weight, knowledge_generation)
+    cached = retrieval_cache.get(cache_key)
+    if cached is not None:
+        return cached
+    with retrieve_seconds.time():
+        docs, complete = await hybrid_search(vector_leg, keyword_leg, top_k, vector_weight, keyword_weight)
+    if complete:
+        retrieval_cache.put(cache_key, docs)
+    return docs
+
+def build_full_context(context_docs: List[str], history: List[Message], message: str):
+    """Combine retrieved context and recent conversation history within the
+    prompt token budget; returns (context, prompt tokens)"""
+    return build_context(context_docs, [(msg.role, msg.content) for msg in history], message)
+
+def build_turn_context(context_docs: List[str], request: ChatRequest, session=None):
+    """Prompt context for one turn, using the session's history when there is one"""
+    if session is None:
+        return build_full_context(context_docs, request.history, request.message)
+    return build_context(context_docs, session.history, request.message)
+
+def check_message_size(message: str):
+    """Reject a message that alone exceeds the prompt budget, before any retrieval"""
+    try:
+        message_room(message)
+    except PromptTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+
+def open_session(session_id: Optional[str]):
+    """The request's session, or None for stateless requests"""
+    if session_id is None:
+        return None
+    session = sessions.get(session_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Session not found or expired")
+    return session
+
+async def answer_cache_key(request: ChatRequest, context_docs: List[str], session=None):
+    """Answer cache lookup key, or None when the cache must be bypassed"""
+    if answer_cache is None or request.history or (session is not None and session.history):
+        return None
+    query_embedding = await embed_query(request.message)
+    if query_embedding is None:
+        return None
+    return (query_embedding, context_fingerprint(context_docs), knowledge_generation)
+
+def is_cacheable_answer(response: str):
+    """Only real model answers are cached, never errors or demo fallbacks"""
+    return gemini_model is not None and bool(response) and not response.startswith("⚠️")
+
+def format_sources(context_docs: List[str]):
+    """Short source previews for the response"""
+    return [doc[:100] + "..." for doc in context_docs] if context_docs else None
+
+sessions = SessionStore()
+
+def bump_knowledge_generation():
+    """Invalidate cached retrievals after new chunks are stored"""
+    global knowledge_generation
+    knowledge_generation += 1
+
+job_queue = JobQueue(store_batch_in_chroma, delete_chunks=delete_from_chroma,
+                     on_progress=bump_knowledge_generation,
+                     ready=lambda: startup.wait(["embeddings", "chromadb"]))
 
 # API Routes
 @app.get("/health")
@@ -160,72 +465,242 @@ async def health_check():
     """Health check endpoint"""
     return {
         "status": "healthy",
+        "ready": startup.ready,
         "gemini": gemini_model is not None,
         "chromadb": collection is not None,
         "embeddings": embedding_model is not None,
+        "pools": pool_stats(),
+        "inflight": flight_stats(),
+        "embedding_batches": embedding_batcher.stats(),
+        "llm": llm_guard.stats(),
+        "sessions": sessions.stats(),
         "timestamp": datetime.now().isoformat()
     }
 
+@app.get("/metrics")
+async def metrics():
+    """Prometheus metrics: stage latencies, backend errors and fallbacks, ingestion, in-flight requests"""
+    return Response(render_metrics(), media_type=METRICS_CONTENT_TYPE)
+
+@app.get("/ready")
+async def readiness_check():
+    """Readiness endpoint: 503 until every component has finished loading"""
+    report = startup.report()
+    return JSONResponse(report, status_code=200 if report["ready"] else 503)
+
 @app.post("/chat", response_model=ChatResponse)
 async def chat(request: ChatRequest):
     """Main chat endpoint with RAG"""
+    check_message_size(request.message)
+    session = open_session(request.session_id)
+    async with session.lock if session else nullcontext():
+        try:
+            # Search knowledge base for relevant context
+            context_docs = await retrieve_context(
+                request.message, request.top_k, request.vector_weight, request.keyword_weight
+            )
+            with prompt_build_seconds.time():
+                full_context, prompt_tokens = build_turn_context(context_docs, request, session)
+            
+            # Serve near-duplicate questions from the answer cache
+            cache_key = await answer_cache_key(request, context_docs, session)
+            if cache_key:
+                cached_answer = answer_cache.get(*cache_key)
+                if cached_answer is not None:
+                    if session is not None:
+                        session.record(request.message, cached_answer)
+                    return ChatResponse(response=cached_answer, sources=format_sources(context_docs), cached=True,
+                                        prompt_tokens=prompt_tokens, session_id=request.session_id)
+            
+            # Get Gemini response
+            # Identical prompts already in flight share one model call
+            response = await llm_flight.do(
+                flight_key(full_context, request.message),
+                lambda: get_gemini_response(request.message, full_context)
+            )
+            if cache_key and is_cacheable_answer(response):
+                answer_cache.put(*cache_key, response)
+            if session is not None and is_cacheable_answer(response):
+                session.record(request.message, response)
+            
+            return ChatResponse(
+                response=response,
+                sources=format_sources(context_docs),
+                prompt_tokens=prompt_tokens,
+                session_id=request.session_id
+            )
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/chat/stream")
+async def chat_stream(request: ChatRequest):
+    """Streaming chat endpoint (Server-Sent Events).
+
+    Emits a `sources` event first, then one `token` event per generated
+    piece of text, and finally a `done` event with the full response and
+    timing stats.
+    """
+    started = time.perf_counter()
+    check_message_size(request.message)
+    session = open_session(request.session_id)
     try:
-        # Search knowledge base for relevant context
-        context_docs = search_knowledge_base(request.message)
-        context = "\n\n".join([f"Context: {doc}" for doc in context_docs]) if context_docs else ""
-        
-        # Build conversation history
-        history_text = "\n".join([
-            f"{msg.role.capitalize()}: {msg.content}" 
-            for msg in request.history[-5:]  # Last 5 messages
-        ])
-        
-        # Combine context and history
-        full_context = f"{context}\n\nConversation History:\n{history_text}" if history_text else context
-        
-        # Get Gemini response
-        response = get_gemini_response(request.message, full_context)
-        
-        return ChatResponse(
-            response=response,
-            sources=[doc[:100] + "..." for doc in context_docs] if context_docs else None
+        context_docs = await retrieve_context(
+            request.message, request.top_k, request.vector_weight, request.keyword_weight
         )
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+    retrieval_seconds = time.perf_counter() - started
+
+    async def events():
+        yield sse_event("sources", {"sources": format_sources(context_docs)})
+        parts = []
+        first_token_at = None
+        prompt_tokens = None
+        cached = False
+        # Turns of one session run one at a time, each continuing the last
+        async with session.lock if session else nullcontext():
+            try:
+                with prompt_build_seconds.time():
+                    full_context, prompt_tokens = build_turn_context(context_docs, request, session)
+                cache_key = await answer_cache_key(request, context_docs, session)
+                cached_answer = answer_cache.get(*cache_key) if cache_key else None
+                cached = cached_answer is not None
+                if cached:
+                    first_token_at = time.perf_counter()
+                    parts.append(cached_answer)
+                    yield sse_event("token", {"token": cached_answer})
+                else:
+                    tokens = llm_stream_flight.subscribe(
+                        flight_key(full_context, request.message),
+                        lambda: stream_gemini_response(request.message, full_context)
+                    )
+                    async for token in tokens:
+                        if first_token_at is None:
+                            first_token_at = time.perf_counter()
+                        parts.append(token)
+                        yield sse_event("token", {"token": token})
+                response = "".join(parts)
+                if cache_key and not cached and is_cacheable_answer(response):
+                    answer_cache.put(*cache_key, response)
+                if session is not None and is_cacheable_answer(response):
+                    session.record(request.message, response)
+            except Exception as e:
+                yield sse_event("error", {"detail": str(e)})
+        yield sse_event("done", {
+            "response": "".join(parts),
+            "cached": cached,
+            "tokens": len(parts),
+            "prompt_tokens": prompt_tokens,
+            "session_id": request.session_id,
+            "retrieval_seconds": round(retrieval_seconds, 4),
+            "time_to_first_token": round(first_token_at - started, 4) if first_token_at else None,
+            "total_seconds": round(time.perf_counter() - started, 4)
+        })
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.post("/search")
+async def search(request: SearchRequest):
+    """Retrieval only: ranked chunks with scores and metadata for many queries.
+
+    All queries are embedded in one batch and sent as one multi-query
+    search; optional filters restrict results by filename and upload time.
+    """
+    started = time.perf_counter()
+    flt = metadata_filter(
+        request.filename,
+        request.uploaded_after.timestamp() if request.uploaded_after else None,
+        request.uploaded_before.timestamp() if request.uploaded_before else None
+    )
+    try:
+        if collection and embedding_model:
+            embeddings = await embed_queries(request.queries)
+            with vector_search_seconds.time():
+                results = await search_chroma_batch(embeddings, request.top_k, flt)
+            backend = "chromadb"
+        else:
+            if flt:
+                raise HTTPException(status_code=503, detail="Metadata filters need a vector store")
+            results = [
+                [{'id': doc, 'score': score, 'text': keyword_chunks[doc], 'metadata': None}
+                 for doc, score in await vector_pool.run(keyword_index.search, query, request.top_k)]
+                for query in request.queries
+            ]
+            backend = "keyword"
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Search failed: {str(e)}")
+    return {
+        "backend": backend,
+        "results": [{"query": query, "matches": matches} for query, matches in zip(request.queries, results)],
+        "seconds": round(time.perf_counter() - started, 4)
+    }
+
+@app.post("/sessions")
+async def create_session(request: SessionRequest = SessionRequest()):
+    """Start a server-side conversation; pass its session_id to /chat"""
+    session = sessions.create([(msg.role, msg.content) for msg in request.history])
+    return {"session_id": session.id, "ttl_seconds": sessions.ttl}
+
+@app.get("/sessions/{session_id}")
+async def get_session(session_id: str):
+    """Stored history of a session"""
+    session = open_session(session_id)
+    return {
+        "session_id": session.id,
+        "turns": session.turns,
+        "history": [{"role": role, "content": content} for role, content in session.history]
+    }
+
+@app.delete("/sessions/{session_id}")
+async def delete_session(session_id: str):
+    if not sessions.delete(session_id):
+        raise HTTPException(status_code=404, detail="Session not found or expired")
+    return {"deleted": session_id}
 
 @app.post("/upload")
-async def upload_file(file: UploadFile = File(...)):
-    """Upload and process documents for knowledge base"""
+async def upload_file(file: UploadFile = File(...), wait: bool = False):
+    """Upload a document; it is spooled to disk and ingested in the background.
+
+    Returns a job id right away (poll GET /jobs/{id}), or with `?wait=true`
+    waits for ingestion to finish and returns the final counts.
+    """
     try:
-        # Read file content
-        content = await file.read()
-        text = content.decode('utf-8', errors='ignore')
-        
-        # Split into chunks (simple chunking)
-        chunks = [text[i:i+500] for i in range(0, len(text), 500)]
-        
-        # Store each chunk
-        doc_ids = []
-        for i, chunk in enumerate(chunks):
-            if chunk.strip():
-                doc_id = store_in_chroma(
-                    chunk,
-                    {
-                        'filename': file.filename,
-                        'chunk': i,
-                        'timestamp': datetime.now().isoformat()
-                    }
-                )
-                if doc_id:
-                    doc_ids.append(doc_id)
-        
-        return {
-            "message": f"Successfully processed {file.filename}",
-            "chunks": len(doc_ids),
-            "id": doc_ids[0] if doc_ids else None
-        }
+        job = await job_queue.submit(file)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Upload failed: {str(e)}")
+    
+    if not wait:
+        return {
+            "message": f"Queued {file.filename} for processing",
+            "id": job.id,
+            "job_id": job.id,
+            "status": job.status
+        }
+    
+    job = await job_queue.wait(job.id)
+    if job.status == "failed":
+        raise HTTPException(status_code=500, detail=f"Upload failed: {job.error}")
+    return {
+        "message": f"Successfully processed {file.filename}",
+        "chunks": job.chunks_done,
+        "id": job.first_id,
+        "job_id": job.id,
+        "throughput": job.throughput
+    }
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    """Ingestion job progress: chunks done, throughput and errors"""
+    job = job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job_queue.report(job)
 
 @app.get("/knowledge")
 async def get_knowledge():
@@ -240,7 +715,10 @@ async def get_knowledge():
     return {
         "total_documents": doc_count,
         "vector_db_active": collection is not None,
-        "embedding_model": "all-MiniLM-L6-v2" if embedding_model else None
+        "embedding_model": MODEL_NAME if embedding_model else None,
+        "embedder": EMBEDDER if embedding_model else None,
+        "generation": knowledge_generation,
+        "cache": cache_stats()
     }
 
 if __name__ == "__main__":
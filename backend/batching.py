@@ -0,0 +1,102 @@
+"""Dynamic micro-batching of query embeddings across concurrent requests"""
+import asyncio
+import os
+import time
+from collections import deque
+from typing import Callable, List, Optional
+
+from concurrency import BackendPool
+
+# Micro-batching tuning (override via environment)
+EMBED_MAX_BATCH = int(os.getenv("EMBED_MAX_BATCH", "32"))  # texts per encode call
+EMBED_MAX_WAIT_MS = float(os.getenv("EMBED_MAX_WAIT_MS", "5"))  # how long the first text may wait for company
+STATS_WINDOW = 1000  # recent batches kept for percentiles
+
+
+def _percentile(values, fraction: float):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+class EmbeddingBatcher:
+    """Collects concurrent single-text embed calls into batched encodes.
+
+    The first text to arrive starts a `max_wait` timer; the batch is
+    flushed when the timer fires or `max_batch` texts are waiting,
+    whichever comes first. One `encode_batch(texts)` call then runs in
+    `pool` and each caller's future is resolved with its own row.
+    Identical texts in the same batch are encoded once.
+    """
+
+    def __init__(self, name: str, encode_batch: Callable[[List[str]], Optional[list]], pool: BackendPool,
+                 max_batch: int = EMBED_MAX_BATCH, max_wait_ms: float = EMBED_MAX_WAIT_MS):
+        self.name = name
+        self.encode_batch = encode_batch
+        self.pool = pool
+        self.max_batch = max(1, max_batch)
+        self.max_wait = max(0.0, max_wait_ms) / 1000
+        self._pending = []  # (text, future, enqueued at)
+        self._timer = None
+        self.batches = 0
+        self.items = 0
+        self.max_batch_seen = 0
+        self._sizes = deque(maxlen=STATS_WINDOW)
+        self._waits = deque(maxlen=STATS_WINDOW)
+
+    async def embed(self, text: str):
+        """Embedding for one text, encoded together with concurrent callers"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((text, future, time.perf_counter()))
+        if len(self._pending) >= self.max_batch:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait, self._flush)
+        return await future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending[:self.max_batch], self._pending[self.max_batch:]
+        if self._pending:
+            self._timer = asyncio.get_running_loop().call_later(self.max_wait, self._flush)
+        if batch:
+            asyncio.ensure_future(self._run(batch))
+
+    async def _run(self, batch):
+        now = time.perf_counter()
+        texts = list(dict.fromkeys(text for text, _, _ in batch))
+        self.batches += 1
+        self.items += len(batch)
+        self.max_batch_seen = max(self.max_batch_seen, len(batch))
+        self._sizes.append(len(batch))
+        self._waits.extend(now - enqueued for _, _, enqueued in batch)
+        try:
+            embeddings = await self.pool.run(self.encode_batch, texts)
+        except Exception as e:
+            for _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        rows = dict(zip(texts, embeddings)) if embeddings is not None else {}
+        for text, future, _ in batch:
+            if not future.done():
+                future.set_result(rows.get(text))
+
+    def stats(self) -> dict:
+        waits = list(self._waits)
+        return {
+            "max_batch": self.max_batch,
+            "max_wait_ms": self.max_wait * 1000,
+            "pending": len(self._pending),
+            "batches": self.batches,
+            "items": self.items,
+            "mean_batch_size": round(self.items / self.batches, 2) if self.batches else None,
+            "p95_batch_size": _percentile(self._sizes, 0.95),
+            "max_batch_size": self.max_batch_seen,
+            "p50_queue_ms": round(_percentile(waits, 0.5) * 1000, 3) if waits else None,
+            "p95_queue_ms": round(_percentile(waits, 0.95) * 1000, 3) if waits else None,
+        }
@@ -0,0 +1,111 @@
+"""Compare embedders: load time, query latency, batch throughput and
+agreement with the SentenceTransformer vectors.
+
+Usage (from backend/):
+    python bench_embedder.py                              # every embedder that is installed/exported
+    python bench_embedder.py --threads 4 --texts 2000
+    python bench_embedder.py --from ../docs/manual.txt     # chunks of a real document
+
+Texts are a mix of short queries and passages up to CHUNK_SIZE characters
+(or the chunks of --from). They are encoded in batches of --batch-size, as
+/upload does, and --queries of them are encoded one at a time, as a chat
+query is. "cos min/mean" is the cosine similarity between each vector and
+SentenceTransformer's vector for the same text (1.0 means identical).
+"""
+import argparse
+import random
+import sys
+import time
+
+import numpy as np
+
+from embedder import OnnxEmbedder, MODEL_NAME, ONNX_PATH, THREADS, ONNX_MODEL_FILE, ONNX_INT8_FILE, missing_dependency
+from ingest import iter_file_chunks, CHUNK_SIZE, EMBED_BATCH_SIZE
+
+WORDS = (
+    "the a of to and in is for on with that this as are be by from at it an or not have was can will "
+    "document system memory server index query vector search model answer upload battery engine network "
+    "schedule report policy budget update release customer invoice storage latency request response error"
+).split()
+
+
+def synthetic_texts(count: int, seed: int = 0):
+    """Queries of 4-16 words and passages of up to CHUNK_SIZE characters"""
+    rng = random.Random(seed)
+    texts = []
+    for i in range(count):
+        words = rng.randint(4, 16) if i % 4 == 0 else rng.randint(20, CHUNK_SIZE // 6)
+        texts.append(" ".join(rng.choice(WORDS) for _ in range(words)).capitalize() + ".")
+    return texts
+
+
+def file_texts(path: str, count: int):
+    with open(path, "rb") as f:
+        chunks = [chunk for _, chunk in iter_file_chunks(f) if chunk.strip()]
+    return chunks[:count]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark SentenceTransformer against ONNX embedders")
+    parser.add_argument("--texts", type=int, default=1000, help="texts encoded in batches")
+    parser.add_argument("--queries", type=int, default=100, help="texts encoded one at a time")
+    parser.add_argument("--batch-size", type=int, default=EMBED_BATCH_SIZE)
+    parser.add_argument("--threads", type=int, default=THREADS, help="threads per encode call (0 = one per core)")
+    parser.add_argument("--from", dest="source", help="use the chunks of this text file")
+    parser.add_argument("--model", default=MODEL_NAME, help="SentenceTransformer model name or directory")
+    parser.add_argument("--onnx-path", default=ONNX_PATH, help="exported ONNX model directory")
+    args = parser.parse_args(argv)
+
+    texts = file_texts(args.source, args.texts) if args.source else synthetic_texts(args.texts)
+    print(f"{len(texts)} texts, batch size {args.batch_size}, {args.queries} single queries, threads {args.threads or 'auto'}")
+    print(f"{'embedder':<24}{'load s':>8}{'ms/query':>10}{'texts/s':>10}{'cos min':>10}{'cos mean':>10}")
+
+    def load_sentence_transformer():
+        import torch
+        from sentence_transformers import SentenceTransformer
+        if args.threads:
+            torch.set_num_threads(args.threads)
+        return SentenceTransformer(args.model, device="cpu")
+
+    embedders = [
+        ("sentence-transformers", "sentence-transformers", load_sentence_transformer),
+        (f"onnx ({ONNX_MODEL_FILE})", "onnx", lambda: OnnxEmbedder(args.onnx_path, int8=False, threads=args.threads)),
+        (f"onnx ({ONNX_INT8_FILE})", "onnx", lambda: OnnxEmbedder(args.onnx_path, int8=True, threads=args.threads)),
+    ]
+    reference = None
+    for name, kind, load in embedders:
+        missing = missing_dependency(kind)
+        if missing:
+            print(f"{name:<24}skipped: pip install {missing}")
+            continue
+        started = time.perf_counter()
+        try:
+            model = load()
+            model.encode(["warmup"])
+        except (OSError, ValueError) as e:
+            print(f"{name:<24}skipped: {e}")
+            continue
+        load_seconds = time.perf_counter() - started
+
+        latencies = []
+        for text in texts[:args.queries]:
+            started = time.perf_counter()
+            model.encode(text)
+            latencies.append(time.perf_counter() - started)
+        started = time.perf_counter()
+        vectors = np.asarray(model.encode(texts, batch_size=args.batch_size), dtype=np.float32)
+        rate = len(texts) / (time.perf_counter() - started)
+
+        if kind == "sentence-transformers":
+            reference = vectors
+        if reference is not None:
+            similarity = np.sum(vectors * reference, axis=1)  # both L2-normalized
+            agreement = f"{similarity.min():>10.4f}{similarity.mean():>10.4f}"
+        else:
+            agreement = f"{'-':>10}{'-':>10}"
+        print(f"{name:<24}{load_seconds:>8.2f}{np.median(latencies) * 1000:>10.2f}{rate:>10.1f}{agreement}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,95 @@
+"""Compare local index storage modes: memory per chunk, recall@k and latency.
+
+Usage (from backend/):
+    python bench_local_index.py                      # 100k synthetic chunks
+    python bench_local_index.py --chunks 500000 --k 5
+    python bench_local_index.py --from ./local_index  # vectors of a real index
+
+Each mode (float32, float16, int8, with and without full-precision
+re-scoring) gets its own temporary index over the same vectors, followed
+by the IVF index at each --nprobe setting. Queries are perturbed copies
+of stored vectors; recall@k is the fraction of the exact float32 top-k
+that a mode returns.
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from local_index import LocalVectorIndex, normalize_rows, top_k_indices, EMBEDDING_DIM, QUANTIZATION, RESCORE_FACTOR
+from ann import IVFIndex
+
+# (quantization, rescore factor)
+MODES = [("float32", 0), ("float16", 0), ("float16", 4), ("int8", 0), ("int8", 4)]
+
+
+def synthetic_vectors(count: int, dim: int, seed: int = 0) -> np.ndarray:
+    """Clustered unit vectors, roughly the shape of sentence embeddings"""
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((max(1, count // 100), dim)).astype(np.float32)
+    vectors = centers[rng.integers(0, len(centers), count)]
+    vectors += 0.6 * rng.standard_normal((count, dim)).astype(np.float32)
+    return normalize_rows(vectors)
+
+
+def stored_vectors(path: str) -> np.ndarray:
+    with open(os.path.join(path, "meta.json")) as f:
+        count = json.load(f)["count"]
+    return normalize_rows(np.load(os.path.join(path, "vectors.npy"), mmap_mode="r")[:count].astype(np.float32))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark local index quantization modes")
+    parser.add_argument("--chunks", type=int, default=100_000, help="synthetic chunks (ignored with --from)")
+    parser.add_argument("--from", dest="source", help="read vectors from an existing local index directory")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--nprobe", default="4,16,64", help="comma-separated IVF nprobe values")
+    parser.add_argument("--ann-quantization", default=QUANTIZATION, help="storage mode for the IVF runs")
+    args = parser.parse_args(argv)
+
+    vectors = stored_vectors(args.source) if args.source else synthetic_vectors(args.chunks, EMBEDDING_DIM)
+    rng = np.random.default_rng(1)
+    queries = vectors[rng.integers(0, len(vectors), args.queries)]
+    queries = normalize_rows(queries + 0.3 * rng.standard_normal(queries.shape).astype(np.float32) / np.sqrt(queries.shape[1]))
+    exact = [set(top_k_indices(scores, args.k).tolist()) for scores in queries @ vectors.T]
+    print(f"{len(vectors)} chunks x {vectors.shape[1]} dims, {len(queries)} queries, k={args.k}")
+    print(f"{'mode':<16}{'rescore':>8}{'bytes/chunk':>13}{'MB':>9}{'recall@k':>10}{'ms/query':>10}")
+
+    def run(name: str, index: LocalVectorIndex):
+        index.search(queries[0], args.k)  # fault the scanned pages in
+        started = time.perf_counter()
+        results = [index.search(query, args.k) for query in queries]
+        seconds = time.perf_counter() - started
+        recall = np.mean([len(exact[i] & {row for row, _ in result}) / args.k for i, result in enumerate(results)])
+        stats = index.stats()
+        print(f"{name:<16}{stats['rescore']:>8}{stats['bytes_per_chunk']:>13}"
+              f"{stats['bytes_per_chunk'] * len(vectors) / 1e6:>9.1f}{recall:>10.3f}{seconds * 1000 / len(queries):>10.2f}")
+
+    def build(path: str, quantization: str, rescore: int) -> LocalVectorIndex:
+        index = LocalVectorIndex(dim=vectors.shape[1], path=path, quantization=quantization, rescore=rescore)
+        for start in range(0, len(vectors), 65536):
+            batch = vectors[start:start + 65536]
+            index.add(batch, [""] * len(batch), [{}] * len(batch))
+        return index
+
+    for quantization, rescore in MODES:
+        with tempfile.TemporaryDirectory() as path:
+            run(quantization, build(path, quantization, rescore))
+
+    with tempfile.TemporaryDirectory() as path:
+        index = build(path, args.ann_quantization, RESCORE_FACTOR)
+        index.ann = IVFIndex(index, min_rows=len(vectors) + 1)  # no background training
+        index.ann.rebuild()
+        for nprobe in (int(value) for value in args.nprobe.split(",")):
+            index.ann.nprobe = nprobe
+            run(f"ivf nprobe={nprobe}", index)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,100 @@
+"""Incremental BM25 inverted index for keyword retrieval"""
+import heapq
+import math
+import re
+import threading
+from array import array
+from collections import Counter
+from typing import Dict, List, Tuple
+
+TOKEN_RE = re.compile(r"\w+")
+
+# Very common English words carry no ranking signal but have the longest
+# postings lists, so they are dropped at index and query time.
+STOPWORDS = frozenset("""
+a an and are as at be but by for from has have he her his i if in into is it its
+me my of on or our she so that the their them they this to was we were what when
+where which who will with you your
+""".split())
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase word tokens with stopwords removed"""
+    return [token for token in TOKEN_RE.findall(text.lower()) if token not in STOPWORDS]
+
+
+class BM25Index:
+    """Okapi BM25 over an append-only document set.
+
+    Each term maps to two parallel postings arrays (document number, term
+    frequency). Documents are numbered in insertion order, so callers can
+    keep their own list of texts aligned with the index. A query only
+    touches the postings of its own terms and keeps the best `top_k` with
+    a heap, so cost scales with the query's postings, not the corpus.
+    Removal is lazy: removed documents are skipped at query time and drop
+    out of the length statistics, but their postings stay in place.
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.postings: Dict[str, Tuple[array, array]] = {}
+        self.doc_lengths = array("i")
+        self.total_length = 0
+        self.removed = set()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.doc_lengths) - len(self.removed)
+
+    @property
+    def next_doc(self) -> int:
+        """Document number the next add() will return"""
+        return len(self.doc_lengths)
+
+    def add(self, text: str) -> int:
+        """Index one document and return its document number"""
+        counts = Counter(tokenize(text))
+        with self._lock:
+            doc = len(self.doc_lengths)
+            length = sum(counts.values())
+            self.doc_lengths.append(length)
+            self.total_length += length
+            for term, tf in counts.items():
+                entry = self.postings.get(term)
+                if entry is None:
+                    entry = self.postings[term] = (array("i"), array("i"))
+                entry[0].append(doc)
+                entry[1].append(tf)
+        return doc
+
+    def remove(self, doc: int):
+        """Exclude a document from future results"""
+        with self._lock:
+            if doc not in self.removed and 0 <= doc < len(self.doc_lengths):
+                self.removed.add(doc)
+                self.total_length -= self.doc_lengths[doc]
+
+    def search(self, query: str, top_k: int = 3) -> List[Tuple[int, float]]:
+        """BM25 top-k; returns (document number, score) pairs, best first"""
+        n_docs = len(self)
+        if n_docs <= 0 or top_k <= 0:
+            return []
+        avg_length = (self.total_length / n_docs) or 1.0
+        k1, b = self.k1, self.b
+        doc_lengths = self.doc_lengths
+        removed = self.removed
+        scores: Dict[int, float] = {}
+        for term in set(tokenize(query)):
+            entry = self.postings.get(term)
+            if entry is None:
+                continue
+            docs, tfs = entry
+            df = len(docs)
+            idf = math.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+            for doc, tf in zip(docs, tfs):
+                if doc in removed:
+                    continue
+                norm = k1 * (1 - b + b * doc_lengths[doc] / avg_length)
+                scores[doc] = scores.get(doc, 0.0) + idf * tf * (k1 + 1) / (tf + norm)
+        return heapq.nlargest(top_k, scores.items(), key=lambda item: item[1])
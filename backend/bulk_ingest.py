@@ -0,0 +1,203 @@
+"""Bulk-ingest a directory of text documents into a JARVIS backend's store.
+
+Usage (from backend/):
+    python bulk_ingest.py ../docs
+    python bulk_ingest.py ../docs --backend app_gemini --pattern "*.md" --workers 8
+
+Files are read and chunked in a process pool, chunks are embedded in large
+batches, and each batch is bulk-written with the backend's own store
+function while the next batch is being embedded. Chunks are recorded in
+the same per-file manifests as /upload, so re-running skips everything
+already stored (the run is resumable) and only changed chunks of edited
+files are re-embedded. Files are identified by their path relative to the
+directory. It can run while the server is up: writes to the local index
+are serialized between processes and the server picks up new chunks on
+its next query.
+"""
+import argparse
+import fnmatch
+import importlib
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, Iterator, List, Tuple
+
+from ingest import iter_file_chunks, IngestStats, CHUNK_SIZE
+from manifest import ChunkManifest, chunk_hash
+
+# Components each backend needs for ingestion (the LLM is never loaded)
+STORE_COMPONENTS = {
+    "app": (["embeddings", "pinecone", "local_index"], "store_batch_in_vector_db", "delete_from_vector_db"),
+    "app_gemini": (["embeddings", "chromadb"], "store_batch_in_chroma", "delete_from_chroma"),
+}
+
+
+def chunk_file(path: str, size: int = CHUNK_SIZE) -> Tuple[str, int, List[Tuple[int, str, str]]]:
+    """Read and chunk one file; runs in a worker process.
+    Returns (path, bytes read, [(index, chunk, hash)]) for non-blank chunks."""
+    with open(path, "rb") as f:
+        chunks = [(index, chunk, chunk_hash(chunk)) for index, chunk in iter_file_chunks(f, size) if chunk.strip()]
+    return path, os.path.getsize(path), chunks
+
+
+def find_files(root: str, pattern: str) -> Iterator[str]:
+    for directory, _, names in os.walk(root):
+        for name in sorted(names):
+            if fnmatch.fnmatch(name, pattern):
+                yield os.path.join(directory, name)
+
+
+def chunk_files(pool: ProcessPoolExecutor, paths: List[str], window: int):
+    """Chunk files in the pool, in order, with at most `window` files in flight"""
+    futures = deque()
+    for path in paths:
+        futures.append(pool.submit(chunk_file, path))
+        if len(futures) >= window:
+            yield futures.popleft().result()
+    while futures:
+        yield futures.popleft().result()
+
+
+class Throughput:
+    """Per-stage counters, printed as items/second of each stage's busy time"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.files = 0
+        self.bytes = 0
+        self.chunks_read = 0
+        self.chunks_skipped = 0
+        self.chunks_deleted = 0
+        self.embed = IngestStats()  # chunks embedded, embed seconds
+        self.store = IngestStats()  # chunks stored, store seconds
+
+    def report(self) -> str:
+        elapsed = time.perf_counter() - self.started
+        embed_rate = self.embed.chunks / self.embed.embed_seconds if self.embed.embed_seconds else 0
+        store_rate = self.store.chunks / self.store.store_seconds if self.store.store_seconds else 0
+        return (
+            f"read {self.files} files / {self.bytes / 1e6:.1f} MB ({self.bytes / 1e6 / elapsed:.2f} MB/s), "
+            f"{self.chunks_read} chunks, {self.chunks_skipped} unchanged | "
+            f"embed {self.embed.chunks} ({embed_rate:.0f}/s) | "
+            f"store {self.store.chunks} ({store_rate:.0f}/s), {self.chunks_deleted} deleted | "
+            f"{elapsed:.1f}s elapsed"
+        )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Bulk-ingest a directory of documents")
+    parser.add_argument("directory")
+    parser.add_argument("--backend", choices=sorted(STORE_COMPONENTS), default="app")
+    parser.add_argument("--pattern", default="*.txt", help="filename glob (default: *.txt)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="chunking processes")
+    parser.add_argument("--batch-size", type=int, default=512, help="chunks per embed/store batch")
+    args = parser.parse_args(argv)
+
+    backend = importlib.import_module(args.backend)
+    components, store_name, delete_name = STORE_COMPONENTS[args.backend]
+    statuses = backend.startup.load(components)
+    if not backend.embedding_model or not any(statuses.get(name) == "ready" for name in components[1:]):
+        print(f"⚠️  No embedding model or vector store available ({statuses}); nothing to ingest into.")
+        return 1
+    store_batch = getattr(backend, store_name)
+    delete_chunks = getattr(backend, delete_name)
+
+    root = os.path.abspath(args.directory)
+    paths = list(find_files(root, args.pattern))
+    print(f"✓ Ingesting {len(paths)} file(s) from {root} into {args.backend}")
+
+    stats = Throughput()
+    uploaded = datetime.now()
+    manifests: Dict[str, ChunkManifest] = {}
+    remaining: Dict[str, int] = {}  # chunks per file still waiting to be stored
+    seen: Dict[str, set] = {}
+    pending: List[Tuple[str, int, str, str]] = []  # (file, index, chunk, hash)
+    writer = ThreadPoolExecutor(max_workers=1)  # one bulk write in flight while the next batch embeds
+    writing = None
+    last_report = time.perf_counter()
+
+    def finish_file(name: str):
+        manifest = manifests.pop(name)
+        stale = {digest: doc_id for digest, doc_id in manifest.entries.items() if digest not in seen[name]}
+        if stale:
+            delete_chunks(stale)
+            manifest.remove(stale)
+            stats.chunks_deleted += len(stale)
+        manifest.compact()
+        del seen[name], remaining[name]
+
+    def write(batch, embeddings):
+        texts = [chunk for _, _, chunk, _ in batch]
+        metadatas = [{'filename': name, 'chunk': index, 'timestamp': uploaded.isoformat(),
+                      'uploaded_at': uploaded.timestamp()} for name, index, _, _ in batch]
+        doc_ids = store_batch(texts, metadatas, stats.store, embeddings)
+        if not getattr(doc_ids, "durable", True):
+            # Stored in memory only, which dies with this process
+            raise RuntimeError("Vector store write failed; re-run to resume")
+        stats.store.chunks += len(doc_ids)
+        return batch, doc_ids
+
+    def flush(batch):
+        nonlocal writing
+        started = time.perf_counter()
+        embeddings = backend.get_embeddings([chunk for _, _, chunk, _ in batch])
+        stats.embed.embed_seconds += time.perf_counter() - started
+        stats.embed.chunks += len(batch)
+        if writing is not None:
+            settle(writing.result())
+        writing = writer.submit(write, batch, embeddings)
+
+    def settle(result):
+        batch, doc_ids = result
+        by_file: Dict[str, dict] = {}
+        for (name, _, _, digest), doc_id in zip(batch, doc_ids):
+            by_file.setdefault(name, {})[digest] = doc_id
+        for name, entries in by_file.items():
+            manifests[name].add(entries)
+        for name, _, _, _ in batch:
+            remaining[name] -= 1
+            if remaining[name] == 0 and name in manifests:
+                finish_file(name)
+
+    workers = max(1, args.workers)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for path, size, chunks in chunk_files(pool, paths, workers * 2):
+            name = os.path.relpath(path, root)
+            stats.files += 1
+            stats.bytes += size
+            stats.chunks_read += len(chunks)
+            manifest = manifests[name] = ChunkManifest(name)
+            seen[name] = set()
+            remaining[name] = 0
+            for index, chunk, digest in chunks:
+                if digest in seen[name] or digest in manifest:
+                    stats.chunks_skipped += 1
+                else:
+                    pending.append((name, index, chunk, digest))
+                    remaining[name] += 1
+                seen[name].add(digest)
+            if remaining[name] == 0:
+                finish_file(name)
+            while len(pending) >= args.batch_size:
+                flush(pending[:args.batch_size])
+                del pending[:args.batch_size]
+            if time.perf_counter() - last_report >= 5:
+                print(stats.report())
+                last_report = time.perf_counter()
+
+    if pending:
+        flush(pending)
+    if writing is not None:
+        settle(writing.result())
+    writer.shutdown()
+    for name in list(manifests):  # files whose chunks partly failed to store
+        manifests.pop(name).compact()
+    print(f"✓ Done: {stats.report()}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
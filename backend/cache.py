@@ -0,0 +1,202 @@
+"""Bounded in-process caches for embeddings, retrieval results and LLM answers"""
+import hashlib
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import List, Optional
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Cache budgets (override via environment)
+EMBEDDING_CACHE_MB = float(os.getenv("EMBEDDING_CACHE_MB", "32"))
+RETRIEVAL_CACHE_MB = float(os.getenv("RETRIEVAL_CACHE_MB", "16"))
+ANSWER_CACHE_ENABLED = os.getenv("ANSWER_CACHE", "false").lower() in ("1", "true", "yes")
+ANSWER_CACHE_THRESHOLD = float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.95"))
+ANSWER_CACHE_TTL = float(os.getenv("ANSWER_CACHE_TTL", "3600"))  # seconds
+ANSWER_CACHE_SIZE = int(os.getenv("ANSWER_CACHE_SIZE", "1000"))  # entries
+
+
+def text_key(text: str) -> str:
+    """Hash of case- and whitespace-normalized text"""
+    normalized = " ".join(text.lower().split())
+    return hashlib.sha1(normalized.encode("utf-8")).hexdigest()
+
+
+def estimate_size(value) -> int:
+    """Approximate memory footprint of a cached value in bytes"""
+    if hasattr(value, "nbytes"):
+        return int(value.nbytes)
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(estimate_size(item) for item in value)
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(estimate_size(k) + estimate_size(v) for k, v in value.items())
+    return sys.getsizeof(value)
+
+
+class LRUCache:
+    """Thread-safe LRU cache bounded by the estimated size of its values"""
+
+    def __init__(self, name: str, max_bytes: int):
+        self.name = name
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, value):
+        size = estimate_size(key) + estimate_size(value)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.bytes -= old[1]
+            self._entries[key] = (value, size)
+            self.bytes += size
+            while self.bytes > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self.bytes -= evicted_size
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self.bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+        }
+
+
+embedding_cache = LRUCache("embeddings", int(EMBEDDING_CACHE_MB * 1024 * 1024))
+retrieval_cache = LRUCache("retrieval", int(RETRIEVAL_CACHE_MB * 1024 * 1024))
+
+
+def context_fingerprint(context_docs: List[str]) -> str:
+    """Order-sensitive hash of the retrieved context"""
+    digest = hashlib.sha1()
+    for doc in context_docs:
+        digest.update(hashlib.sha1(doc.encode("utf-8")).digest())
+    return digest.hexdigest()
+
+
+class SemanticAnswerCache:
+    """LLM answer cache matched by query-embedding similarity.
+
+    An entry is served only if its query embedding has cosine similarity of
+    at least `threshold` with the new query, it was answered from the same
+    retrieved context (fingerprint) and the knowledge base is still at the
+    generation it was written under. Entries live in fixed slots of a
+    normalized float32 matrix, so a lookup is one matrix-vector product;
+    they expire after `ttl` seconds and the oldest is evicted when full.
+    """
+
+    def __init__(self, max_entries: int = ANSWER_CACHE_SIZE, threshold: float = ANSWER_CACHE_THRESHOLD,
+                 ttl: float = ANSWER_CACHE_TTL):
+        self.max_entries = max(1, max_entries)
+        self.threshold = threshold
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._vectors = None
+        self._expires = np.zeros(self.max_entries)
+        self._created = np.zeros(self.max_entries)
+        self._entries: List[Optional[tuple]] = [None] * self.max_entries
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _normalize(embedding):
+        vector = np.asarray(embedding, dtype=np.float32).reshape(-1)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else None
+
+    def get(self, embedding, fingerprint: str, generation: int) -> Optional[str]:
+        query = self._normalize(embedding)
+        with self._lock:
+            if query is None or self._vectors is None or self._vectors.shape[1] != query.shape[0]:
+                self.misses += 1
+                return None
+            scores = self._vectors @ query
+            scores[self._expires <= time.time()] = -1.0
+            for slot in np.argsort(-scores):
+                if scores[slot] < self.threshold:
+                    break
+                entry_fingerprint, entry_generation, answer = self._entries[slot]
+                if entry_fingerprint == fingerprint and entry_generation == generation:
+                    self.hits += 1
+                    return answer
+            self.misses += 1
+            return None
+
+    def put(self, embedding, fingerprint: str, generation: int, answer: str):
+        vector = self._normalize(embedding)
+        if vector is None:
+            return
+        now = time.time()
+        with self._lock:
+            if self._vectors is None or self._vectors.shape[1] != vector.shape[0]:
+                self._vectors = np.zeros((self.max_entries, vector.shape[0]), dtype=np.float32)
+                self._expires[:] = 0
+                self._entries = [None] * self.max_entries
+            free = np.flatnonzero(self._expires <= now)
+            if free.size:
+                slot = int(free[0])
+            else:
+                slot = int(np.argmin(self._created))
+                self.evictions += 1
+            self._vectors[slot] = vector
+            self._expires[slot] = now + self.ttl
+            self._created[slot] = now
+            self._entries[slot] = (fingerprint, generation, answer)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": int(np.count_nonzero(self._expires > time.time())),
+            "max_entries": self.max_entries,
+            "threshold": self.threshold,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+        }
+
+
+answer_cache = SemanticAnswerCache() if ANSWER_CACHE_ENABLED and np is not None else None
+
+
+def cache_stats() -> dict:
+    stats = {cache.name: cache.stats() for cache in (embedding_cache, retrieval_cache)}
+    stats["answers"] = answer_cache.stats() if answer_cache is not None else None
+    return stats
@@ -0,0 +1,188 @@
+"""Bounded executors and request coalescing for blocking backend calls"""
+import asyncio
+import functools
+import hashlib
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import AsyncIterator, Awaitable, Callable, Dict
+
+# Concurrency limits per backend (override via environment)
+LLM_CONCURRENCY = int(os.getenv("LLM_CONCURRENCY", "4"))
+EMBED_CONCURRENCY = int(os.getenv("EMBED_CONCURRENCY", "2"))
+VECTOR_DB_CONCURRENCY = int(os.getenv("VECTOR_DB_CONCURRENCY", "8"))
+INGEST_CONCURRENCY = int(os.getenv("INGEST_CONCURRENCY", "1"))  # background ingestion threads
+
+
+class BackendPool:
+    """Thread pool for one kind of blocking call (LLM, embedder, vector store).
+
+    The pool size is the concurrency limit: extra calls wait in the
+    executor queue instead of piling up threads or blocking the loop.
+    """
+
+    def __init__(self, name: str, max_workers: int):
+        self.name = name
+        self.max_workers = max(1, max_workers)
+        self.executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix=f"jarvis-{name}")
+        self.pending = 0
+
+    async def run(self, fn, *args, **kwargs):
+        """Run fn(*args, **kwargs) in the pool and await its result"""
+        loop = asyncio.get_running_loop()
+        self.pending += 1
+        try:
+            return await loop.run_in_executor(self.executor, functools.partial(fn, *args, **kwargs))
+        finally:
+            self.pending -= 1
+
+    def stats(self) -> dict:
+        return {"max_workers": self.max_workers, "pending": self.pending}
+
+
+llm_pool = BackendPool("llm", LLM_CONCURRENCY)
+embed_pool = BackendPool("embed", EMBED_CONCURRENCY)
+vector_pool = BackendPool("vector", VECTOR_DB_CONCURRENCY)
+# Background ingestion gets its own threads, so big uploads never queue
+# ahead of /chat in the embed and vector pools.
+ingest_pool = BackendPool("ingest", INGEST_CONCURRENCY)
+
+
+def pool_stats() -> dict:
+    """Concurrency limits and pending call counts for every backend pool"""
+    return {pool.name: pool.stats() for pool in (llm_pool, embed_pool, vector_pool, ingest_pool)}
+
+
+def flight_key(*parts: str) -> str:
+    """Exact hash of the parts that fully determine an LLM call"""
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+class SingleFlight:
+    """Coalesce identical in-flight calls into one.
+
+    The first caller for a key starts the work as its own task; callers
+    arriving while it runs await the same task. Waiters are shielded, so a
+    disconnecting client never cancels the call for the others.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.started = 0
+        self.coalesced = 0
+        self._calls: Dict[str, asyncio.Task] = {}
+
+    async def do(self, key: str, fn: Callable[[], Awaitable]):
+        task = self._calls.get(key)
+        if task is None:
+            self.started += 1
+            task = asyncio.ensure_future(fn())
+            self._calls[key] = task
+            task.add_done_callback(lambda _: self._calls.pop(key, None))
+        else:
+            self.coalesced += 1
+        return await asyncio.shield(task)
+
+    def stats(self) -> dict:
+        return {"in_flight": len(self._calls), "started": self.started, "coalesced": self.coalesced}
+
+
+class _Broadcast:
+    """Replayable item stream shared by every subscriber of one generation"""
+
+    def __init__(self):
+        self.items = []
+        self.done = False
+        self.error = None
+        self.subscribers = 0
+        self.task = None
+        self._changed = asyncio.Event()
+
+    def _notify(self):
+        changed, self._changed = self._changed, asyncio.Event()
+        changed.set()
+
+    def publish(self, item):
+        self.items.append(item)
+        self._notify()
+
+    def finish(self, error: Exception = None):
+        self.done = True
+        self.error = error
+        self._notify()
+
+    async def follow(self) -> AsyncIterator:
+        position = 0
+        while True:
+            while position < len(self.items):
+                yield self.items[position]
+                position += 1
+            if self.done:
+                if self.error is not None:
+                    raise self.error
+                return
+            await self._changed.wait()
+
+
+class StreamFlight:
+    """Single-flight for streamed generations.
+
+    Identical streaming requests attach to the generation already running
+    for their key: they first replay the items produced so far, then follow
+    live. The generation is cancelled once its last subscriber leaves.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.started = 0
+        self.coalesced = 0
+        self._flights: Dict[str, _Broadcast] = {}
+
+    async def subscribe(self, key: str, gen_fn: Callable[[], AsyncIterator]) -> AsyncIterator:
+        broadcast = self._flights.get(key)
+        if broadcast is None:
+            self.started += 1
+            broadcast = self._flights[key] = _Broadcast()
+
+            async def produce():
+                items = gen_fn()
+                try:
+                    async for item in items:
+                        broadcast.publish(item)
+                    broadcast.finish()
+                except asyncio.CancelledError:
+                    broadcast.finish(RuntimeError("Generation cancelled"))
+                except Exception as e:
+                    broadcast.finish(e)
+                finally:
+                    await items.aclose()
+                    if self._flights.get(key) is broadcast:
+                        del self._flights[key]
+
+            broadcast.task = asyncio.ensure_future(produce())
+        else:
+            self.coalesced += 1
+
+        broadcast.subscribers += 1
+        try:
+            async for item in broadcast.follow():
+                yield item
+        finally:
+            broadcast.subscribers -= 1
+            if broadcast.subscribers == 0 and not broadcast.done:
+                broadcast.task.cancel()
+
+    def stats(self) -> dict:
+        return {"in_flight": len(self._flights), "started": self.started, "coalesced": self.coalesced}
+
+
+llm_flight = SingleFlight("llm")
+llm_stream_flight = StreamFlight("llm_stream")
+
+
+def flight_stats() -> dict:
+    """In-flight and coalesced counts for LLM request coalescing"""
+    return {flight.name: flight.stats() for flight in (llm_flight, llm_stream_flight)}
@@ -0,0 +1,167 @@
+"""Sentence embedders: SentenceTransformer (PyTorch) or the same model
+exported to ONNX.
+
+With EMBEDDER=onnx, all-MiniLM-L6-v2 is run by ONNX Runtime from
+EMBEDDER_ONNX_PATH, tokenized by the `tokenizers` library, so torch is never
+imported. Batches are built from texts sorted by token count, so each one
+is padded only to its own longest text. The vectors match
+SentenceTransformer's: the same mean pooling and L2 normalization, 384
+dims. With EMBEDDER_ONNX_INT8=true the dynamically quantized int8 model is
+used: faster on CPU, at a small cost in fidelity (bench_embedder.py reports
+both). Export the model once with:
+
+    python embedder.py ./onnx_model --int8   (needs sentence-transformers and onnx)
+"""
+import argparse
+import importlib.util
+import os
+import sys
+from typing import List, Optional
+
+import numpy as np
+
+MODEL_NAME = "all-MiniLM-L6-v2"
+EMBEDDERS = ("sentence-transformers", "onnx")
+EMBEDDER = os.getenv("EMBEDDER", "sentence-transformers").lower()
+ONNX_PATH = os.getenv("EMBEDDER_ONNX_PATH", "./onnx_model")
+ONNX_INT8 = os.getenv("EMBEDDER_ONNX_INT8", "false").lower() == "true"
+THREADS = int(os.getenv("EMBEDDER_THREADS", "0"))  # threads per encode call; 0 = one per core
+MAX_LENGTH = 256  # all-MiniLM-L6-v2 truncates longer texts
+
+ONNX_MODEL_FILE = "model.onnx"
+ONNX_INT8_FILE = "model_int8.onnx"
+TOKENIZER_FILE = "tokenizer.json"
+
+
+def missing_dependency(kind: str = EMBEDDER) -> Optional[str]:
+    """The pip package the embedder needs but is not installed, or None"""
+    modules = {"onnx": ("onnxruntime", "tokenizers")}.get(kind, ("sentence_transformers",))
+    for module in modules:
+        if importlib.util.find_spec(module) is None:
+            return module.replace("_", "-")
+    return None
+
+
+class OnnxEmbedder:
+    """SentenceTransformer-compatible encode() over an exported ONNX model"""
+
+    def __init__(self, path: str = ONNX_PATH, int8: bool = ONNX_INT8, threads: int = THREADS,
+                 max_length: int = MAX_LENGTH):
+        import onnxruntime
+        from tokenizers import Tokenizer
+
+        model_path = os.path.join(path, ONNX_INT8_FILE if int8 else ONNX_MODEL_FILE)
+        if not os.path.exists(model_path):
+            raise FileNotFoundError(f"{model_path} not found; export it with: python embedder.py {path}"
+                                    f"{' --int8' if int8 else ''}")
+        self.tokenizer = Tokenizer.from_file(os.path.join(path, TOKENIZER_FILE))
+        self.tokenizer.enable_truncation(max_length)
+        self.tokenizer.no_padding()  # batches are padded to their own longest text
+        options = onnxruntime.SessionOptions()
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.intra_op_num_threads = threads
+        options.inter_op_num_threads = 1
+        self.session = onnxruntime.InferenceSession(model_path, options, providers=["CPUExecutionProvider"])
+        self._inputs = {node.name for node in self.session.get_inputs()}
+        outputs = [node.name for node in self.session.get_outputs()]
+        self._output = "last_hidden_state" if "last_hidden_state" in outputs else outputs[0]
+        self.dim = self._run(self.tokenizer.encode_batch(["warmup"])).shape[1]
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.dim
+
+    def encode(self, sentences, batch_size: int = 32, **kwargs) -> np.ndarray:
+        """Normalized float32 embeddings: one vector for a string, a matrix for a list"""
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+        embeddings = np.empty((len(texts), self.dim), dtype=np.float32)
+        if texts:
+            encodings = self.tokenizer.encode_batch(texts)
+            order = np.argsort([len(encoding.ids) for encoding in encodings], kind="stable")
+            for start in range(0, len(order), batch_size):
+                rows = order[start:start + batch_size]
+                embeddings[rows] = self._run([encodings[row] for row in rows])
+        return embeddings[0] if single else embeddings
+
+    def _run(self, encodings: List) -> np.ndarray:
+        ids = np.zeros((len(encodings), max(len(encoding.ids) for encoding in encodings)), dtype=np.int64)
+        mask, types = np.zeros_like(ids), np.zeros_like(ids)
+        for row, encoding in enumerate(encodings):
+            size = len(encoding.ids)
+            ids[row, :size] = encoding.ids
+            mask[row, :size] = 1
+            types[row, :size] = encoding.type_ids
+        feeds = {"input_ids": ids, "attention_mask": mask, "token_type_ids": types}
+        feeds = {name: array for name, array in feeds.items() if name in self._inputs}
+        output = self.session.run([self._output], feeds)[0]
+        if output.ndim == 3:
+            # Mean pooling over real tokens, as the model's SentenceTransformer pooling module does
+            weights = mask[:, :, None].astype(np.float32)
+            output = (output * weights).sum(axis=1) / np.maximum(weights.sum(axis=1), 1e-9)
+        output = output.astype(np.float32, copy=False)
+        return output / np.maximum(np.linalg.norm(output, axis=1, keepdims=True), 1e-12)
+
+
+def load_embedder(kind: str = EMBEDDER, threads: int = THREADS):
+    """Load the configured embedder and run a warmup encode"""
+    if kind not in EMBEDDERS:
+        raise ValueError(f"EMBEDDER must be one of {', '.join(EMBEDDERS)}, not {kind!r}")
+    if kind == "onnx":
+        model = OnnxEmbedder(threads=threads)
+    else:
+        import torch
+        from sentence_transformers import SentenceTransformer
+        if threads:
+            torch.set_num_threads(threads)
+        model = SentenceTransformer(MODEL_NAME)
+    model.encode(["warmup"])
+    return model
+
+
+def export(path: str, int8: bool = False, model_name: str = MODEL_NAME):
+    """Export the SentenceTransformer model and tokenizer to ONNX (and int8)"""
+    import torch
+    from sentence_transformers import SentenceTransformer
+
+    model = SentenceTransformer(model_name, device="cpu")
+    transformer = model[0].auto_model.eval()
+    os.makedirs(path, exist_ok=True)
+    model.tokenizer.backend_tokenizer.save(os.path.join(path, TOKENIZER_FILE))
+    sample = model.tokenizer(["an example sentence to trace"], return_tensors="pt")
+    names = [name for name in ("input_ids", "attention_mask", "token_type_ids") if name in sample]
+
+    class LastHiddenState(torch.nn.Module):
+        """Positional inputs in, token embeddings out (the tracer passes inputs positionally)"""
+
+        def __init__(self):
+            super().__init__()
+            self.transformer = transformer
+
+        def forward(self, *inputs):
+            return self.transformer(**dict(zip(names, inputs)))[0]
+
+    axes = {name: {0: "batch", 1: "sequence"} for name in names + ["last_hidden_state"]}
+    with torch.no_grad():
+        torch.onnx.export(LastHiddenState(), tuple(sample[name] for name in names), os.path.join(path, ONNX_MODEL_FILE),
+                          input_names=names, output_names=["last_hidden_state"], dynamic_axes=axes,
+                          opset_version=14, dynamo=False)
+    print(f"✓ Exported {model_name} to {os.path.join(path, ONNX_MODEL_FILE)}")
+    if int8:
+        from onnxruntime.quantization import quantize_dynamic, QuantType
+        quantize_dynamic(os.path.join(path, ONNX_MODEL_FILE), os.path.join(path, ONNX_INT8_FILE),
+                         weight_type=QuantType.QInt8)
+        print(f"✓ Quantized to {os.path.join(path, ONNX_INT8_FILE)}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=f"Export {MODEL_NAME} to ONNX for EMBEDDER=onnx")
+    parser.add_argument("path", nargs="?", default=ONNX_PATH, help="output directory (EMBEDDER_ONNX_PATH)")
+    parser.add_argument("--int8", action="store_true", help="also write a dynamically quantized int8 model")
+    parser.add_argument("--model", default=MODEL_NAME, help="model name or local SentenceTransformer directory")
+    args = parser.parse_args(argv)
+    export(args.path, args.int8, args.model)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
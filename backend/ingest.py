@@ -0,0 +1,205 @@
+"""Shared document ingestion helpers for the JARVIS backends"""
+import asyncio
+import codecs
+import os
+import re
+import time
+import zlib
+from itertools import islice
+from typing import AsyncIterator, Awaitable, Callable, Iterable, Iterator, List, Optional, Tuple
+
+# Ingestion tuning (override via environment)
+CHUNK_SIZE = int(os.getenv("CHUNK_SIZE", "500"))
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "64"))
+UPSERT_BATCH_SIZE = int(os.getenv("UPSERT_BATCH_SIZE", "100"))
+READ_BLOCK_SIZE = int(os.getenv("READ_BLOCK_SIZE", str(1024 * 1024)))  # bytes per read
+INGEST_QUEUE_DEPTH = int(os.getenv("INGEST_QUEUE_DEPTH", "4"))  # batches buffered ahead of embedding
+
+
+# Chunk boundaries: sentence ends and line breaks (paragraph breaks in group 1)
+BREAK_RE = re.compile(r"(\n[ \t\r\f\v]*\n\s*)|[.!?][\"')\]]*\s+|\n\s*")
+CUT_WINDOW = 32  # characters before a break whose hash decides whether to cut there
+
+
+class ChunkDecoder:
+    """Incrementally decode UTF-8 bytes into content-defined chunks of at
+    most `size` characters.
+
+    Chunks end at sentence or line breaks chosen by the text itself: past
+    half of `size`, a chunk ends at the first paragraph break, or at a
+    sentence or line break whose preceding CUT_WINDOW characters hash to
+    an even number. Since that choice does not depend on where the chunk
+    started, an insert or delete only changes the chunks around the edit;
+    later chunks keep their boundaries (and content hashes). A chunk that
+    reaches `size` without such a break is cut at its last break, or
+    failing that at whitespace. Multi-byte characters split across block
+    boundaries are carried over by the incremental decoder, and at most one
+    partial chunk is buffered, so memory stays proportional to the block
+    size, not the file size.
+    """
+
+    def __init__(self, size: int = CHUNK_SIZE):
+        self.size = max(1, size)
+        self.min_size = self.size // 2
+        self.index = 0
+        self._decoder = codecs.getincrementaldecoder("utf-8")(errors="ignore")
+        self._pending = ""
+
+    def _fallback_cut(self, text: str, start: int, last_break: Optional[int]) -> int:
+        """Where to cut a chunk that reached `size` without a content-defined break"""
+        if last_break is not None and last_break > start:
+            return last_break
+        limit = start + self.size
+        space = max(text.rfind(" ", start + self.min_size, limit), text.rfind("\n", start + self.min_size, limit))
+        return space + 1 if space >= 0 else limit
+
+    def _split(self, text: str, final: bool = False) -> List[Tuple[int, str]]:
+        chunks = []
+        start = 0
+        last_break = None  # end of the last break that keeps the current chunk within size
+
+        def emit(cut: int):
+            nonlocal start, last_break
+            chunks.append((self.index, text[start:cut]))
+            self.index += 1
+            start, last_break = cut, None
+
+        for match in BREAK_RE.finditer(text):
+            end = match.end()
+            if end == len(text) and not final:
+                break  # the break may continue in the next block
+            while end - start > self.size:
+                emit(self._fallback_cut(text, start, last_break))
+            if end - start < self.min_size:
+                continue
+            if match.group(1) or zlib.crc32(text[max(0, end - CUT_WINDOW):end].encode("utf-8")) & 1 == 0:
+                emit(end)
+            else:
+                last_break = end
+        while len(text) - start > self.size:
+            emit(self._fallback_cut(text, start, last_break))
+        if final and start < len(text):
+            emit(len(text))
+        self._pending = text[start:]
+        return chunks
+
+    def feed(self, block: bytes) -> List[Tuple[int, str]]:
+        """Decode one block; returns the (index, chunk) pairs it completed"""
+        return self._split(self._pending + self._decoder.decode(block))
+
+    def finish(self) -> List[Tuple[int, str]]:
+        """Flush the decoder; returns the final chunks, if any"""
+        return self._split(self._pending + self._decoder.decode(b"", final=True), final=True)
+
+
+def iter_file_chunks(f, size: int = CHUNK_SIZE, block_size: int = READ_BLOCK_SIZE) -> Iterator[Tuple[int, str]]:
+    """Yield (index, chunk) pairs from a binary file object, block by block"""
+    decoder = ChunkDecoder(size)
+    while True:
+        block = f.read(block_size)
+        if not block:
+            break
+        yield from decoder.feed(block)
+    yield from decoder.finish()
+
+
+async def iter_upload_chunks(upload, stats: Optional["IngestStats"] = None, size: int = CHUNK_SIZE,
+                             block_size: int = READ_BLOCK_SIZE) -> AsyncIterator[Tuple[int, str]]:
+    """Yield non-blank (index, chunk) pairs from an UploadFile, block by block"""
+    decoder = ChunkDecoder(size)
+    while True:
+        block = await upload.read(block_size)
+        if not block:
+            break
+        if stats:
+            stats.bytes += len(block)
+        for index, chunk in decoder.feed(block):
+            if chunk.strip():
+                yield index, chunk
+    for index, chunk in decoder.finish():
+        if chunk.strip():
+            yield index, chunk
+
+
+async def run_ingest_pipeline(
+    chunks: AsyncIterator[Tuple[int, str]],
+    store_batch: Callable[[List[Tuple[int, str]]], Awaitable[List]],
+    batch_size: int = EMBED_BATCH_SIZE,
+    depth: int = INGEST_QUEUE_DEPTH,
+) -> Tuple[int, Optional[object]]:
+    """Read chunks and embed/store them in batches as two overlapping stages.
+
+    A bounded queue of at most `depth` batches sits between the reader and
+    `store_batch`, so reading pauses whenever embedding falls behind. Only
+    the stored count and first document id are kept, so memory use does not
+    grow with the size of the upload. Returns (stored chunk count, first id).
+    """
+    queue: asyncio.Queue = asyncio.Queue(maxsize=max(1, depth))
+
+    async def produce():
+        batch = []
+        try:
+            async for item in chunks:
+                batch.append(item)
+                if len(batch) >= batch_size:
+                    await queue.put(batch)
+                    batch = []
+            if batch:
+                await queue.put(batch)
+        except Exception:
+            # Wake the consumer; the error is re-raised when the producer is awaited
+            await queue.put(None)
+            raise
+        await queue.put(None)
+
+    producer = asyncio.ensure_future(produce())
+    count, first_id = 0, None
+    try:
+        while True:
+            batch = await queue.get()
+            if batch is None:
+                break
+            doc_ids = await store_batch(batch)
+            if doc_ids and first_id is None:
+                first_id = doc_ids[0]
+            count += len(doc_ids)
+    except BaseException:
+        producer.cancel()
+        raise
+    await producer
+    return count, first_id
+
+
+def batched(items: Iterable, size: int) -> Iterator[list]:
+    """Yield lists of at most `size` items from any iterable"""
+    iterator = iter(items)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+class IngestStats:
+    """Per-upload throughput counters"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.bytes = 0
+        self.chunks = 0
+        self.batches = 0
+        self.embed_seconds = 0.0
+        self.store_seconds = 0.0
+
+    def as_dict(self) -> dict:
+        elapsed = time.perf_counter() - self.started
+        return {
+            "bytes": self.bytes,
+            "chunks": self.chunks,
+            "batches": self.batches,
+            "seconds": round(elapsed, 4),
+            "embed_seconds": round(self.embed_seconds, 4),
+            "store_seconds": round(self.store_seconds, 4),
+            "chunks_per_second": round(self.chunks / elapsed, 2) if elapsed > 0 else None,
+            "mb_per_second": round(self.bytes / elapsed / 1e6, 3) if elapsed > 0 else None,
+        }
@@ -0,0 +1,325 @@
+"""Background ingestion jobs: spooled uploads processed by a worker pool"""
+import asyncio
+import json
+import os
+import uuid
+from datetime import datetime
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from concurrency import ingest_pool
+from locks import FileLock
+from ingest import IngestStats, iter_upload_chunks, run_ingest_pipeline, READ_BLOCK_SIZE
+from manifest import ChunkManifest, chunk_hash
+from metrics import ingest_chunks, ingest_bytes, ingest_seconds, ingest_jobs
+
+# Job queue tuning (override via environment)
+JOBS_DIR = os.getenv("JOBS_DIR", "./ingest_jobs")
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", "1"))  # jobs processed concurrently
+JOB_RETENTION = float(os.getenv("JOB_RETENTION", str(7 * 24 * 3600)))  # seconds finished jobs are kept; 0 = forever
+
+
+class _SpoolReader:
+    """Async read() over a spooled file, so it can feed iter_upload_chunks"""
+
+    def __init__(self, path: str):
+        self._file = open(path, "rb")
+
+    async def read(self, size: int) -> bytes:
+        return await asyncio.to_thread(self._file.read, size)
+
+    def close(self):
+        self._file.close()
+
+
+class IngestJob:
+    """State of one upload; persisted as JSON next to its spooled data"""
+
+    FIELDS = ("id", "filename", "status", "bytes", "chunks_done", "chunks_failed", "chunks_skipped",
+              "chunks_deleted", "first_id", "created", "started", "finished", "error", "throughput")
+
+    def __init__(self, **fields):
+        self.id = fields.get("id") or uuid.uuid4().hex
+        self.filename = fields.get("filename")
+        self.status = fields.get("status", "queued")
+        self.bytes = fields.get("bytes", 0)
+        self.chunks_done = fields.get("chunks_done", 0)
+        self.chunks_failed = fields.get("chunks_failed", 0)
+        self.chunks_skipped = fields.get("chunks_skipped", 0)  # unchanged since the last upload
+        self.chunks_deleted = fields.get("chunks_deleted", 0)  # no longer present in the file
+        self.first_id = fields.get("first_id")
+        self.created = fields.get("created") or datetime.now().isoformat()
+        self.started = fields.get("started")
+        self.finished = fields.get("finished")
+        self.error = fields.get("error")
+        self.throughput = fields.get("throughput")
+
+    def as_dict(self) -> dict:
+        return {field: getattr(self, field) for field in self.FIELDS}
+
+
+class JobQueue:
+    """Queue of ingestion jobs processed by INGEST_WORKERS background workers.
+
+    `/upload` spools the file to JOBS_DIR and returns immediately. Workers
+    chunk the spooled file and call `store_batch(texts, metadatas, stats)`
+    (the backend's blocking bulk-store function) in `ingest_pool`.
+
+    Every durably stored chunk is recorded by content hash in the file's
+    ChunkManifest, so re-uploading a file only embeds chunks that changed,
+    and chunks that are no longer in the file are removed through
+    `delete_chunks({hash: doc_id})` once the job completes. The manifest is
+    also the resume point: after a restart unfinished jobs are re-queued
+    and skip every chunk already stored.
+
+    With several server workers sharing JOBS_DIR, each job is claimed with
+    a file lock by the worker processing it, so a restarting worker only
+    resumes jobs no live worker owns, and any worker can report a job's
+    progress from its state file.
+
+    Completed and failed jobs are deleted JOB_RETENTION seconds after they
+    finish.
+    """
+
+    def __init__(self, store_batch: Callable[[List[str], List[dict], IngestStats], List],
+                 delete_chunks: Optional[Callable[[Dict[str, object]], None]] = None,
+                 on_progress: Optional[Callable[[], None]] = None,
+                 ready: Optional[Callable[[], Awaitable]] = None,
+                 path: str = JOBS_DIR, workers: int = INGEST_WORKERS):
+        self.store_batch = store_batch
+        self.delete_chunks = delete_chunks
+        self.on_progress = on_progress
+        self.ready = ready
+        self.path = path
+        self.workers = max(1, workers)
+        self.jobs: Dict[str, IngestJob] = {}
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._tasks: List[asyncio.Task] = []
+        self._finished: Dict[str, asyncio.Event] = {}
+        self._claims: Dict[str, FileLock] = {}  # jobs this process owns
+
+    def _data_file(self, job_id: str) -> str:
+        return os.path.join(self.path, f"{job_id}.data")
+
+    def _state_file(self, job_id: str) -> str:
+        return os.path.join(self.path, f"{job_id}.json")
+
+    def _claim(self, job_id: str) -> bool:
+        claim = FileLock(os.path.join(self.path, f"{job_id}.lock"))
+        if not claim.try_acquire():
+            return False
+        self._claims[job_id] = claim
+        return True
+
+    def _release(self, job_id: str):
+        claim = self._claims.pop(job_id, None)
+        if claim is not None:
+            claim.release()
+            try:
+                os.remove(claim.path)
+            except OSError:
+                pass
+
+    def _save(self, job: IngestJob):
+        tmp = self._state_file(job.id) + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(job.as_dict(), f)
+        os.replace(tmp, self._state_file(job.id))
+
+    def _expired(self, job: IngestJob) -> bool:
+        if not JOB_RETENTION or job.status not in ("completed", "failed") or not job.finished:
+            return False
+        return (datetime.now() - datetime.fromisoformat(job.finished)).total_seconds() > JOB_RETENTION
+
+    def _delete(self, job_id: str):
+        self.jobs.pop(job_id, None)
+        for path in (self._state_file(job_id), self._data_file(job_id)):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def _prune(self):
+        """Delete finished jobs older than JOB_RETENTION"""
+        for job in [job for job in self.jobs.values() if self._expired(job)]:
+            self._delete(job.id)
+
+    def _enqueue(self, job: IngestJob):
+        self._finished[job.id] = asyncio.Event()
+        self._queue.put_nowait(job.id)
+
+    async def start(self):
+        """Start workers and re-queue jobs left unfinished by a previous run"""
+        os.makedirs(self.path, exist_ok=True)
+        resumed = 0
+        for name in sorted(os.listdir(self.path)):
+            if not name.endswith(".json"):
+                continue
+            try:
+                with open(os.path.join(self.path, name)) as f:
+                    job = IngestJob(**json.load(f))
+            except (OSError, ValueError, TypeError) as e:
+                print(f"⚠️  Skipping unreadable job file {name}: {e}")
+                continue
+            if job.id in self.jobs:
+                continue
+            if self._expired(job):
+                self._delete(job.id)
+                continue
+            self.jobs[job.id] = job
+            if (job.status in ("queued", "running") and os.path.exists(self._data_file(job.id))
+                    and self._claim(job.id)):
+                job.status = "queued"
+                self._enqueue(job)
+                resumed += 1
+        if resumed:
+            print(f"✓ Resuming {resumed} ingestion job(s)")
+        self._tasks = [asyncio.ensure_future(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        self._tasks = []
+
+    async def submit(self, upload) -> IngestJob:
+        """Spool an UploadFile to disk and queue it for ingestion"""
+        job = IngestJob(filename=upload.filename)
+        os.makedirs(self.path, exist_ok=True)
+        self._claim(job.id)
+        with open(self._data_file(job.id), "wb") as f:
+            while True:
+                block = await upload.read(READ_BLOCK_SIZE)
+                if not block:
+                    break
+                await asyncio.to_thread(f.write, block)
+                job.bytes += len(block)
+        self.jobs[job.id] = job
+        self._save(job)
+        self._enqueue(job)
+        return job
+
+    async def wait(self, job_id: str) -> IngestJob:
+        """Wait until a job has completed or failed"""
+        event = self._finished.get(job_id)
+        if event is not None:
+            await event.wait()
+        return self.jobs[job_id]
+
+    def get(self, job_id: str) -> Optional[IngestJob]:
+        if not job_id.isalnum():
+            return None
+        if job_id in self._claims:
+            return self.jobs[job_id]
+        # Owned by another worker (or finished): its state file is current
+        try:
+            with open(self._state_file(job_id)) as f:
+                return IngestJob(**json.load(f))
+        except (OSError, ValueError):
+            return self.jobs.get(job_id)
+
+    def report(self, job: IngestJob) -> dict:
+        """Job state plus the number of jobs waiting for a worker"""
+        return {**job.as_dict(), "queue_depth": self._queue.qsize()}
+
+    async def _worker(self):
+        # Wait for the embedding model and vector store before storing anything
+        if self.ready:
+            await self.ready()
+        while True:
+            job_id = await self._queue.get()
+            job = self.jobs[job_id]
+            try:
+                await self._process(job)
+            except Exception as e:
+                # Raised outside the ingestion itself (missing spool file,
+                # manifest or state file I/O): fail this job, keep the worker
+                job.status = "failed"
+                job.error = str(e)
+                job.finished = datetime.now().isoformat()
+                ingest_jobs.labels("failed").inc()
+                print(f"Ingestion job {job.id} failed: {e}")
+                try:
+                    self._save(job)
+                except OSError:
+                    pass
+            finally:
+                self._release(job_id)
+                self._finished.pop(job_id, asyncio.Event()).set()
+                self._prune()
+
+    async def _process(self, job: IngestJob):
+        job.status = "running"
+        job.started = job.started or datetime.now().isoformat()
+        job.error = None
+        self._save(job)
+        stats = IngestStats()
+        manifest = await asyncio.to_thread(ChunkManifest, job.filename)
+        uploaded_at = datetime.fromisoformat(job.created).timestamp()  # numeric, for range filters
+        seen = set()  # hashes of every chunk in this upload
+
+        async def store_batch(batch):
+            # Only chunks not already stored for this file are embedded
+            pending = []
+            for index, chunk in batch:
+                digest = chunk_hash(chunk)
+                if digest in seen or digest in manifest:
+                    job.chunks_skipped += 1
+                else:
+                    pending.append((index, chunk, digest))
+                seen.add(digest)
+            doc_ids = []
+            ingest_chunks.labels("skipped").inc(len(batch) - len(pending))
+            if pending:
+                texts = [chunk for _, chunk, _ in pending]
+                metadatas = [{'filename': job.filename, 'chunk': i, 'timestamp': job.created, 'uploaded_at': uploaded_at}
+                             for i, _, _ in pending]
+                doc_ids = await ingest_pool.run(self.store_batch, texts, metadatas, stats)
+                if getattr(doc_ids, "durable", True):
+                    await asyncio.to_thread(manifest.add, {digest: doc_id for (_, _, digest), doc_id in zip(pending, doc_ids)})
+                stats.batches += 1
+                stats.chunks += len(doc_ids)
+                job.chunks_done += len(doc_ids)
+                job.chunks_failed += len(texts) - len(doc_ids)
+                ingest_chunks.labels("stored").inc(len(doc_ids))
+                ingest_chunks.labels("failed").inc(len(texts) - len(doc_ids))
+                if doc_ids and job.first_id is None:
+                    job.first_id = doc_ids[0]
+            job.throughput = stats.as_dict()
+            self._save(job)
+            if doc_ids and self.on_progress:
+                self.on_progress()
+            return doc_ids
+
+        reader = _SpoolReader(self._data_file(job.id))
+        try:
+            await run_ingest_pipeline(iter_upload_chunks(reader, stats), store_batch)
+            await self._remove_stale(job, manifest, seen)
+            job.status = "completed"
+            if job.chunks_failed:
+                job.error = f"{job.chunks_failed} chunk(s) failed to store"
+        except Exception as e:
+            job.status = "failed"
+            job.error = str(e)
+            print(f"Ingestion job {job.id} failed: {e}")
+        finally:
+            reader.close()
+        job.finished = datetime.now().isoformat()
+        job.throughput = stats.as_dict()
+        self._save(job)
+        ingest_jobs.labels(job.status).inc()
+        ingest_bytes.inc(stats.bytes)
+        ingest_seconds.labels("embed").inc(stats.embed_seconds)
+        ingest_seconds.labels("store").inc(stats.store_seconds)
+        if job.status == "completed":
+            os.remove(self._data_file(job.id))
+
+    async def _remove_stale(self, job: IngestJob, manifest: ChunkManifest, seen: set):
+        """Delete chunks from a previous upload of this file that are gone now"""
+        stale = {digest: doc_id for digest, doc_id in manifest.entries.items() if digest not in seen}
+        if stale and self.delete_chunks:
+            await ingest_pool.run(self.delete_chunks, stale)
+            await asyncio.to_thread(manifest.remove, stale)
+            job.chunks_deleted += len(stale)
+            ingest_chunks.labels("deleted").inc(len(stale))
+            if self.on_progress:
+                self.on_progress()
+        await asyncio.to_thread(manifest.compact)
@@ -0,0 +1,437 @@
+"""Load-test a JARVIS backend against deterministic local stand-ins.
+
+Usage (from backend/):
+    python loadtest.py                                      # app.py, default workload
+    python loadtest.py --backend app_gemini --concurrency 32 --requests 500
+    python loadtest.py --scenarios chat,chat_stream --output results.json
+
+The backend runs in a child process, in a fresh temporary working
+directory so every store starts empty. Its startup loaders are replaced by
+stand-ins, so results depend only on the code under test and the settings
+below:
+- The LLM (Ollama or Gemini) answers after --llm-latency-ms, then streams
+  --llm-tokens tokens at --llm-tokens-per-second.
+- The embedder is a hashing bag-of-words model with a fixed per-batch and
+  per-text cost.
+- Pinecone is disabled, so app.py uses its in-process local index.
+  app_gemini.py uses a local ChromaDB if it is installed.
+Everything else (retrieval, caches, batching, sessions, ingestion) is the
+real code. A small corpus is uploaded first, then each scenario runs
+--requests requests at --concurrency.
+
+The JSON report has latency p50/p95/p99, requests per second and errors
+per scenario, plus the server's peak RSS. It is printed to stdout (and
+written to --output), so runs can be compared across versions.
+"""
+import argparse
+import asyncio
+import importlib
+import json
+import os
+import platform
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import zlib
+from datetime import datetime
+from types import SimpleNamespace
+from typing import Awaitable, Callable, Dict, List, Optional
+
+import numpy as np
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+try:
+    import resource  # peak RSS of the finished server (not on Windows)
+except ImportError:
+    resource = None
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+SCENARIOS = ("chat", "chat_history", "chat_stream", "upload")
+DEFAULT_SCENARIOS = "chat,chat_history,upload"
+WORDS = (
+    "assistant battery calendar database engine feature gateway history index journal kernel latency memory "
+    "network orbit pipeline query reactor schedule storage thread upload vector window yield zone budget cache "
+    "deploy export filter graph health import invoice ledger metric notice option policy quota region server "
+    "ticket update version worker archive backup cluster domain event factor global layer module output"
+).split()
+
+
+# Stand-ins (installed in the server process)
+class HashingEmbedder:
+    """Deterministic SentenceTransformer stand-in: L2-normalized hashed bag of words"""
+
+    def __init__(self, dim: int = 384, batch_ms: float = 5.0, text_ms: float = 0.2):
+        self.dim = dim
+        self.batch_ms = batch_ms
+        self.text_ms = text_ms
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.dim
+
+    def encode(self, texts, batch_size: int = 32, **kwargs):
+        single = isinstance(texts, str)
+        batch = [texts] if single else list(texts)
+        time.sleep((self.batch_ms + self.text_ms * len(batch)) / 1000)
+        vectors = np.zeros((len(batch), self.dim), dtype=np.float32)
+        for row, text in enumerate(batch):
+            for word in text.lower().split():
+                digest = zlib.crc32(word.encode())
+                vectors[row, digest % self.dim] += 1.0 if digest & 1 else -1.0
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        vectors /= norms
+        return vectors[0] if single else vectors
+
+
+class FakeLLM:
+    """Deterministic LLM: the first token after `latency` seconds, then `rate` tokens per second"""
+
+    def __init__(self, latency: float, rate: float, tokens: int):
+        self.latency = latency
+        self.rate = rate
+        self.tokens = tokens
+
+    def _tokens(self, prompt: str) -> List[str]:
+        rng = random.Random(zlib.crc32(prompt.encode()))
+        return [rng.choice(WORDS) + " " for _ in range(self.tokens)]
+
+    def stream(self, prompt: str):
+        time.sleep(self.latency)
+        for i, token in enumerate(self._tokens(prompt)):
+            if i:
+                time.sleep(1 / self.rate)
+            yield token
+
+    def complete(self, prompt: str) -> str:
+        time.sleep(self.latency + (self.tokens - 1) / self.rate)
+        return "".join(self._tokens(prompt))
+
+
+class FakeOllama:
+    """The parts of the `ollama` module app.py calls"""
+
+    def __init__(self, llm: FakeLLM):
+        self.llm = llm
+
+    def chat(self, model: str, messages: list, stream: bool = False, **kwargs):
+        prompt = messages[-1]["content"] if messages else ""
+        if stream:
+            return ({"message": {"content": token}} for token in self.llm.stream(prompt))
+        return {"message": {"content": self.llm.complete(prompt) if messages else ""}}
+
+    def generate(self, model: str, prompt: str, context: Optional[list] = None, stream: bool = False, **kwargs):
+        # Ollama's context holds the token ids of the conversation so far
+        context = list(context or []) + [0] * (len(prompt) // 4 + self.llm.tokens)
+        if stream:
+            def parts():
+                for token in self.llm.stream(prompt):
+                    yield {"response": token, "done": False}
+                yield {"response": "", "done": True, "context": context}
+            return parts()
+        return {"response": self.llm.complete(prompt), "context": context}
+
+
+class FakeGeminiModel:
+    """The parts of a google.generativeai GenerativeModel app_gemini.py calls"""
+
+    def __init__(self, llm: FakeLLM):
+        self.llm = llm
+
+    def generate_content(self, prompt: str, stream: bool = False):
+        if stream:
+            return (SimpleNamespace(text=token) for token in self.llm.stream(prompt))
+        return SimpleNamespace(text=self.llm.complete(prompt))
+
+
+def install_stand_ins(backend, args):
+    """Replace the backend's model and external-service loaders with stand-ins"""
+    llm = FakeLLM(args.llm_latency_ms / 1000, args.llm_tokens_per_second, args.llm_tokens)
+    embedder = HashingEmbedder(batch_ms=args.embed_batch_ms, text_ms=args.embed_text_ms)
+
+    def load_embeddings():
+        backend.embedding_model = embedder
+
+    def load_ollama():
+        backend.ollama = FakeOllama(llm)
+        backend.OLLAMA_AVAILABLE = True
+
+    def load_gemini():
+        backend.gemini_model = FakeGeminiModel(llm)
+
+    backend.startup.register("embeddings", load_embeddings)
+    if args.backend == "app":
+        backend.startup.register("pinecone", lambda: False)  # retrieval stays in-process
+        backend.startup.register("llm", load_ollama)
+    else:
+        backend.startup.register("gemini", load_gemini)
+
+
+def serve(args):
+    """Server process: import the backend, install stand-ins and run uvicorn"""
+    import uvicorn
+    sys.path.insert(0, BACKEND_DIR)
+    backend = importlib.import_module(args.backend)
+    install_stand_ins(backend, args)
+    uvicorn.run(backend.app, host="127.0.0.1", port=args.port, log_level="warning")
+
+
+# Workload (driven from the parent process)
+def sentence(rng: random.Random, words: int) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(words))
+
+
+def document(seed: int, kb: float) -> bytes:
+    rng = random.Random(seed)
+    lines, size = [], 0
+    while size < kb * 1024:
+        line = sentence(rng, 12).capitalize() + ".\n"
+        lines.append(line)
+        size += len(line)
+    return "".join(lines).encode()
+
+
+def percentile(values: List[float], pct: float) -> Optional[float]:
+    """Nearest-rank percentile of sorted values"""
+    if not values:
+        return None
+    return values[min(len(values) - 1, max(0, int(np.ceil(pct / 100 * len(values))) - 1))]
+
+
+def summarize(latencies: List[float]) -> dict:
+    values = sorted(latencies)
+    return {
+        "p50": round(percentile(values, 50) * 1000, 2) if values else None,
+        "p95": round(percentile(values, 95) * 1000, 2) if values else None,
+        "p99": round(percentile(values, 99) * 1000, 2) if values else None,
+        "mean": round(sum(values) / len(values) * 1000, 2) if values else None,
+        "max": round(values[-1] * 1000, 2) if values else None,
+    }
+
+
+def server_rss_mb(pid: int) -> Dict[str, Optional[float]]:
+    """Current and peak RSS of the server from /proc (Linux only)"""
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            fields = dict(line.split(":", 1) for line in f if ":" in line)
+        return {"rss_mb": int(fields["VmRSS"].split()[0]) / 1024, "peak_rss_mb": int(fields["VmHWM"].split()[0]) / 1024}
+    except (OSError, KeyError, ValueError):
+        return {"rss_mb": None, "peak_rss_mb": None}
+
+
+class Workload:
+    """Request builders for each scenario; the i-th request is the same in every run"""
+
+    def __init__(self, args):
+        self.args = args
+
+    def question(self, i: int) -> str:
+        return sentence(random.Random(f"{self.args.seed}-q-{i}"), 10) + "?"
+
+    def history(self, i: int) -> List[dict]:
+        rng = random.Random(f"{self.args.seed}-h-{i}")
+        return [{"role": "user" if turn % 2 == 0 else "assistant", "content": sentence(rng, 25)}
+                for turn in range(self.args.history_messages)]
+
+    async def chat(self, client, i: int, history: bool = False) -> dict:
+        body = {"message": self.question(i)}
+        if history:
+            body["history"] = self.history(i)
+        response = await client.post("/chat", json=body)
+        ok = response.status_code == 200 and not response.json()["response"].startswith("⚠️")
+        return {"ok": ok}
+
+    async def chat_history(self, client, i: int) -> dict:
+        return await self.chat(client, i, history=True)
+
+    async def chat_stream(self, client, i: int) -> dict:
+        started = time.perf_counter()
+        first_token, ok = None, False
+        async with client.stream("POST", "/chat/stream", json={"message": self.question(i)}) as response:
+            async for line in response.aiter_lines():
+                if line.startswith("event: token") and first_token is None:
+                    first_token = time.perf_counter() - started
+                elif line.startswith("event: done"):
+                    ok = response.status_code == 200
+                elif line.startswith("event: error"):
+                    ok = False
+                    break
+        return {"ok": ok and first_token is not None, "first_token": first_token}
+
+    async def upload(self, client, i: int, prefix: str = "doc") -> dict:
+        files = {"file": (f"{prefix}-{self.args.seed}-{i}.txt", document(zlib.crc32(f"{prefix}-{i}".encode()), self.args.upload_kb), "text/plain")}
+        response = await client.post("/upload", params={"wait": "true"}, files=files)
+        return {"ok": response.status_code == 200}
+
+
+async def run_scenario(client, request: Callable[..., Awaitable[dict]], count: int, concurrency: int, offset: int = 0) -> dict:
+    """Send `count` requests from `concurrency` workers; returns latencies and errors"""
+    latencies, first_tokens = [], []
+    errors = 0
+    next_index = iter(range(offset, offset + count))
+
+    async def worker():
+        nonlocal errors
+        for i in next_index:
+            started = time.perf_counter()
+            try:
+                result = await request(client, i)
+            except Exception:
+                result = {"ok": False}
+            if result["ok"]:
+                latencies.append(time.perf_counter() - started)
+                if result.get("first_token") is not None:
+                    first_tokens.append(result["first_token"])
+            else:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return {"latencies": latencies, "first_tokens": first_tokens, "errors": errors,
+            "seconds": time.perf_counter() - started}
+
+
+async def drive(args, base_url: str, pid: int) -> dict:
+    workload = Workload(args)
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=base_url, timeout=args.timeout, limits=limits) as client:
+        components = (await client.get("/ready")).json()["components"]
+        log(f"Seeding {args.corpus_docs} documents...")
+        await run_scenario(client, lambda c, i: workload.upload(c, i, prefix="corpus"), args.corpus_docs, args.concurrency)
+        results = {}
+        for name in args.scenarios:
+            request = getattr(workload, name)
+            await run_scenario(client, request, args.warmup, args.concurrency, offset=10 ** 6)
+            run = await run_scenario(client, request, args.requests, args.concurrency)
+            result = {
+                "requests": args.requests,
+                "errors": run["errors"],
+                "seconds": round(run["seconds"], 3),
+                "rps": round(len(run["latencies"]) / run["seconds"], 2) if run["seconds"] else None,
+                "latency_ms": summarize(run["latencies"]),
+            }
+            if run["first_tokens"]:
+                result["first_token_ms"] = summarize(run["first_tokens"])
+            result["server"] = server_rss_mb(pid)
+            results[name] = result
+            log(f"{name}: {result['rps']} req/s, p50 {result['latency_ms']['p50']} ms, "
+                f"p99 {result['latency_ms']['p99']} ms, {result['errors']} errors")
+    return {"components": components, "scenarios": results}
+
+
+def log(message: str):
+    print(message, file=sys.stderr, flush=True)
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def wait_ready(process: subprocess.Popen, base_url: str, timeout: float = 120.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Server exited with code {process.returncode}")
+        try:
+            if httpx.get(f"{base_url}/ready", timeout=1.0).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"Server not ready after {timeout:.0f}s")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load-test a JARVIS backend against local stand-ins")
+    parser.add_argument("--backend", choices=["app", "app_gemini"], default="app")
+    parser.add_argument("--scenarios", default=DEFAULT_SCENARIOS, help=f"comma-separated, from {', '.join(SCENARIOS)}")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=200, help="measured requests per scenario")
+    parser.add_argument("--warmup", type=int, default=10, help="unmeasured requests before each scenario")
+    parser.add_argument("--corpus-docs", type=int, default=20, help="documents uploaded before measuring")
+    parser.add_argument("--upload-kb", type=float, default=16, help="size of each uploaded document")
+    parser.add_argument("--history-messages", type=int, default=6, help="history sent by chat_history")
+    parser.add_argument("--llm-latency-ms", type=float, default=200, help="time to the first LLM token")
+    parser.add_argument("--llm-tokens-per-second", type=float, default=50)
+    parser.add_argument("--llm-tokens", type=int, default=64, help="tokens per LLM answer")
+    parser.add_argument("--embed-batch-ms", type=float, default=5, help="fixed cost of each embedding call")
+    parser.add_argument("--embed-text-ms", type=float, default=0.2, help="added cost per embedded text")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--timeout", type=float, default=300, help="per-request timeout in seconds")
+    parser.add_argument("--output", help="also write the JSON report to this file")
+    parser.add_argument("--serve", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--port", type=int, default=0, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.serve:
+        return serve(args)
+    if httpx is None:
+        log("⚠️  httpx not installed. Install with: pip install httpx")
+        return 1
+    args.scenarios = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenario(s): {', '.join(sorted(unknown))}")
+
+    port = free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    child_argv = list(argv if argv is not None else sys.argv[1:])
+    with tempfile.TemporaryDirectory(prefix="jarvis-loadtest-") as workdir:
+        log_path = os.path.join(workdir, "server.log")
+        with open(log_path, "w") as server_log:
+            process = subprocess.Popen(
+                [sys.executable, os.path.abspath(__file__), *child_argv, "--serve", "--port", str(port)],
+                cwd=workdir, stdout=server_log, stderr=subprocess.STDOUT
+            )
+            try:
+                log(f"Starting {args.backend} on {base_url} (log: {log_path})")
+                wait_ready(process, base_url)
+                results = asyncio.run(drive(args, base_url, process.pid))
+            except Exception:
+                with open(log_path) as f:
+                    log(f.read()[-4000:])
+                raise
+            finally:
+                process.terminate()
+                process.wait()
+
+    # Peak RSS of waited-for children: kilobytes on Linux, bytes on macOS
+    peak = None
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / (1024 * 1024 if sys.platform == "darwin" else 1024)
+    report = {
+        "backend": args.backend,
+        "commit": git_commit(),
+        "timestamp": datetime.now().isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": {key: value for key, value in vars(args).items() if key not in ("serve", "port", "output")},
+        **results,
+        "server": {"peak_rss_mb": round(peak, 1) if peak is not None else None},
+    }
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
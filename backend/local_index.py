@@ -0,0 +1,599 @@
+"""NumPy-backed local vector index used when no hosted vector DB is configured"""
+import json
+import mmap
+import os
+import threading
+import time
+from array import array
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from locks import FileLock
+from retrieval import matches_filter
+
+EMBEDDING_DIM = int(os.getenv("EMBEDDING_DIM", "384"))  # all-MiniLM-L6-v2 dimension
+GROWTH_ROWS = int(os.getenv("LOCAL_INDEX_GROWTH_ROWS", "1024"))
+REFRESH_SECONDS = float(os.getenv("LOCAL_INDEX_REFRESH_SECONDS", "0.1"))  # how often to check for other writers
+QUANTIZATION = os.getenv("LOCAL_INDEX_QUANTIZATION", "float32")  # float32, float16 or int8
+RESCORE_FACTOR = int(os.getenv("LOCAL_INDEX_RESCORE", "4"))  # re-score top_k * this at full precision (0 = off)
+SCAN_ROWS = 8192  # quantized rows widened to float32 at a time while scanning
+QUERY_BLOCK = 256  # queries scored together by search_batch (bounds its score matrix)
+QUANTIZATIONS = ("float32", "float16", "int8")
+
+
+def normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    """L2-normalize each row so a dot product is a cosine similarity"""
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def top_k_indices(scores: np.ndarray, top_k: int) -> np.ndarray:
+    """Indices of the top_k highest scores, best first"""
+    if top_k <= 0 or scores.size == 0:
+        return np.empty(0, dtype=np.int64)
+    if scores.size > top_k:
+        candidates = np.argpartition(-scores, top_k - 1)[:top_k]
+    else:
+        candidates = np.arange(scores.size)
+    return candidates[np.argsort(-scores[candidates], kind="stable")]
+
+
+def top_k_columns(scores: np.ndarray, labels: np.ndarray, keep: int) -> Tuple[np.ndarray, np.ndarray]:
+    """The `keep` highest scores in each row, with their labels (unordered)"""
+    if scores.shape[1] <= keep:
+        return scores, labels
+    best = np.argpartition(-scores, keep - 1, axis=1)[:, :keep]
+    return np.take_along_axis(scores, best, axis=1), np.take_along_axis(labels, best, axis=1)
+
+
+def quantize_rows(vectors: np.ndarray, quantization: str) -> Dict[str, np.ndarray]:
+    """Row-aligned arrays stored for normalized float32 vectors: the vectors
+    themselves plus, when quantized, their codes and (int8) per-row scales"""
+    rows = {"vectors": vectors}
+    if quantization == "float16":
+        rows["codes"] = vectors.astype(np.float16)
+    elif quantization == "int8":
+        scales = np.abs(vectors).max(axis=1) / 127
+        scales[scales == 0] = 1.0
+        rows["codes"] = np.rint(vectors / scales[:, None]).astype(np.int8)
+        rows["scales"] = scales.astype(np.float32)
+    return rows
+
+
+class _Records:
+    """Read-only sequence of one field ("text" or "metadata") of every chunk"""
+
+    def __init__(self, index: "LocalVectorIndex", field: str):
+        self._index = index
+        self._field = field
+
+    def __len__(self):
+        return self._index.count
+
+    def __getitem__(self, row: int):
+        return self._index._record(row)[self._field]
+
+    def __iter__(self):
+        return (self[row] for row in range(len(self)))
+
+
+class LocalVectorIndex:
+    """Cosine-similarity index over a contiguous float32 (or quantized) matrix.
+
+    Rows are L2-normalized on insert, so a query is a single matrix-vector
+    product followed by argpartition for the top-k. The matrix grows in
+    amortized chunks (at least GROWTH_ROWS rows or half the current
+    capacity at a time). With a `path`, the matrix lives in a memory-mapped
+    `vectors.npy` and chunk texts/metadata in `chunks.jsonl`, so a restart
+    reloads the index without re-embedding anything. Deleted rows are
+    tombstoned (and listed in `deleted.txt`) rather than compacted away, so
+    row numbers stay stable as document ids.
+
+    On disk the index can be shared by several processes (uvicorn
+    workers): both files are memory-mapped, so their pages are shared and
+    a worker only keeps one offset per chunk, decoding texts on demand.
+    Writes are serialized by a file lock and bump a version in `meta.json`;
+    `changed()` is a cheap (throttled) stat of that file, and `refresh()`
+    maps in whatever other processes added or deleted.
+
+    With `quantization` "float16" or "int8" (per-row scale factors in
+    `scales.npy`), searches scan a compact copy of the matrix, 2x or ~4x
+    smaller than float32, and then re-score the best top_k * `rescore`
+    candidates against the full-precision rows. Those stay on disk in
+    `vectors.npy` and only the candidates' pages are read; without a
+    `path` only the quantized copy is kept and nothing is re-scored.
+
+    An optional `ann` index (see ann.py) narrows single-query searches to
+    candidate rows; it is kept up to date after every write and refresh.
+    """
+
+    def __init__(self, dim: int = EMBEDDING_DIM, path: Optional[str] = None,
+                 quantization: str = QUANTIZATION, rescore: int = RESCORE_FACTOR):
+        if quantization not in QUANTIZATIONS:
+            raise ValueError(f"Unknown local index quantization {quantization!r} (expected one of {QUANTIZATIONS})")
+        self.dim = dim
+        self.path = path
+        self.quantization = quantization
+        self.count = 0
+        self.version = 0
+        self._arrays: Dict[str, np.ndarray] = {
+            name: np.empty((0,) + shape, dtype=dtype) for name, (dtype, shape) in self._array_specs().items()
+        }
+        self.rescore = rescore if "codes" in self._arrays and "vectors" in self._arrays else 0
+        self.ann = None  # optional approximate index over these rows
+        self.deleted = set()
+        self._deleted_rows = np.empty(0, dtype=np.int64)
+        self._lock = threading.Lock()
+        self._memory_records: List[dict] = []  # chunk records when there is no path
+        self._offsets = array("q", [0])  # start of each chunk line, plus the end of the last
+        self._chunks_map = None
+        self._deleted_offset = 0
+        self._signature = None
+        self._checked = 0.0
+        self._unseen: Tuple[List[int], List[int]] = ([], [])  # changes not yet returned by refresh()
+        # Filterable metadata of the first rows, parsed once per row on the first filtered search
+        self._fields_lock = threading.Lock()
+        self._filename_ids: Dict[Optional[str], int] = {}
+        self._filename_codes = np.empty(0, dtype=np.int32)
+        self._uploaded_at = np.empty(0, dtype=np.float64)  # NaN when missing
+        self.texts = _Records(self, "text")
+        self.metadatas = _Records(self, "metadata")
+        if path:
+            os.makedirs(path, exist_ok=True)
+            self._write_lock = FileLock(os.path.join(path, "write.lock"))
+            with self._write_lock:
+                self._load()
+            self._unseen = ([], [])
+
+    def __len__(self):
+        return self.count - len(self.deleted)
+
+    def _array_specs(self) -> Dict[str, tuple]:
+        """Name -> (dtype, row shape) of each row-aligned array this mode stores"""
+        specs = {}
+        if self.quantization == "float32" or self.path:
+            specs["vectors"] = (np.float32, (self.dim,))
+        if self.quantization != "float32":
+            specs["codes"] = (np.dtype(self.quantization), (self.dim,))
+        if self.quantization == "int8":
+            specs["scales"] = (np.float32, ())
+        return specs
+
+    # Persistence
+    @property
+    def _vectors_file(self):
+        return os.path.join(self.path, "vectors.npy")
+
+    def _array_file(self, name: str, quantization: Optional[str] = None) -> str:
+        if name == "codes":
+            return os.path.join(self.path, f"codes-{quantization or self.quantization}.npy")
+        return os.path.join(self.path, f"{name}.npy")
+
+    @property
+    def _chunks_file(self):
+        return os.path.join(self.path, "chunks.jsonl")
+
+    @property
+    def _deleted_file(self):
+        return os.path.join(self.path, "deleted.txt")
+
+    @property
+    def _meta_file(self):
+        return os.path.join(self.path, "meta.json")
+
+    def _record(self, row: int) -> dict:
+        if not self.path:
+            return self._memory_records[row]
+        if not 0 <= row < self.count:
+            raise IndexError(row)
+        return json.loads(self._chunks_map[self._offsets[row]:self._offsets[row + 1]])
+
+    def _map_chunks(self):
+        if not os.path.exists(self._chunks_file):
+            return
+        with open(self._chunks_file, "rb") as f:
+            # Earlier maps are left to the garbage collector, since other
+            # threads may still be reading from them
+            if os.fstat(f.fileno()).st_size:
+                self._chunks_map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def _load(self):
+        """Open the index files and drop any uncommitted tail; runs under the write lock"""
+        if not os.path.exists(self._meta_file) or not os.path.exists(self._vectors_file):
+            return
+        with open(self._meta_file) as f:
+            meta = json.load(f)
+        if meta.get("quantization", "float32") != self.quantization:
+            self._requantize(meta)
+        self._refresh_locked()
+        if os.path.exists(self._chunks_file):
+            with open(self._chunks_file, "rb+") as f:
+                if os.fstat(f.fileno()).st_size > self._offsets[-1]:
+                    f.truncate(self._offsets[-1])
+
+    def _requantize(self, meta: dict):
+        """Rebuild the quantized arrays for this mode from the full-precision
+        vectors, e.g. after LOCAL_INDEX_QUANTIZATION changed; runs under the write lock"""
+        vectors = np.load(self._vectors_file, mmap_mode="r")
+        count = meta.get("count", 0)
+        arrays = {}
+        for name, (dtype, shape) in self._array_specs().items():
+            if name != "vectors":
+                arrays[name] = np.lib.format.open_memmap(
+                    self._array_file(name) + ".tmp", mode="w+", dtype=dtype, shape=(vectors.shape[0],) + shape)
+        for start in range(0, count, SCAN_ROWS):
+            rows = quantize_rows(np.asarray(vectors[start:start + SCAN_ROWS]), self.quantization)
+            for name, stored in arrays.items():
+                stored[start:start + len(rows[name])] = rows[name]
+        for name, stored in arrays.items():
+            stored.flush()
+            os.replace(self._array_file(name) + ".tmp", self._array_file(name))
+        for quantization in QUANTIZATIONS:
+            stale = self._array_file("codes", quantization)
+            if quantization != self.quantization and os.path.exists(stale):
+                os.remove(stale)
+        if self.quantization != "int8" and os.path.exists(self._array_file("scales")):
+            os.remove(self._array_file("scales"))
+        print(f"✓ Local index re-quantized to {self.quantization} ({count} chunks)")
+        self._dump_meta({**meta, "quantization": self.quantization, "version": meta.get("version", 0) + 1})
+
+    def _stat_meta(self):
+        stat = os.stat(self._meta_file)
+        return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+    def _refresh_locked(self) -> Tuple[List[int], List[int]]:
+        try:
+            signature = self._stat_meta()
+            with open(self._meta_file) as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return [], []
+        if meta.get("quantization", "float32") != self.quantization:
+            raise ValueError(f"Local index is stored as {meta.get('quantization', 'float32')}, not {self.quantization}; "
+                             "restart every process with the same LOCAL_INDEX_QUANTIZATION")
+        self._signature = signature
+        self.version = meta.get("version", 0)
+        count = meta.get("count", 0)
+        added = []
+        if count > self.count:
+            for name, current in self._arrays.items():
+                if count > current.shape[0]:
+                    # Another process grew (and so replaced) this file
+                    loaded = np.load(self._array_file(name), mmap_mode="r+")
+                    if loaded.shape[1:] != current.shape[1:]:
+                        raise ValueError(f"Local index dimension {loaded.shape[1:]} does not match {current.shape[1:]}")
+                    self._arrays[name] = loaded
+            self._map_chunks()
+            position = self._offsets[-1]
+            while len(self._offsets) <= count and self._chunks_map is not None:
+                end = self._chunks_map.find(b"\n", position)
+                if end < 0:
+                    break
+                position = end + 1
+                self._offsets.append(position)
+            added = list(range(self.count, len(self._offsets) - 1))
+            self.count = len(self._offsets) - 1
+        deleted = []
+        if os.path.exists(self._deleted_file):
+            with open(self._deleted_file, "rb") as f:
+                f.seek(self._deleted_offset)
+                data = f.read()
+            complete = data.rfind(b"\n") + 1
+            self._deleted_offset += complete
+            for line in data[:complete].split():
+                row = int(line)
+                if row < self.count and row not in self.deleted:
+                    self.deleted.add(row)
+                    deleted.append(row)
+            if deleted:
+                self._deleted_rows = np.fromiter(self.deleted, dtype=np.int64)
+        self._unseen[0].extend(added)
+        self._unseen[1].extend(deleted)
+        return added, deleted
+
+    def _dump_meta(self, meta: dict):
+        tmp = f"{self._meta_file}.{os.getpid()}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(meta, f)
+        os.replace(tmp, self._meta_file)
+
+    def _write_meta(self):
+        self.version += 1
+        self._dump_meta({"count": self.count, "dim": self.dim, "quantization": self.quantization, "version": self.version})
+        self._signature = self._stat_meta()
+
+    def _ensure_capacity(self, needed: int):
+        capacity = min(stored.shape[0] for stored in self._arrays.values())
+        if needed <= capacity:
+            return
+        new_capacity = max(needed, capacity + max(GROWTH_ROWS, capacity // 2))
+        for name, stored in self._arrays.items():
+            shape = (new_capacity,) + stored.shape[1:]
+            if self.path:
+                tmp = self._array_file(name) + ".tmp"
+                grown = np.lib.format.open_memmap(tmp, mode="w+", dtype=stored.dtype, shape=shape)
+                grown[:self.count] = stored[:self.count]
+                grown.flush()
+                os.replace(tmp, self._array_file(name))
+            else:
+                grown = np.empty(shape, dtype=stored.dtype)
+                grown[:self.count] = stored[:self.count]
+            self._arrays[name] = grown
+
+    def _write_rows(self, start: int, vectors: np.ndarray):
+        rows = quantize_rows(vectors, self.quantization)
+        for name, stored in self._arrays.items():
+            stored[start:start + len(vectors)] = rows[name]
+            if self.path:
+                stored.flush()
+
+    # Public API
+    def changed(self) -> bool:
+        """Whether another process has written since the last refresh.
+        At most one stat() per REFRESH_SECONDS, so it is cheap to call per query."""
+        if not self.path:
+            return False
+        if self._unseen[0] or self._unseen[1]:
+            return True
+        now = time.monotonic()
+        if now - self._checked < REFRESH_SECONDS:
+            return False
+        self._checked = now
+        try:
+            return self._stat_meta() != self._signature
+        except OSError:
+            return False
+
+    def refresh(self) -> Tuple[List[int], List[int]]:
+        """Map in what other processes wrote; returns (added rows, newly deleted rows)
+        since the last call, including changes picked up while writing"""
+        if not self.path:
+            return [], []
+        with self._lock:
+            self._refresh_locked()
+            unseen, self._unseen = self._unseen, ([], [])
+        if self.ann is not None and unseen[0]:
+            self.ann.update()
+        return unseen
+
+    def add(self, embeddings, texts: List[str], metadatas: List[dict]) -> List[int]:
+        """Append normalized embeddings with their chunk text and metadata"""
+        vectors = normalize_rows(np.asarray(embeddings, dtype=np.float32).reshape(-1, self.dim))
+        if not self.path:
+            with self._lock:
+                start = self.count
+                end = start + len(vectors)
+                self._ensure_capacity(end)
+                self._write_rows(start, vectors)
+                self._memory_records.extend({"text": text, "metadata": metadata} for text, metadata in zip(texts, metadatas))
+                self.count = end
+            if self.ann is not None:
+                self.ann.update()
+            return list(range(start, end))
+        with self._lock, self._write_lock:
+            self._refresh_locked()  # rows other processes appended come first
+            start = self.count
+            end = start + len(vectors)
+            self._ensure_capacity(end)
+            self._write_rows(start, vectors)
+            with open(self._chunks_file, "ab") as f:
+                f.truncate(self._offsets[-1])  # drop any uncommitted tail
+                position = self._offsets[-1]
+                for text, metadata in zip(texts, metadatas):
+                    line = (json.dumps({"text": text, "metadata": metadata}) + "\n").encode("utf-8")
+                    f.write(line)
+                    position += len(line)
+                    self._offsets.append(position)
+            self._map_chunks()
+            self.count = end
+            self._write_meta()
+        if self.ann is not None:
+            self.ann.update()
+        return list(range(start, end))
+
+    def delete(self, rows: List[int]):
+        """Tombstone rows so they no longer appear in search results"""
+        if not self.path:
+            with self._lock:
+                self._tombstone(rows)
+            return
+        with self._lock, self._write_lock:
+            self._refresh_locked()
+            rows = self._tombstone(rows)
+            if rows:
+                data = "".join(f"{row}\n" for row in rows).encode()
+                with open(self._deleted_file, "ab") as f:
+                    f.write(data)
+                self._deleted_offset += len(data)
+                self._write_meta()
+
+    def _tombstone(self, rows: List[int]) -> List[int]:
+        rows = [row for row in rows if 0 <= row < self.count and row not in self.deleted]
+        self.deleted.update(rows)
+        if rows:
+            self._deleted_rows = np.fromiter(self.deleted, dtype=np.int64)
+        return rows
+
+    def live_rows(self) -> List[int]:
+        """Row numbers that have not been deleted"""
+        return [row for row in range(self.count) if row not in self.deleted]
+
+    def row_vectors(self, rows) -> np.ndarray:
+        """Float32 vectors of a slice or array of rows (dequantized if only codes are stored)"""
+        arrays = dict(self._arrays)
+        if "vectors" in arrays:
+            return np.asarray(arrays["vectors"][rows], dtype=np.float32)
+        vectors = arrays["codes"][rows].astype(np.float32)
+        if "scales" in arrays:
+            vectors *= arrays["scales"][rows][:, None]
+        return vectors
+
+    def stats(self) -> dict:
+        """Storage mode and the memory each chunk costs in the scanned matrix"""
+        arrays = self._arrays
+        scanned = [stored for name, stored in arrays.items() if name != "vectors"] or [arrays["vectors"]]
+        return {
+            "chunks": len(self),
+            "quantization": self.quantization,
+            "bytes_per_chunk": sum(stored.itemsize * int(np.prod(stored.shape[1:])) for stored in scanned),
+            "rescore": self.rescore,
+            "ann": self.ann.stats() if self.ann is not None else None,
+        }
+
+    def _scan_block(self, arrays: Dict[str, np.ndarray], queries: np.ndarray, start: int, end: int) -> np.ndarray:
+        """Approximate scores of rows start:end for each normalized query, from the quantized codes if any"""
+        codes = arrays.get("codes")
+        if codes is None:
+            return queries @ arrays["vectors"][start:end].T
+        block = queries @ codes[start:end].astype(np.float32).T
+        if "scales" in arrays:
+            block *= arrays["scales"][start:end]
+        return block
+
+    def _scan(self, arrays: Dict[str, np.ndarray], count: int, queries: np.ndarray) -> np.ndarray:
+        """Approximate scores of every row for each normalized query"""
+        if "codes" not in arrays:
+            return self._scan_block(arrays, queries, 0, count)
+        scores = np.empty((len(queries), count), dtype=np.float32)
+        for start in range(0, count, SCAN_ROWS):
+            end = min(start + SCAN_ROWS, count)
+            scores[:, start:end] = self._scan_block(arrays, queries, start, end)
+        return scores
+
+    def _scan_top(self, arrays: Dict[str, np.ndarray], count: int, queries: np.ndarray, keep: int,
+                  live: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """The `keep` best live (rows, approximate scores) per query. Rows are
+        scanned SCAN_ROWS at a time and only the running best are kept, so
+        memory is queries x SCAN_ROWS rather than queries x chunks."""
+        best_rows = np.empty((len(queries), 0), dtype=np.int64)
+        best_scores = np.empty((len(queries), 0), dtype=np.float32)
+        for start in range(0, count, SCAN_ROWS):
+            end = min(start + SCAN_ROWS, count)
+            scores = self._scan_block(arrays, queries, start, end)
+            scores[:, ~live[start:end]] = -np.inf
+            scores, rows = top_k_columns(scores, np.broadcast_to(np.arange(start, end), scores.shape), keep)
+            if best_rows.shape[1]:
+                scores, rows = top_k_columns(np.concatenate([best_scores, scores], axis=1),
+                                             np.concatenate([best_rows, rows], axis=1), keep)
+            best_scores, best_rows = scores, rows
+        return best_rows, best_scores
+
+    def _filter_fields(self, count: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Filename codes and upload times of the first `count` rows; each
+        row's metadata is parsed the first time a filtered search reaches it"""
+        with self._fields_lock:
+            start = len(self._uploaded_at)
+            if count > start:
+                codes = np.empty(count - start, dtype=np.int32)
+                times = np.full(count - start, np.nan)
+                for i in range(count - start):
+                    metadata = self.metadatas[start + i] or {}
+                    codes[i] = self._filename_ids.setdefault(metadata.get("filename"), len(self._filename_ids))
+                    uploaded_at = metadata.get("uploaded_at")
+                    if isinstance(uploaded_at, (int, float)):
+                        times[i] = uploaded_at
+                self._filename_codes = np.concatenate([self._filename_codes, codes])
+                self._uploaded_at = np.concatenate([self._uploaded_at, times])
+            return self._filename_codes[:count], self._uploaded_at[:count]
+
+    def _filter_mask(self, flt: dict, count: int) -> np.ndarray:
+        """Rows of the first `count` matching a retrieval.metadata_filter()"""
+        mask = np.ones(count, dtype=bool)
+        if "$and" in flt:
+            for clause in flt["$and"]:
+                mask &= self._filter_mask(clause, count)
+            return mask
+        codes, times = self._filter_fields(count)
+        for field, condition in flt.items():
+            for op, target in condition.items():
+                if field == "filename" and op == "$eq":
+                    code = self._filename_ids.get(target)
+                    mask &= (codes == code) if code is not None else False
+                elif field == "uploaded_at" and op in ("$gte", "$lte"):
+                    mask &= (times >= target) if op == "$gte" else (times <= target)
+                else:  # not cached: evaluate against each row's metadata
+                    clause = {field: {op: target}}
+                    mask &= np.fromiter((matches_filter(self.metadatas[row], clause) for row in range(count)),
+                                        dtype=bool, count=count)
+        return mask
+
+    def _score_rows(self, arrays: Dict[str, np.ndarray], rows: np.ndarray, query: np.ndarray) -> np.ndarray:
+        """Approximate scores of selected rows for one normalized query"""
+        codes = arrays.get("codes")
+        if codes is None:
+            return arrays["vectors"][rows] @ query
+        scores = codes[rows].astype(np.float32) @ query
+        if "scales" in arrays:
+            scores *= arrays["scales"][rows]
+        return scores
+
+    def _rank(self, arrays: Dict[str, np.ndarray], query: np.ndarray, scores: np.ndarray, top_k: int,
+              rows: Optional[np.ndarray] = None) -> List[Tuple[int, float]]:
+        """Top-k (row, score) pairs, re-scoring quantized candidates at full precision when enabled.
+        `rows` maps positions in `scores` to row numbers when only some rows were scored."""
+        if not self.rescore:
+            best = top_k_indices(scores, top_k)
+            return [(int(row), float(scores[i])) for i, row in zip(best, best if rows is None else rows[best])]
+        candidates = top_k_indices(scores, top_k * self.rescore)
+        candidates = candidates[np.isfinite(scores[candidates])]
+        candidates = np.sort(candidates if rows is None else rows[candidates])  # file order for the disk reads
+        exact = arrays["vectors"][candidates] @ query
+        return [(int(candidates[i]), float(exact[i])) for i in top_k_indices(exact, top_k)]
+
+    def search(self, query_embedding, top_k: int = 3) -> List[Tuple[int, float]]:
+        """Top-k cosine search; returns (row, score) pairs, best first"""
+        with self._lock:
+            arrays, count, deleted_rows = dict(self._arrays), self.count, self._deleted_rows
+        if count - len(deleted_rows) <= 0:
+            return []
+        query = np.asarray(query_embedding, dtype=np.float32).reshape(-1)
+        norm = np.linalg.norm(query)
+        if norm == 0:
+            return []
+        query = query / norm
+        top_k = min(top_k, count - len(deleted_rows))
+        rows = self.ann.candidates(query, count) if self.ann is not None else None
+        if rows is not None:
+            scores = self._score_rows(arrays, rows, query)
+            if len(deleted_rows):
+                scores[np.isin(rows, deleted_rows)] = -np.inf
+            results = self._rank(arrays, query, scores, min(top_k, int(np.isfinite(scores).sum())), rows)
+            if len(results) == top_k:
+                return results
+            # Too few live rows in the probed lists: fall back to the exact scan
+        scores = self._scan(arrays, count, query[None])[0]
+        if len(deleted_rows):
+            scores[deleted_rows] = -np.inf
+        return self._rank(arrays, query, scores, top_k)
+
+    def search_batch(self, query_embeddings, top_k: int = 3, flt: Optional[dict] = None) -> List[List[Tuple[int, float]]]:
+        """Top-k cosine search for many queries, QUERY_BLOCK queries per matrix product.
+
+        `flt` is an optional retrieval.metadata_filter() (e.g. from a
+        /search request). Returns one list of (row, score) pairs per query.
+        Unfiltered searches go through the ANN index one query at a time
+        once it is trained; filtered ones always scan every row.
+        """
+        if flt is None and self.ann is not None and self.ann.ready:
+            return [self.search(query, top_k) for query in query_embeddings]
+        with self._lock:
+            arrays, count, deleted_rows = dict(self._arrays), self.count, self._deleted_rows
+        queries = normalize_rows(np.asarray(query_embeddings, dtype=np.float32).reshape(len(query_embeddings), -1))
+        live = np.ones(count, dtype=bool)
+        live[deleted_rows] = False
+        if flt:
+            live &= self._filter_mask(flt, count)
+        n_live = int(live.sum())
+        if n_live == 0 or len(queries) == 0:
+            return [[] for _ in range(len(queries))]
+        top_k = min(top_k, n_live)
+        keep = top_k * self.rescore if self.rescore else top_k
+        results = []
+        for start in range(0, len(queries), QUERY_BLOCK):
+            block = queries[start:start + QUERY_BLOCK]
+            rows, scores = self._scan_top(arrays, count, block, keep, live)
+            results.extend(self._rank(arrays, query, query_scores, top_k, query_rows)
+                           for query, query_scores, query_rows in zip(block, scores, rows))
+        return results
@@ -0,0 +1,63 @@
+"""Advisory file locks shared between server worker processes"""
+import os
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+class FileLock:
+    """Exclusive lock on a file, held by at most one process at a time.
+
+    The operating system releases it if the holder dies, so a crashed
+    worker never leaves a stale lock behind. Not reentrant, and not a
+    thread lock: pair it with a threading.Lock inside one process.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._fd = None
+
+    def _lock(self, blocking: bool) -> bool:
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            if fcntl:
+                fcntl.flock(fd, fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+            else:
+                msvcrt.locking(fd, msvcrt.LK_LOCK if blocking else msvcrt.LK_NBLCK, 1)
+        except OSError:
+            os.close(fd)
+            if blocking:
+                raise
+            return False
+        self._fd = fd
+        return True
+
+    def acquire(self):
+        self._lock(blocking=True)
+
+    def try_acquire(self) -> bool:
+        """Take the lock if no other process holds it; never waits"""
+        return self._lock(blocking=False)
+
+    def release(self):
+        if self._fd is None:
+            return
+        try:
+            if fcntl:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+            else:
+                os.lseek(self._fd, 0, os.SEEK_SET)
+                msvcrt.locking(self._fd, msvcrt.LK_UNLCK, 1)
+        finally:
+            os.close(self._fd)
+            self._fd = None
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
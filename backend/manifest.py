@@ -0,0 +1,96 @@
+"""Per-file chunk manifests for deduplicated, incremental re-ingestion"""
+import hashlib
+import json
+import os
+from typing import Dict, Iterable
+
+MANIFEST_DIR = os.getenv("MANIFEST_DIR", "./manifests")
+
+
+def chunk_hash(text: str) -> str:
+    """Content hash of one chunk"""
+    return hashlib.md5(text.encode("utf-8")).hexdigest()
+
+
+def file_key(filename: str) -> str:
+    """Stable short key for a filename, safe to use in ids and paths"""
+    return hashlib.sha1((filename or "").encode("utf-8")).hexdigest()[:16]
+
+
+def chunk_id(filename: str, text: str) -> str:
+    """Deterministic vector-store id for a chunk of a given file"""
+    return f"{file_key(filename)}-{chunk_hash(text)}"
+
+
+class StoredIds(list):
+    """Document ids returned by a store function.
+
+    `durable` is False when the chunks only live in process memory (app.py's
+    in-memory fallback, or a local index without a path). Such ids are not
+    recorded in manifests: after a restart the chunks are gone, and a
+    manifest listing them would make re-uploads skip every chunk.
+    """
+
+    def __init__(self, ids: Iterable = (), durable: bool = True):
+        super().__init__(ids)
+        self.durable = durable
+
+
+class ChunkManifest:
+    """Content hashes of every chunk stored for one filename.
+
+    Maps chunk hash -> document id in the vector store. Changes are
+    appended to a JSON-lines log as they happen, so an interrupted job
+    keeps what it already stored, and the log is rewritten compactly when
+    a job finishes.
+    """
+
+    def __init__(self, filename: str, root: str = MANIFEST_DIR):
+        self.filename = filename
+        self.path = os.path.join(root, f"{file_key(filename)}.jsonl")
+        self.entries: Dict[str, object] = {}
+        os.makedirs(root, exist_ok=True)
+        if os.path.exists(self.path):
+            with open(self.path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        break  # torn final line from a crash
+                    if record.get("removed"):
+                        self.entries.pop(record["hash"], None)
+                    else:
+                        self.entries[record["hash"]] = record["id"]
+
+    def __contains__(self, digest: str):
+        return digest in self.entries
+
+    def __len__(self):
+        return len(self.entries)
+
+    def _append(self, records):
+        with open(self.path, "a", encoding="utf-8") as f:
+            for record in records:
+                f.write(json.dumps(record) + "\n")
+
+    def add(self, items: Dict[str, object]):
+        """Record newly stored chunks (hash -> document id)"""
+        if not items:
+            return
+        self.entries.update(items)
+        self._append({"hash": digest, "id": doc_id} for digest, doc_id in items.items())
+
+    def remove(self, digests: Iterable[str]):
+        """Forget chunks that were deleted from the store"""
+        digests = [digest for digest in digests if digest in self.entries]
+        for digest in digests:
+            del self.entries[digest]
+        self._append({"hash": digest, "removed": True} for digest in digests)
+
+    def compact(self):
+        """Rewrite the log as one line per live chunk"""
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            for digest, doc_id in self.entries.items():
+                f.write(json.dumps({"hash": digest, "id": doc_id}) + "\n")
+        os.replace(tmp, self.path)
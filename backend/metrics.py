@@ -0,0 +1,262 @@
+"""Prometheus metrics: per-stage latency histograms, backend error and
+fallback counters, ingestion throughput and in-flight request gauges.
+
+Metrics are kept per process; with several uvicorn workers each scrape
+reaches one of them, so give every worker its own port (or scrape them
+through a process-aware proxy) when the totals matter.
+"""
+import threading
+import time
+from bisect import bisect_left
+from typing import Dict, List, Tuple
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class _Value:
+    """One labelled counter or gauge value"""
+
+    __slots__ = ("value", "_lock")
+
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0):
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount: float = 1.0):
+        with self._lock:
+            self.value -= amount
+
+    def set(self, value: float):
+        self.value = value
+
+
+class _Buckets:
+    """One labelled histogram: bucket counts, sum and count"""
+
+    __slots__ = ("bounds", "counts", "sum", "_lock")
+
+    def __init__(self, bounds: Tuple[float, ...]):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)  # the last one is +Inf
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        index = bisect_left(self.bounds, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+
+    def time(self) -> "_Timer":
+        """Observe the duration of a with-block"""
+        return _Timer(self)
+
+
+class _Timer:
+    """Context manager observing its duration (a plain class: @contextmanager costs ~3x more)"""
+
+    __slots__ = ("_buckets", "_started")
+
+    def __init__(self, buckets: _Buckets):
+        self._buckets = buckets
+
+    def __enter__(self):
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self._buckets.observe(time.perf_counter() - self._started)
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(labels)
+        self._children: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def labels(self, *values: str):
+        """The child for these label values; bind it once for hot paths"""
+        child = self._children.get(values)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(values, self._new_child())
+        return child
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for values, child in sorted(self._children.items()):
+            lines.extend(self._render_child(values, child))
+        return lines
+
+    def _render_child(self, values, child) -> List[str]:
+        return [f"{self.name}{_format_labels(self.label_names, values)} {_format_value(child.value)}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_child(self):
+        return _Value()
+
+    def inc(self, amount: float = 1.0):
+        self.labels().inc(amount)
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def _new_child(self):
+        return _Value()
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labels: Tuple[str, ...] = (), buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        super().__init__(name, documentation, labels)
+
+    def _new_child(self):
+        return _Buckets(self.buckets)
+
+    def _render_child(self, values, child) -> List[str]:
+        with child._lock:
+            counts, total = list(child.counts), child.sum
+        lines, cumulative = [], 0
+        for bound, count in zip(self.buckets + (float("inf"),), counts):
+            cumulative += count
+            le = 'le="+Inf"' if bound == float("inf") else f'le="{_format_value(bound)}"'
+            lines.append(f"{self.name}_bucket{_format_labels(self.label_names, values, le)} {cumulative}")
+        labels = _format_labels(self.label_names, values)
+        lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+        lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+REGISTRY: List[_Metric] = []
+
+
+def render() -> str:
+    """Every registered metric in the Prometheus text exposition format"""
+    return "\n".join(line for metric in REGISTRY for line in metric.render()) + "\n"
+
+
+# Metrics shared by both backends
+stage_seconds = Histogram("jarvis_stage_seconds", "Time spent in each RAG pipeline stage", ("stage",))
+request_seconds = Histogram("jarvis_request_seconds", "HTTP request latency by route", ("endpoint",))
+requests_total = Counter("jarvis_requests_total", "HTTP requests by route and status", ("endpoint", "status"))
+requests_inflight = Gauge("jarvis_requests_inflight", "HTTP requests currently being served", ("endpoint",))
+backend_errors = Counter("jarvis_backend_errors_total", "Errors raised by each backend", ("backend",))
+fallbacks = Counter("jarvis_fallbacks_total", "Requests served by a fallback instead of a backend", ("backend", "fallback"))
+ingest_chunks = Counter("jarvis_ingest_chunks_total", "Uploaded chunks by outcome", ("outcome",))
+ingest_bytes = Counter("jarvis_ingest_bytes_total", "Uploaded bytes ingested")
+ingest_seconds = Counter("jarvis_ingest_seconds_total", "Time spent embedding and storing uploads", ("stage",))
+ingest_jobs = Counter("jarvis_ingest_jobs_total", "Finished ingestion jobs by status", ("status",))
+
+# Stage timers, bound once so observing one skips the label lookup
+embed_seconds = stage_seconds.labels("embed")
+vector_search_seconds = stage_seconds.labels("vector_search")
+keyword_search_seconds = stage_seconds.labels("keyword_search")
+retrieve_seconds = stage_seconds.labels("retrieve")
+prompt_build_seconds = stage_seconds.labels("prompt_build")
+llm_first_token_seconds = stage_seconds.labels("llm_first_token")
+llm_total_seconds = stage_seconds.labels("llm_total")
+
+
+async def observe_llm_stream(tokens):
+    """Pass streamed tokens through, recording time to first token and total LLM time"""
+    started = time.perf_counter()
+    first = True
+    try:
+        async for token in tokens:
+            if first:
+                llm_first_token_seconds.observe(time.perf_counter() - started)
+                first = False
+            yield token
+    finally:
+        llm_total_seconds.observe(time.perf_counter() - started)
+
+
+class MetricsMiddleware:
+    """ASGI middleware tracking in-flight requests, latency and status per route.
+
+    Paths are labelled by their route template (e.g. /jobs/{job_id}) so
+    ids do not create new series; unknown paths are labelled "other".
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self._exact = None
+        self._prefixes = None
+
+    def _load_routes(self, router):
+        self._exact = set()
+        self._prefixes = {}
+        for route in getattr(router, "routes", []):
+            path = getattr(route, "path", None)
+            if not path:
+                continue
+            if "{" in path:
+                self._prefixes[path[:path.index("{")]] = path
+            else:
+                self._exact.add(path)
+
+    def endpoint(self, scope) -> str:
+        if self._exact is None:
+            self._load_routes(scope.get("app"))
+        path = scope.get("path", "")
+        if path in self._exact:
+            return path
+        prefix, _, tail = path.rpartition("/")
+        template = self._prefixes.get(prefix + "/")
+        return template if template and tail else "other"
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        endpoint = self.endpoint(scope)
+        inflight = requests_inflight.labels(endpoint)
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        inflight.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            inflight.dec()
+            request_seconds.labels(endpoint).observe(time.perf_counter() - started)
+            requests_total.labels(endpoint, str(status)).inc()
@@ -0,0 +1,79 @@
+"""Token-budgeted prompt assembly"""
+import os
+from typing import List, Tuple
+
+# Prompt budget (override via environment). app.py runs llama2 with a
+# 4096-token window (OLLAMA_NUM_CTX); the default leaves room for the answer.
+PROMPT_TOKEN_BUDGET = int(os.getenv("PROMPT_TOKEN_BUDGET", "3000"))
+HISTORY_MESSAGES = int(os.getenv("HISTORY_MESSAGES", "5"))  # most recent messages considered
+MIN_TRIM_TOKENS = 32  # a part is trimmed to fit only if at least this much room is left
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (~4 characters per token for English text)"""
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def _trim(text: str, tokens: int) -> str:
+    return text[:tokens * CHARS_PER_TOKEN].rstrip() + "..."
+
+
+def assemble_prompt(prompt: str, context: str) -> str:
+    """The final prompt sent to the LLM"""
+    return f"{context}\n\nUser: {prompt}\nAssistant:" if context else prompt
+
+
+class PromptTooLarge(ValueError):
+    """The user message alone does not fit in the prompt budget"""
+
+
+def message_room(message: str, budget: int = PROMPT_TOKEN_BUDGET) -> int:
+    """Tokens left for context and history around `message`; raises
+    PromptTooLarge when the message leaves no room at all"""
+    remaining = budget - estimate_tokens(assemble_prompt(message, "Conversation History:\n"))
+    if remaining < 0:
+        raise PromptTooLarge(f"Message is about {estimate_tokens(message)} tokens, "
+                             f"more than the {budget}-token prompt budget allows")
+    return remaining
+
+
+def build_context(context_docs: List[str], history: List[Tuple[str, str]], message: str,
+                  budget: int = PROMPT_TOKEN_BUDGET) -> Tuple[str, int]:
+    """Combine ranked context and recent history within a token budget.
+
+    `context_docs` are best-first and `history` is (role, content) pairs,
+    oldest first. Parts are admitted alternately by priority (best chunk,
+    newest message, next chunk, next-newest message, ...), so when the
+    budget runs out the lowest-ranked chunks and oldest messages are the
+    ones dropped; the first part that does not fit is trimmed if enough
+    room is left. Returns (context, estimated prompt tokens), which is at
+    most `budget`; raises PromptTooLarge if the message alone exceeds it.
+    """
+    docs = [f"Context: {doc}" for doc in context_docs]
+    lines = [f"{role.capitalize()}: {content}" for role, content in history[-HISTORY_MESSAGES:]] if HISTORY_MESSAGES > 0 else []
+    remaining = message_room(message, budget)
+
+    order = []
+    for rank in range(max(len(docs), len(lines))):
+        if rank < len(docs):
+            order.append((docs, rank))
+        if rank < len(lines):
+            order.append((lines, len(lines) - 1 - rank))
+
+    kept = set()
+    for parts, i in order:
+        cost = estimate_tokens(parts[i]) + 1  # separator
+        if cost <= remaining:
+            remaining -= cost
+        elif remaining >= MIN_TRIM_TOKENS:
+            parts[i] = _trim(parts[i], remaining - 2)
+            remaining = 0
+        else:
+            break
+        kept.add((id(parts), i))
+
+    context = "\n\n".join(doc for i, doc in enumerate(docs) if (id(docs), i) in kept)
+    history_text = "\n".join(line for i, line in enumerate(lines) if (id(lines), i) in kept)
+    full_context = f"{context}\n\nConversation History:\n{history_text}" if history_text else context
+    return full_context, estimate_tokens(assemble_prompt(message, full_context))
@@ -0,0 +1,248 @@
+"""Deadlines, hedged requests and circuit breaking for LLM backends"""
+import asyncio
+import os
+import time
+from collections import deque
+from typing import AsyncIterator, Optional
+
+from concurrency import BackendPool
+from streaming import iterate_in_pool
+
+# Circuit breaker and hedging tuning (override via environment)
+BREAKER_FAILURES = int(os.getenv("BREAKER_FAILURES", "5"))  # consecutive failures that open the circuit
+BREAKER_RESET_SECONDS = float(os.getenv("BREAKER_RESET_SECONDS", "30"))  # open time before a probe is let through
+HEDGE_MIN_SAMPLES = 20  # successful calls needed before the p95 is trusted
+LATENCY_WINDOW = 200  # recent successful call latencies kept for the p95
+
+
+class BackendUnavailable(Exception):
+    """Raised without calling the backend while its circuit is open"""
+
+
+class BackendBusy(BackendUnavailable):
+    """Raised when no pool worker picked the call up within the timeout.
+    The backend was never asked, so its circuit breaker does not count it."""
+
+
+class CircuitBreaker:
+    """Closed -> open after `failures` consecutive failures -> half-open.
+
+    While open, calls are rejected immediately. After `reset_seconds` one
+    probe call is let through (half-open); its success closes the circuit
+    and its failure opens it again.
+    """
+
+    def __init__(self, failures: int = BREAKER_FAILURES, reset_seconds: float = BREAKER_RESET_SECONDS):
+        self.threshold = max(1, failures)
+        self.reset_seconds = reset_seconds
+        self.state = "closed"
+        self.failures = 0
+        self.trips = 0
+        self.opened_at = None
+        self._probing = False
+
+    def allow(self) -> bool:
+        if self.state == "open":
+            if time.monotonic() - self.opened_at < self.reset_seconds:
+                return False
+            self.state = "half_open"
+        if self.state == "half_open":
+            if self._probing:
+                return False
+            self._probing = True
+        return True
+
+    def record_success(self):
+        self.state = "closed"
+        self.failures = 0
+        self._probing = False
+
+    def record_failure(self):
+        self.failures += 1
+        self._probing = False
+        if self.state == "half_open" or self.failures >= self.threshold:
+            if self.state != "open":
+                self.trips += 1
+            self.state = "open"
+            self.opened_at = time.monotonic()
+
+    def release(self):
+        """Forget an abandoned call (e.g. client disconnect) without judging the backend"""
+        self._probing = False
+
+    def stats(self) -> dict:
+        retry_in = None
+        if self.state == "open":
+            retry_in = round(max(0.0, self.reset_seconds - (time.monotonic() - self.opened_at)), 1)
+        return {"state": self.state, "consecutive_failures": self.failures, "trips": self.trips,
+                "retry_in_seconds": retry_in}
+
+
+class BackendGuard:
+    """Runs blocking calls to one LLM backend in its pool under a deadline.
+
+    The deadline starts once a pool worker picks the call up, so time spent
+    queued behind other calls is not blamed on the backend. A call still
+    queued after `timeout` is withdrawn and raises BackendBusy. Failures
+    and timeouts of running calls feed a CircuitBreaker; while it is open
+    calls raise BackendUnavailable immediately so callers can fall back
+    without waiting. With `hedge` on, a second identical call is started
+    once the first has run longer than the backend's recent p95 (if a pool
+    worker is free for it), and whichever finishes first wins. Abandoned
+    calls keep their pool thread until the backend returns, since blocking
+    client calls cannot be interrupted.
+    """
+
+    def __init__(self, name: str, pool: BackendPool, timeout: float, hedge: bool = False,
+                 breaker: Optional[CircuitBreaker] = None):
+        self.name = name
+        self.pool = pool
+        self.timeout = timeout
+        self.hedge = hedge
+        self.breaker = breaker or CircuitBreaker()
+        self.calls = 0
+        self.failures = 0
+        self.timeouts = 0
+        self.rejected = 0
+        self.busy = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+        self._latencies = deque(maxlen=LATENCY_WINDOW)
+
+    def p95(self) -> Optional[float]:
+        if len(self._latencies) < HEDGE_MIN_SAMPLES:
+            return None
+        ordered = sorted(self._latencies)
+        return ordered[int(0.95 * (len(ordered) - 1))]
+
+    def _admit(self):
+        if not self.breaker.allow():
+            self.rejected += 1
+            raise BackendUnavailable(f"{self.name} is unavailable (circuit open)")
+        self.calls += 1
+
+    def _signalling(self, fn, started: asyncio.Event):
+        """fn wrapped to set `started` once a pool worker begins running it"""
+        loop = asyncio.get_running_loop()
+
+        def call(*args):
+            loop.call_soon_threadsafe(started.set)
+            return fn(*args)
+        return call
+
+    async def _wait_started(self, task: asyncio.Future, started: asyncio.Event):
+        """Wait up to the timeout for a pool worker to pick the call up"""
+        waiter = asyncio.ensure_future(started.wait())
+        try:
+            await asyncio.wait({task, waiter}, timeout=self.timeout, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            waiter.cancel()
+        if not started.is_set() and not task.done():
+            self.busy += 1
+            self.breaker.release()
+            raise BackendBusy(f"{self.name} is busy: no free worker within {self.timeout:g}s")
+
+    def _failed(self, error: Exception) -> Exception:
+        self.failures += 1
+        self.breaker.record_failure()
+        if isinstance(error, asyncio.TimeoutError):
+            self.timeouts += 1
+            return TimeoutError(f"{self.name} did not respond within {self.timeout:g}s")
+        return error
+
+    async def run(self, fn, *args):
+        """Call fn(*args) in the pool within the deadline (hedged if enabled)"""
+        self._admit()
+        started = asyncio.Event()
+        first = asyncio.ensure_future(self.pool.run(self._signalling(fn, started), *args))
+        try:
+            await self._wait_started(first, started)
+            began = time.perf_counter()
+            try:
+                result = await asyncio.wait_for(self._attempts(first, fn, *args), self.timeout)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                raise self._failed(e) from e
+        except asyncio.CancelledError:
+            self.breaker.release()
+            raise
+        finally:
+            first.cancel()
+        self._latencies.append(time.perf_counter() - began)
+        self.breaker.record_success()
+        return result
+
+    async def _attempts(self, first: asyncio.Future, fn, *args):
+        hedge = None
+        tasks = {first}
+        try:
+            delay = self.p95() if self.hedge else None
+            if delay is not None:
+                done, _ = await asyncio.wait(tasks, timeout=delay)
+                # A hedge queued behind other calls would only add to the backlog
+                if not done and self.pool.pending < self.pool.max_workers:
+                    self.hedged += 1
+                    hedge = asyncio.ensure_future(self.pool.run(fn, *args))
+                    tasks.add(hedge)
+            error = None
+            while tasks:
+                done, tasks = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is hedge:
+                            self.hedge_wins += 1
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def stream(self, gen_fn, *args) -> AsyncIterator:
+        """Iterate a blocking generator in the pool; once a pool worker picks
+        it up, the deadline applies to the first item and to each gap
+        between items"""
+        self._admit()
+        started = asyncio.Event()
+        items = iterate_in_pool(self.pool, self._signalling(gen_fn, started), *args)
+        first = asyncio.ensure_future(items.__anext__())
+        finished = False
+        try:
+            await self._wait_started(first, started)
+            next_item = first
+            while True:
+                try:
+                    item = await asyncio.wait_for(next_item, self.timeout)
+                except StopAsyncIteration:
+                    break
+                except Exception as e:
+                    finished = True
+                    raise self._failed(e) from e
+                yield item
+                next_item = items.__anext__()
+            finished = True
+            self.breaker.record_success()
+        finally:
+            if not finished:
+                self.breaker.release()
+            if not first.done():
+                first.cancel()
+                await asyncio.wait({first})
+            await items.aclose()
+
+    def stats(self) -> dict:
+        p95 = self.p95()
+        return {
+            "timeout_seconds": self.timeout,
+            "hedge": self.hedge,
+            "p95_seconds": round(p95, 3) if p95 is not None else None,
+            "calls": self.calls,
+            "failures": self.failures,
+            "timeouts": self.timeouts,
+            "rejected": self.rejected,
+            "busy": self.busy,
+            "hedged": self.hedged,
+            "hedge_wins": self.hedge_wins,
+            "breaker": self.breaker.stats(),
+        }
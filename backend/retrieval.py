@@ -0,0 +1,113 @@
+"""Hybrid retrieval: concurrent vector and keyword legs merged by rank fusion"""
+import asyncio
+import os
+from typing import Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+
+from metrics import backend_errors, fallbacks
+
+# Retrieval tuning (override via environment)
+VECTOR_TIMEOUT = float(os.getenv("VECTOR_TIMEOUT", "2.0"))    # seconds, embed + vector query
+KEYWORD_TIMEOUT = float(os.getenv("KEYWORD_TIMEOUT", "0.5"))  # seconds, BM25 query
+RRF_K = int(os.getenv("RRF_K", "60"))
+CANDIDATE_MULTIPLIER = int(os.getenv("CANDIDATE_MULTIPLIER", "3"))
+
+Leg = Callable[[int], Awaitable[List[str]]]
+
+
+def reciprocal_rank_fusion(ranked_lists: Sequence[Tuple[List[str], float]], top_k: int, k: int = RRF_K) -> List[str]:
+    """Merge ranked lists of documents with weighted reciprocal-rank fusion.
+
+    Each document scores sum(weight / (k + rank)) over the lists it appears
+    in; documents are identified by their text, so the same chunk returned
+    by both legs is counted once.
+    """
+    scores: Dict[str, float] = {}
+    for docs, weight in ranked_lists:
+        if weight <= 0:
+            continue
+        for rank, doc in enumerate(docs, start=1):
+            scores[doc] = scores.get(doc, 0.0) + weight / (k + rank)
+    ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+    return [doc for doc, _ in ranked[:top_k]]
+
+
+async def _run_leg(name: str, leg: Leg, n: int, timeout: float) -> Optional[List[str]]:
+    """Run one retrieval leg within its deadline; a late or failed leg yields None"""
+    try:
+        return await asyncio.wait_for(leg(n), timeout=timeout)
+    except asyncio.TimeoutError:
+        print(f"{name} retrieval missed its {timeout}s deadline")
+    except Exception as e:
+        print(f"{name} retrieval error: {e}")
+        backend_errors.labels(f"{name.lower()}_retrieval").inc()
+    fallbacks.labels(f"{name.lower()}_retrieval", "partial_results").inc()
+    return None
+
+
+async def hybrid_search(
+    vector_leg: Leg,
+    keyword_leg: Leg,
+    top_k: int = 3,
+    vector_weight: float = 1.0,
+    keyword_weight: float = 1.0,
+    vector_timeout: float = VECTOR_TIMEOUT,
+    keyword_timeout: float = KEYWORD_TIMEOUT,
+) -> Tuple[List[str], bool]:
+    """Run both legs concurrently and fuse whatever arrives in time.
+
+    Each leg is asked for top_k * CANDIDATE_MULTIPLIER candidates so the
+    fusion has some depth to work with. A leg with zero weight is skipped.
+    Returns the fused documents and whether every leg finished in time.
+    """
+    n = max(top_k, top_k * CANDIDATE_MULTIPLIER)
+    legs = []
+    if vector_weight > 0:
+        legs.append((_run_leg("Vector", vector_leg, n, vector_timeout), vector_weight))
+    if keyword_weight > 0:
+        legs.append((_run_leg("Keyword", keyword_leg, n, keyword_timeout), keyword_weight))
+    results = await asyncio.gather(*(coro for coro, _ in legs))
+    fused = reciprocal_rank_fusion(
+        [(docs, weight) for docs, (_, weight) in zip(results, legs) if docs is not None],
+        top_k
+    )
+    return fused, all(docs is not None for docs in results)
+
+
+def metadata_filter(filename: Optional[str] = None, uploaded_after: Optional[float] = None,
+                    uploaded_before: Optional[float] = None) -> Optional[dict]:
+    """Metadata filter in the $eq/$gte/$and syntax shared by Pinecone and Chroma.
+
+    Upload times are epoch seconds, matched against each chunk's
+    `uploaded_at` metadata. Returns None when there is nothing to filter on.
+    """
+    clauses = []
+    if filename is not None:
+        clauses.append({"filename": {"$eq": filename}})
+    if uploaded_after is not None:
+        clauses.append({"uploaded_at": {"$gte": uploaded_after}})
+    if uploaded_before is not None:
+        clauses.append({"uploaded_at": {"$lte": uploaded_before}})
+    if not clauses:
+        return None
+    return clauses[0] if len(clauses) == 1 else {"$and": clauses}
+
+
+_OPERATORS = {
+    "$eq": lambda value, target: value == target,
+    "$gte": lambda value, target: value is not None and value >= target,
+    "$lte": lambda value, target: value is not None and value <= target,
+}
+
+
+def matches_filter(metadata: Optional[dict], flt: Optional[dict]) -> bool:
+    """Evaluate a metadata_filter() against one chunk's metadata"""
+    if not flt:
+        return True
+    if "$and" in flt:
+        return all(matches_filter(metadata, clause) for clause in flt["$and"])
+    metadata = metadata or {}
+    return all(
+        _OPERATORS[op](metadata.get(field), target)
+        for field, condition in flt.items()
+        for op, target in condition.items()
+    )
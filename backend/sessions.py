@@ -0,0 +1,94 @@
+"""Server-side conversation sessions with TTL eviction"""
+import asyncio
+import os
+import time
+import uuid
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+
+# Session store tuning (override via environment)
+SESSION_TTL = float(os.getenv("SESSION_TTL", "1800"))  # seconds of inactivity before a session expires
+MAX_SESSIONS = int(os.getenv("MAX_SESSIONS", "1000"))
+SESSION_HISTORY = int(os.getenv("SESSION_HISTORY", "50"))  # messages kept per session
+
+
+class Session:
+    """One conversation: its messages plus any model state worth reusing.
+
+    `llm_context` holds the token context Ollama returns from a generation;
+    passing it back lets the model continue the conversation without
+    re-processing earlier turns. Turns of one session are serialized by
+    `lock`, since each turn continues from the previous one's context.
+    """
+
+    def __init__(self, history: List[Tuple[str, str]] = ()):
+        self.id = uuid.uuid4().hex
+        self.history: List[Tuple[str, str]] = list(history)[-SESSION_HISTORY:]
+        self.llm_context: Optional[list] = None
+        self.turns = 0
+        self.last_used = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    def record(self, message: str, response: str, llm_context: Optional[list] = None):
+        """Append one completed turn"""
+        self.history.extend([("user", message), ("assistant", response)])
+        del self.history[:-SESSION_HISTORY]
+        self.llm_context = llm_context
+        self.turns += 1
+
+
+class SessionStore:
+    """Bounded LRU of sessions; idle sessions expire after `ttl` seconds"""
+
+    def __init__(self, max_sessions: int = MAX_SESSIONS, ttl: float = SESSION_TTL):
+        self.max_sessions = max(1, max_sessions)
+        self.ttl = ttl
+        self._sessions: "OrderedDict[str, Session]" = OrderedDict()
+        self.created = 0
+        self.expired = 0
+        self.evicted = 0
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def _expire(self):
+        cutoff = time.monotonic() - self.ttl
+        while self._sessions:
+            session = next(iter(self._sessions.values()))
+            if session.last_used >= cutoff:
+                break
+            del self._sessions[session.id]
+            self.expired += 1
+
+    def create(self, history: List[Tuple[str, str]] = ()) -> Session:
+        self._expire()
+        session = Session(history)
+        self._sessions[session.id] = session
+        self.created += 1
+        while len(self._sessions) > self.max_sessions:
+            self._sessions.popitem(last=False)
+            self.evicted += 1
+        return session
+
+    def get(self, session_id: str) -> Optional[Session]:
+        """Live session by id (refreshing its TTL), or None if unknown or expired"""
+        self._expire()
+        session = self._sessions.get(session_id)
+        if session is not None:
+            session.last_used = time.monotonic()
+            self._sessions.move_to_end(session_id)
+        return session
+
+    def delete(self, session_id: str) -> bool:
+        return self._sessions.pop(session_id, None) is not None
+
+    def stats(self) -> dict:
+        self._expire()
+        return {
+            "active": len(self._sessions),
+            "max_sessions": self.max_sessions,
+            "ttl_seconds": self.ttl,
+            "created": self.created,
+            "expired": self.expired,
+            "evicted": self.evicted,
+        }
@@ -0,0 +1,126 @@
+"""Background component loading with per-component readiness tracking"""
+import asyncio
+import time
+from typing import Callable, Dict, List, Optional
+
+
+class Component:
+    """One startup unit (model, client, index) and its load state"""
+
+    def __init__(self, name: str, loader: Callable[[], Optional[bool]], after: List[str]):
+        self.name = name
+        self.loader = loader
+        self.after = after
+        self.status = "pending"
+        self.seconds = None
+        self.error = None
+        self.done = asyncio.Event()
+
+    def report(self) -> dict:
+        return {
+            "status": self.status,
+            "seconds": round(self.seconds, 3) if self.seconds is not None else None,
+            "error": self.error,
+        }
+
+
+class Startup:
+    """Loads registered components concurrently after the server binds.
+
+    Each loader is a blocking function run in its own thread once the
+    components named in `after` have finished. A loader that returns False
+    marks its component "disabled" (not configured); an exception marks it
+    "failed". Either way the app keeps serving in its fallback mode, and
+    readiness only waits for every loader to finish.
+    """
+
+    def __init__(self):
+        self.components: Dict[str, Component] = {}
+        self.started_at = None
+        self.finished_at = None
+        self._task = None
+
+    def register(self, name: str, loader: Callable[[], Optional[bool]], after: List[str] = ()):
+        self.components[name] = Component(name, loader, list(after))
+
+    async def _load(self, component: Component):
+        for dependency in component.after:
+            await self.components[dependency].done.wait()
+        component.status = "loading"
+        started = time.perf_counter()
+        try:
+            result = await asyncio.to_thread(component.loader)
+            component.status = "disabled" if result is False else "ready"
+        except Exception as e:
+            component.status = "failed"
+            component.error = str(e)
+            print(f"⚠️  {component.name} failed to load: {e}")
+        finally:
+            component.seconds = time.perf_counter() - started
+            component.done.set()
+
+    async def _run(self):
+        await asyncio.gather(*(self._load(c) for c in self.components.values()))
+        self.finished_at = time.perf_counter()
+        print(f"✓ Startup complete in {self.finished_at - self.started_at:.2f}s")
+
+    def start(self):
+        """Begin loading in the background; returns immediately"""
+        self.started_at = time.perf_counter()
+        self.finished_at = None
+        for component in self.components.values():
+            component.status, component.seconds, component.error = "pending", None, None
+            component.done = asyncio.Event()
+        self._task = asyncio.ensure_future(self._run())
+
+    def load(self, names: List[str]) -> Dict[str, str]:
+        """Load the named components (and what they depend on) in the
+        calling thread, for scripts that use a backend without serving it.
+        Returns each loaded component's status."""
+        statuses: Dict[str, str] = {}
+
+        def visit(name: str):
+            if name in statuses:
+                return
+            component = self.components[name]
+            for dependency in component.after:
+                visit(dependency)
+            try:
+                result = component.loader()
+                statuses[name] = "disabled" if result is False else "ready"
+            except Exception as e:
+                statuses[name] = "failed"
+                print(f"⚠️  {name} failed to load: {e}")
+
+        for name in names:
+            visit(name)
+        return statuses
+
+    async def stop(self):
+        if self._task and not self._task.done():
+            self._task.cancel()
+
+    async def wait(self, names: Optional[List[str]] = None):
+        """Wait until the named components (and what they depend on), or
+        every component, have finished loading"""
+        pending = list(self.components if names is None else names)
+        seen = set()
+        while pending:
+            name = pending.pop()
+            if name in seen:
+                continue
+            seen.add(name)
+            component = self.components[name]
+            pending.extend(component.after)
+            await component.done.wait()
+
+    @property
+    def ready(self) -> bool:
+        return all(c.done.is_set() for c in self.components.values())
+
+    def report(self) -> dict:
+        return {
+            "ready": self.ready,
+            "seconds": round(self.finished_at - self.started_at, 3) if self.finished_at else None,
+            "components": {name: c.report() for name, c in self.components.items()},
+        }
@@ -0,0 +1,58 @@
+"""Server-Sent Events helpers for streaming chat responses"""
+import asyncio
+import json
+import threading
+
+from concurrency import BackendPool
+
+_DONE = object()
+
+
+class _Failure:
+    def __init__(self, error: Exception):
+        self.error = error
+
+
+def sse_event(event: str, data) -> str:
+    """Format one Server-Sent Event with a JSON payload"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+async def iterate_in_pool(pool: BackendPool, gen_fn, *args, **kwargs):
+    """Drive a blocking generator inside a backend pool and yield its items.
+
+    The generator holds one pool worker for its whole lifetime, so streamed
+    generations count against the same concurrency limit as blocking ones.
+    If the consumer goes away (client disconnect) the producer stops at the
+    next item instead of generating into the void.
+    """
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue()
+    stop = threading.Event()
+
+    def produce():
+        try:
+            for item in gen_fn(*args, **kwargs):
+                if stop.is_set():
+                    break
+                loop.call_soon_threadsafe(queue.put_nowait, item)
+        except Exception as e:
+            loop.call_soon_threadsafe(queue.put_nowait, _Failure(e))
+        finally:
+            loop.call_soon_threadsafe(queue.put_nowait, _DONE)
+
+    task = asyncio.ensure_future(pool.run(produce))
+    try:
+        while True:
+            item = await queue.get()
+            if item is _DONE:
+                break
+            if isinstance(item, _Failure):
+                raise item.error
+            yield item
+    finally:
+        stop.set()
+        if task.done():
+            task.result()
+        else:
+            task.cancel()  # withdraws it if still queued for a pool worker
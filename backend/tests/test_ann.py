@@ -0,0 +1,76 @@
+import numpy as np
+
+from ann import IVFIndex
+from local_index import LocalVectorIndex
+
+DIM = 16
+
+
+def clustered(count, seed=0, clusters=40):
+    rng = np.random.default_rng(seed)
+    centers = np.random.default_rng(100).standard_normal((clusters, DIM))
+    return (centers[rng.integers(clusters, size=count)] + 0.3 * rng.standard_normal((count, DIM))).astype(np.float32)
+
+
+def build(data, path=None, nprobe=8):
+    index = LocalVectorIndex(dim=DIM, path=path, quantization="float32")
+    index.add(data, [f"chunk {i}" for i in range(len(data))], [{} for _ in range(len(data))])
+    # min_rows out of reach so no background rebuild starts; tests train explicitly
+    index.ann = IVFIndex(index, nprobe=nprobe, nlist=32, min_rows=10 ** 9)
+    return index
+
+
+def recall(index, queries, top_k=10):
+    ann, index.ann = index.ann, None
+    expected = [{row for row, _ in index.search(query, top_k)} for query in queries]
+    index.ann = ann
+    found = [{row for row, _ in index.search(query, top_k)} for query in queries]
+    return np.mean([len(e & f) / top_k for e, f in zip(expected, found)])
+
+
+def test_untrained_index_falls_back_to_exact_search():
+    index = build(clustered(500))
+    assert not index.ann.ready
+    assert index.ann.candidates(np.ones(DIM, dtype=np.float32), index.count) is None
+    assert recall(index, clustered(20, seed=1)) == 1.0
+
+
+def test_ivf_recall_and_probed_fraction():
+    index = build(clustered(4000))
+    index.ann.rebuild()
+    queries = clustered(50, seed=1)
+
+    assert index.ann.stats()["nlist"] == 32
+    assert recall(index, queries) >= 0.95
+    query = queries[0] / np.linalg.norm(queries[0])
+    assert len(index.ann.candidates(query, index.count)) < index.count / 2
+
+
+def test_rows_added_after_training_are_searchable():
+    data = clustered(3000)
+    index = build(data[:2000])
+    index.ann.rebuild()
+    index.add(data[2000:], [f"new {i}" for i in range(1000)], [{} for _ in range(1000)])
+
+    assert index.ann.stats()["assigned_rows"] == 3000
+    assert index.search(data[2500], top_k=1)[0][0] == 2500
+    assert recall(index, clustered(50, seed=1)) >= 0.95
+
+
+def test_deleted_rows_never_come_back():
+    data = clustered(2000)
+    index = build(data)
+    index.ann.rebuild()
+    index.delete([42])
+    assert 42 not in [row for row, _ in index.search(data[42], top_k=10)]
+
+
+def test_trained_lists_are_reloaded_from_disk(tmp_path):
+    data = clustered(2000)
+    build(data, path=str(tmp_path)).ann.rebuild()
+
+    index = LocalVectorIndex(dim=DIM, path=str(tmp_path), quantization="float32")
+    index.ann = IVFIndex(index, nprobe=8, min_rows=10 ** 9)
+    assert index.ann.ready and index.ann.rebuilds == 0
+    assert index.ann.stats()["assigned_rows"] == 2000
+    assert index.search(data[7], top_k=1)[0][0] == 7
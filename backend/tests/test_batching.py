@@ -0,0 +1,58 @@
+import asyncio
+
+import numpy as np
+import pytest
+
+from batching import EmbeddingBatcher
+from concurrency import BackendPool
+
+pool = BackendPool("test-embed", 2)
+
+
+class Encoder:
+    def __init__(self, fail=False):
+        self.calls = []
+        self.fail = fail
+
+    def __call__(self, texts):
+        self.calls.append(list(texts))
+        if self.fail:
+            raise RuntimeError("encoder crashed")
+        return np.array([[len(text), i] for i, text in enumerate(texts)], dtype=np.float32)
+
+
+def run_concurrently(batcher, texts):
+    async def main():
+        return await asyncio.gather(*(batcher.embed(text) for text in texts))
+    return asyncio.run(main())
+
+
+def test_concurrent_queries_share_one_encode():
+    encoder = Encoder()
+    batcher = EmbeddingBatcher("test", encoder, pool, max_batch=32, max_wait_ms=20)
+    rows = run_concurrently(batcher, ["a", "bb", "ccc"])
+    assert encoder.calls == [["a", "bb", "ccc"]]
+    assert [row[0] for row in rows] == [1, 2, 3]
+
+
+def test_batches_are_capped_at_max_batch():
+    encoder = Encoder()
+    batcher = EmbeddingBatcher("test", encoder, pool, max_batch=4, max_wait_ms=20)
+    rows = run_concurrently(batcher, [str(i) * (i + 1) for i in range(10)])
+    assert sorted(len(call) for call in encoder.calls) == [2, 4, 4]
+    assert [row[0] for row in rows] == [i + 1 for i in range(10)]
+    assert batcher.stats()["max_batch_size"] == 4
+
+
+def test_identical_texts_are_encoded_once():
+    encoder = Encoder()
+    batcher = EmbeddingBatcher("test", encoder, pool, max_batch=32, max_wait_ms=20)
+    first, second = run_concurrently(batcher, ["same", "same"])
+    assert encoder.calls == [["same"]]
+    assert np.array_equal(first, second)
+
+
+def test_encoder_errors_reach_every_caller():
+    batcher = EmbeddingBatcher("test", Encoder(fail=True), pool, max_batch=32, max_wait_ms=5)
+    with pytest.raises(RuntimeError, match="encoder crashed"):
+        run_concurrently(batcher, ["a", "b"])
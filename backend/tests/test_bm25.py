@@ -0,0 +1,49 @@
+from bm25 import BM25Index, tokenize
+
+
+def index_of(*texts):
+    index = BM25Index()
+    for text in texts:
+        index.add(text)
+    return index
+
+
+def test_tokenize_drops_stopwords_and_case():
+    assert tokenize("The Battery is in the ENGINE") == ["battery", "engine"]
+
+
+def test_ranks_documents_by_term_matches():
+    index = index_of("battery engine", "battery battery battery", "network report")
+    docs = [doc for doc, _ in index.search("battery", 3)]
+    assert docs[0] == 1 and set(docs) == {0, 1}
+
+
+def test_removed_documents_are_not_returned():
+    index = index_of("battery engine", "battery report", "network report")
+    index.remove(1)
+    assert {doc for doc, _ in index.search("battery report", 3)} == {0, 2}
+    assert len(index) == 2
+
+
+def test_removal_updates_length_statistics():
+    index = index_of("battery", "battery engine network report")
+    total = index.total_length
+    index.remove(1)
+    index.remove(1)  # removing twice changes nothing
+    assert index.total_length == total - 4
+    assert index.search("network", 3) == []
+
+
+def test_document_numbers_stay_stable_after_removal():
+    index = index_of("one", "two")
+    index.remove(0)
+    assert index.next_doc == 2
+    assert index.add("three") == 2
+    assert [doc for doc, _ in index.search("three", 3)] == [2]
+
+
+def test_removing_unknown_documents_is_ignored():
+    index = index_of("battery")
+    index.remove(5)
+    index.remove(-1)
+    assert len(index) == 1
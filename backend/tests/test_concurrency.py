@@ -0,0 +1,110 @@
+import asyncio
+
+import pytest
+
+from concurrency import SingleFlight, StreamFlight, flight_key
+
+
+def test_flight_key_separates_parts():
+    assert flight_key("ab", "c") != flight_key("a", "bc")
+    assert flight_key("a", "b") == flight_key("a", "b")
+
+
+def test_single_flight_coalesces_identical_calls():
+    calls = 0
+
+    async def work():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return "answer"
+
+    async def main():
+        flight = SingleFlight("test")
+        results = await asyncio.gather(*(flight.do("key", work) for _ in range(5)))
+        return flight, results
+
+    flight, results = asyncio.run(main())
+    assert results == ["answer"] * 5
+    assert calls == 1
+    assert flight.stats() == {"in_flight": 0, "started": 1, "coalesced": 4}
+
+
+def test_single_flight_shares_errors_and_survives_a_cancelled_waiter():
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise ValueError("backend down")
+
+    async def slow():
+        await asyncio.sleep(0.02)
+        return "done"
+
+    async def main():
+        flight = SingleFlight("test")
+        errors = await asyncio.gather(flight.do("a", fail), flight.do("a", fail), return_exceptions=True)
+        first = asyncio.ensure_future(flight.do("b", slow))
+        second = asyncio.ensure_future(flight.do("b", slow))
+        await asyncio.sleep(0)
+        first.cancel()
+        return errors, await second
+
+    errors, result = asyncio.run(main())
+    assert all(isinstance(error, ValueError) for error in errors)
+    assert result == "done"
+
+
+def test_stream_flight_replays_items_to_late_subscribers():
+    started = 0
+
+    async def generate():
+        nonlocal started
+        started += 1
+        for token in ("a", "b", "c"):
+            await asyncio.sleep(0.01)
+            yield token
+
+    async def collect(flight, delay=0.0):
+        await asyncio.sleep(delay)
+        return [token async for token in flight.subscribe("key", generate)]
+
+    async def main():
+        flight = StreamFlight("test")
+        return await asyncio.gather(collect(flight), collect(flight, delay=0.015))
+
+    assert asyncio.run(main()) == [["a", "b", "c"], ["a", "b", "c"]]
+    assert started == 1
+
+
+def test_stream_flight_cancels_the_generation_when_everyone_leaves():
+    closed = asyncio.Event()
+
+    async def generate():
+        try:
+            while True:
+                await asyncio.sleep(0.005)
+                yield "token"
+        finally:
+            closed.set()
+
+    async def main():
+        flight = StreamFlight("test")
+        stream = flight.subscribe("key", generate)
+        assert await stream.__anext__() == "token"
+        await stream.aclose()
+        await asyncio.wait_for(closed.wait(), 1)
+        return flight.stats()
+
+    assert asyncio.run(main())["in_flight"] == 0
+
+
+def test_stream_flight_propagates_errors():
+    async def generate():
+        yield "partial"
+        raise RuntimeError("model crashed")
+
+    async def main():
+        flight = StreamFlight("test")
+        return [token async for token in flight.subscribe("key", generate)]
+
+    with pytest.raises(RuntimeError, match="model crashed"):
+        asyncio.run(main())
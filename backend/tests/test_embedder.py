@@ -0,0 +1,57 @@
+import numpy as np
+import pytest
+
+pytest.importorskip("torch")
+pytest.importorskip("onnx")
+pytest.importorskip("onnxruntime")
+pytest.importorskip("sentence_transformers")
+transformers = pytest.importorskip("transformers")
+
+from embedder import OnnxEmbedder, export  # noqa: E402
+
+WORDS = "the a of to and in is for on with that this document system memory server index query vector search model answer".split()
+TEXTS = ["the system index", "a query for the vector search model answer " * 3, "memory", "document server", "unknown words"]
+
+
+@pytest.fixture(scope="module")
+def models(tmp_path_factory):
+    """A tiny random BERT saved as a SentenceTransformer directory, plus its ONNX export
+    (same architecture and pooling as all-MiniLM-L6-v2, without downloading it)"""
+    source = tmp_path_factory.mktemp("bert")
+    (source / "vocab.txt").write_text("\n".join(["[PAD]", "[UNK]", "[CLS]", "[SEP]", "[MASK]"] + WORDS))
+    transformers.BertTokenizerFast(str(source / "vocab.txt")).save_pretrained(str(source))
+    config = transformers.BertConfig(vocab_size=len(WORDS) + 5, hidden_size=32, num_hidden_layers=2,
+                                     num_attention_heads=2, intermediate_size=64, max_position_embeddings=64)
+    transformers.BertModel(config).save_pretrained(str(source))
+    exported = tmp_path_factory.mktemp("onnx")
+    export(str(exported), int8=True, model_name=str(source))
+    return str(source), str(exported)
+
+
+@pytest.fixture(scope="module")
+def reference(models):
+    from sentence_transformers import SentenceTransformer
+    return SentenceTransformer(models[0], device="cpu").encode(TEXTS, normalize_embeddings=True)
+
+
+@pytest.mark.parametrize("int8, tolerance", [(False, 1e-5), (True, 1e-2)])
+def test_onnx_vectors_match_sentence_transformers(models, reference, int8, tolerance):
+    embedder = OnnxEmbedder(models[1], int8=int8, max_length=64)
+    vectors = embedder.encode(TEXTS, batch_size=2)  # mixed lengths, padded per batch
+
+    assert vectors.shape == reference.shape and vectors.dtype == np.float32
+    assert np.sum(vectors * reference, axis=1).min() >= 1 - tolerance
+
+
+def test_single_text_encodes_to_one_normalized_vector(models):
+    embedder = OnnxEmbedder(models[1], max_length=64)
+    vector = embedder.encode("the system index")
+
+    assert vector.shape == (embedder.get_sentence_embedding_dimension(),)
+    assert np.linalg.norm(vector) == pytest.approx(1, abs=1e-5)
+    np.testing.assert_allclose(vector, embedder.encode(["the system index"])[0], atol=1e-6)
+
+
+def test_missing_export_names_the_command(tmp_path):
+    with pytest.raises(FileNotFoundError, match="python embedder.py"):
+        OnnxEmbedder(str(tmp_path))
@@ -0,0 +1,56 @@
+import io
+import random
+
+from ingest import iter_file_chunks, CHUNK_SIZE
+from manifest import chunk_hash
+
+WORDS = "battery engine network schedule report policy budget update release customer invoice storage".split()
+
+
+def document(paragraphs: int = 150, seed: int = 0) -> str:
+    rng = random.Random(seed)
+
+    def sentence():
+        return " ".join(rng.choice(WORDS) for _ in range(rng.randint(4, 18))).capitalize() + rng.choice(".!?")
+
+    return "\n\n".join(" ".join(sentence() for _ in range(rng.randint(1, 6))) for _ in range(paragraphs))
+
+
+def chunks(text: str, block_size: int = 4096):
+    return [chunk for _, chunk in iter_file_chunks(io.BytesIO(text.encode("utf-8")), block_size=block_size)]
+
+
+def test_chunks_cover_the_text_within_size():
+    text = document()
+    result = chunks(text)
+    assert "".join(result) == text
+    assert max(len(chunk) for chunk in result) <= CHUNK_SIZE
+
+
+def test_boundaries_do_not_depend_on_read_blocks():
+    text = document(seed=1) + " é" * 300
+    assert chunks(text, block_size=97) == chunks(text, block_size=1 << 20)
+
+
+def test_insert_in_the_middle_keeps_most_chunks():
+    text = document(seed=2)
+    before = {chunk_hash(chunk) for chunk in chunks(text)}
+    middle = len(text) // 2
+    after = [chunk_hash(chunk) for chunk in chunks(text[:middle] + "A new sentence here. " + text[middle:])]
+    reused = sum(digest in before for digest in after)
+    assert len(before) > 50
+    assert reused >= len(after) - 3
+
+
+def test_prefix_only_changes_the_first_chunks():
+    text = document(seed=3)
+    before = {chunk_hash(chunk) for chunk in chunks(text)}
+    after = [chunk_hash(chunk) for chunk in chunks("Draft: " + text)]
+    assert sum(digest not in before for digest in after) <= 2
+
+
+def test_long_text_without_breaks_is_cut_at_whitespace():
+    text = " ".join(["word"] * 1000)
+    result = chunks(text)
+    assert "".join(result) == text
+    assert all(len(chunk) <= CHUNK_SIZE and chunk.endswith(" ") for chunk in result[:-1])
@@ -0,0 +1,74 @@
+import asyncio
+import io
+import threading
+
+from jobs import JobQueue
+from manifest import ChunkManifest, chunk_hash
+
+
+class FakeUpload:
+    def __init__(self, filename: str, data: bytes):
+        self.filename = filename
+        self._data = io.BytesIO(data)
+
+    async def read(self, size: int = -1) -> bytes:
+        return self._data.read(size)
+
+
+def document(paragraphs: int = 3000) -> bytes:
+    return "\n\n".join(f"Paragraph {i} covers topic {i * 7 % 13} in some detail." for i in range(paragraphs)).encode()
+
+
+class Store:
+    """Records stored chunks; with `crash_after`, hangs once that many batches are stored"""
+
+    def __init__(self, crash_after=None):
+        self.texts = []
+        self.batches = 0
+        self.crash_after = crash_after
+        self.hung = threading.Event()
+        self.resume = threading.Event()
+
+    def __call__(self, texts, metadatas, stats):
+        if self.crash_after is not None and self.batches >= self.crash_after:
+            self.hung.set()
+            self.resume.wait()
+            return []  # the process died while this batch was in flight
+        self.batches += 1
+        self.texts.extend(texts)
+        return list(range(len(self.texts) - len(texts), len(self.texts)))
+
+
+def test_job_resumes_after_a_crash_without_re_storing_chunks(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)  # manifests are written under ./manifests
+    jobs_dir = str(tmp_path / "jobs")
+
+    async def crash():
+        store = Store(crash_after=2)
+        queue = JobQueue(store, path=jobs_dir)
+        await queue.start()
+        job = await queue.submit(FakeUpload("notes.txt", document()))
+        assert await asyncio.to_thread(store.hung.wait, 5)
+        await queue.stop()
+        store.resume.set()  # frees the ingest pool thread
+        queue._release(job.id)  # a dead process drops its lock
+        with open(queue._state_file(job.id)) as f:
+            assert '"running"' in f.read()
+        return job.id, store.texts
+
+    async def restart(job_id):
+        store = Store()
+        queue = JobQueue(store, path=jobs_dir)
+        await queue.start()
+        job = await asyncio.wait_for(queue.wait(job_id), 5)
+        await queue.stop()
+        return job, store.texts
+
+    job_id, before = asyncio.run(crash())
+    job, after = asyncio.run(restart(job_id))
+    assert before and after
+    assert job.status == "completed"
+    assert not set(before) & set(after)
+    manifest = ChunkManifest("notes.txt")
+    assert {chunk_hash(text) for text in before + after} == set(manifest.entries)
+    assert job.chunks_skipped == len(before)
@@ -0,0 +1,97 @@
+import numpy as np
+import pytest
+
+import local_index
+from local_index import LocalVectorIndex
+
+DIM = 16
+
+
+def vectors(count, seed=0):
+    return np.random.default_rng(seed).standard_normal((count, DIM)).astype(np.float32)
+
+
+def chunks(count, prefix="chunk"):
+    texts = [f"{prefix} {i}" for i in range(count)]
+    return texts, [{"filename": f"{prefix}.txt"} for _ in texts]
+
+
+@pytest.fixture
+def no_throttle(monkeypatch):
+    monkeypatch.setattr(local_index, "REFRESH_SECONDS", 0)
+
+
+def test_search_returns_the_matching_row():
+    index = LocalVectorIndex(dim=DIM)
+    data = vectors(50)
+    index.add(data, *chunks(50))
+
+    assert index.search(data[17], top_k=1)[0][0] == 17
+    index.delete([17])
+    assert 17 not in [row for row, _ in index.search(data[17], top_k=5)]
+
+
+def test_index_reloads_from_disk(tmp_path):
+    data = vectors(20)
+    LocalVectorIndex(dim=DIM, path=str(tmp_path)).add(data, *chunks(20))
+
+    reloaded = LocalVectorIndex(dim=DIM, path=str(tmp_path))
+    assert len(reloaded) == 20
+    assert reloaded.texts[5] == "chunk 5"
+    assert reloaded.search(data[5], top_k=1)[0][0] == 5
+
+
+def test_writers_see_each_others_rows_after_refresh(tmp_path, no_throttle):
+    first = LocalVectorIndex(dim=DIM, path=str(tmp_path))
+    second = LocalVectorIndex(dim=DIM, path=str(tmp_path))
+    data = vectors(30)
+
+    assert first.add(data[:10], *chunks(10, "a")) == list(range(10))
+    assert second.changed()
+    assert second.refresh() == (list(range(10)), [])
+    assert not second.changed()
+
+    # Rows written by the other process come first, so row numbers never collide
+    assert second.add(data[10:20], *chunks(10, "b")) == list(range(10, 20))
+    first.delete([3])
+    assert first.refresh() == (list(range(10, 20)), [])
+    assert second.refresh() == ([], [3])
+
+    assert second.texts[12] == "b 2" and first.texts[12] == "b 2"
+    assert first.search(data[15], top_k=1)[0][0] == 15
+    assert 3 not in [row for row, _ in second.search(data[3], top_k=5)]
+
+
+def test_changes_picked_up_while_writing_are_still_reported(tmp_path, no_throttle):
+    first = LocalVectorIndex(dim=DIM, path=str(tmp_path))
+    second = LocalVectorIndex(dim=DIM, path=str(tmp_path))
+    data = vectors(20)
+    first.add(data[:5], *chunks(5, "a"))
+
+    # second maps in first's rows while appending its own; refresh() still returns them
+    second.add(data[5:10], *chunks(5, "b"))
+    assert second.refresh() == (list(range(5)), [])
+    assert len(second) == 10
+
+
+@pytest.mark.parametrize("quantization", ["float16", "int8"])
+def test_quantized_search_with_rescore_matches_float32(tmp_path, quantization):
+    data = vectors(2000, seed=1)
+    queries = vectors(50, seed=2)
+    exact = LocalVectorIndex(dim=DIM, quantization="float32")
+    compact = LocalVectorIndex(dim=DIM, path=str(tmp_path), quantization=quantization, rescore=4)
+    for index in (exact, compact):
+        index.add(data, *chunks(len(data)))
+
+    expected = [{row for row, _ in result} for result in exact.search_batch(queries, top_k=10)]
+    found = [{row for row, _ in result} for result in compact.search_batch(queries, top_k=10)]
+    recall = np.mean([len(e & f) / 10 for e, f in zip(expected, found)])
+    assert recall >= 0.99
+    # Re-scored results carry full-precision scores
+    row, score = compact.search(queries[0], top_k=1)[0]
+    assert score == pytest.approx(exact.search(queries[0], top_k=1)[0][1], abs=1e-5)
+
+
+def test_int8_stores_a_quarter_of_the_bytes():
+    assert LocalVectorIndex(dim=DIM, quantization="int8").stats()["bytes_per_chunk"] == DIM + 4
+    assert LocalVectorIndex(dim=DIM, quantization="float32").stats()["bytes_per_chunk"] == DIM * 4
@@ -0,0 +1,49 @@
+from manifest import ChunkManifest, StoredIds, chunk_hash, chunk_id
+
+
+def test_chunk_ids_are_stable_per_file():
+    assert chunk_id("a.txt", "text") == chunk_id("a.txt", "text")
+    assert chunk_id("a.txt", "text") != chunk_id("b.txt", "text")
+    assert chunk_id("a.txt", "text").endswith(chunk_hash("text"))
+
+
+def test_manifest_survives_a_reload(tmp_path):
+    manifest = ChunkManifest("notes.txt", root=str(tmp_path))
+    manifest.add({chunk_hash("one"): 1, chunk_hash("two"): 2})
+    manifest.remove([chunk_hash("one"), chunk_hash("never stored")])
+
+    reloaded = ChunkManifest("notes.txt", root=str(tmp_path))
+    assert reloaded.entries == {chunk_hash("two"): 2}
+    assert chunk_hash("one") not in reloaded
+
+
+def test_torn_last_line_keeps_earlier_entries(tmp_path):
+    manifest = ChunkManifest("notes.txt", root=str(tmp_path))
+    manifest.add({chunk_hash("one"): 1})
+    with open(manifest.path, "a") as f:
+        f.write('{"hash": "abc", "i')  # crash mid-write
+
+    assert ChunkManifest("notes.txt", root=str(tmp_path)).entries == {chunk_hash("one"): 1}
+
+
+def test_compact_rewrites_one_line_per_live_chunk(tmp_path):
+    manifest = ChunkManifest("notes.txt", root=str(tmp_path))
+    for i in range(5):
+        manifest.add({chunk_hash(str(i)): i})
+    manifest.remove([chunk_hash("0"), chunk_hash("1")])
+    manifest.compact()
+
+    with open(manifest.path) as f:
+        assert len(f.readlines()) == 3
+    assert len(ChunkManifest("notes.txt", root=str(tmp_path))) == 3
+
+
+def test_files_get_separate_manifests(tmp_path):
+    ChunkManifest("a.txt", root=str(tmp_path)).add({chunk_hash("shared"): 1})
+    assert chunk_hash("shared") not in ChunkManifest("b.txt", root=str(tmp_path))
+
+
+def test_stored_ids_are_durable_unless_marked():
+    assert StoredIds([1, 2]).durable
+    ids = StoredIds(range(3), durable=False)
+    assert ids == [0, 1, 2] and not ids.durable
@@ -0,0 +1,33 @@
+import pytest
+
+from prompt import assemble_prompt, build_context, estimate_tokens, PromptTooLarge
+
+BUDGET = 300
+
+
+def assembled_tokens(docs, history, message, budget=BUDGET):
+    context, tokens = build_context(docs, history, message, budget)
+    prompt = assemble_prompt(message, context)
+    assert tokens == estimate_tokens(prompt)
+    return tokens, context
+
+
+@pytest.mark.parametrize("message_chars", [10, 400, 1000, 1150])
+@pytest.mark.parametrize("doc_chars", [50, 500, 2000])
+def test_assembled_prompt_stays_within_budget(message_chars, doc_chars):
+    docs = ["d" * doc_chars for _ in range(5)]
+    history = [("user" if i % 2 == 0 else "assistant", "h" * doc_chars) for i in range(6)]
+    tokens, _ = assembled_tokens(docs, history, "m" * message_chars)
+    assert tokens <= BUDGET
+
+
+def test_best_chunk_and_newest_message_are_kept_first():
+    history = [("user", "old question"), ("assistant", "newest answer")]
+    _, context = assembled_tokens(["best chunk", "second chunk"], history, "question")
+    assert context.index("best chunk") < context.index("second chunk")
+    assert "newest answer" in context
+
+
+def test_oversized_message_is_rejected():
+    with pytest.raises(PromptTooLarge):
+        build_context(["chunk"], [], "x" * 30000, budget=3000)
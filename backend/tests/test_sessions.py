@@ -0,0 +1,54 @@
+import sessions
+from sessions import Session, SessionStore
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_idle_sessions_expire_and_get_refreshes_them(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(sessions.time, "monotonic", clock)
+    store = SessionStore(ttl=10)
+    kept, idle = store.create(), store.create()
+
+    clock.now += 8
+    assert store.get(kept.id) is kept
+    clock.now += 5
+
+    assert store.get(idle.id) is None
+    assert store.get(kept.id) is kept
+    assert store.stats()["expired"] == 1
+
+
+def test_least_recently_used_session_is_evicted():
+    store = SessionStore(max_sessions=2)
+    first, second = store.create(), store.create()
+    store.get(first.id)
+    store.create()
+
+    assert store.get(second.id) is None
+    assert store.get(first.id) is first
+    assert len(store) == 2 and store.evicted == 1
+
+
+def test_history_keeps_the_latest_turns(monkeypatch):
+    monkeypatch.setattr(sessions, "SESSION_HISTORY", 4)
+    session = Session([("user", "old"), ("assistant", "old")])
+    session.record("q1", "a1", llm_context=[1, 2])
+    session.record("q2", "a2", llm_context=[3])
+
+    assert session.history == [("user", "q1"), ("assistant", "a1"), ("user", "q2"), ("assistant", "a2")]
+    assert session.llm_context == [3] and session.turns == 2
+
+
+def test_delete_forgets_the_session():
+    store = SessionStore()
+    session = store.create()
+    assert store.delete(session.id)
+    assert not store.delete(session.id)
+    assert store.get(session.id) is None